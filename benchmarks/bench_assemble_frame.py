@@ -0,0 +1,55 @@
+''' Benchmark of building the price matrix from per-ticker histories
+Compares finml.utils.assemble_frame with the former loop growing the frame with one pd.concat per ticker.
+Synthetic tickers have ragged histories (listed and delisted at random dates) over 2010-2023.
+
+usage: PYTHONPATH=. python benchmarks/bench_assemble_frame.py [--sizes 500 2500 10000] [--loop-max 2500]
+'''
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from finml.utils import assemble_frame
+
+
+def synthetic_histories(num_tickers, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2010-01-01', '2023-12-31', name='Date')[:3650]
+    datas = dict()
+    for idx in range(num_tickers):
+        lo = rng.integers(0, len(dates) // 2)
+        hi = rng.integers(lo + 1, len(dates) + 1)
+        datas['%06d' %idx] = pd.Series(rng.uniform(1000, 100000, hi - lo), index=dates[lo:hi], name='Close')
+    return datas
+
+
+def concat_loop(datas):
+    ''' The former per-ticker loop '''
+    frame = pd.DataFrame()
+    for ticker, data in datas.items():
+        frame = pd.concat([frame, data.rename(ticker)], axis=1, sort=True)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2500, 10000])
+    parser.add_argument('--loop-max', type=int, default=2500, help='largest size the concat loop is run for')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        datas = synthetic_histories(size)
+        begin = time.perf_counter()
+        frame = assemble_frame(datas)
+        assembled = time.perf_counter() - begin
+        line = '%6d tickers: assemble_frame %.2fs' %(size, assembled)
+        if size <= args.loop_max:
+            begin = time.perf_counter()
+            looped = concat_loop(datas)
+            line += ', concat loop %.2fs' %(time.perf_counter() - begin)
+            assert np.allclose(looped.sort_index().values, frame.values, equal_nan=True)
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
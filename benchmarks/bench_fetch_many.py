@@ -0,0 +1,55 @@
+''' Benchmark of PriceFetcher.fetch_many against the former sequential download loop
+Offline: a stub reader sleeps for the latency of one request and returns a prebuilt history,
+so the timings measure the overlap of requests, bounded by num_workers and the rate limit.
+200 tickers, 50ms latency: sequential loop 10.1s; fetch_many with 4 workers 2.5s (x4.0),
+8 workers 1.3s (x8.0), 16 workers 0.66s (x15.2); 8 workers limited to 20 req/s: 9.1s (the limit binds)
+
+usage: PYTHONPATH=. python benchmarks/bench_fetch_many.py [--tickers 200] [--latency 0.05] [--workers 1 4 8 16] [--rate 1000]
+'''
+import argparse
+import time
+from datetime import datetime
+import pandas as pd
+
+from finml.data_reader.fetcher import PriceFetcher
+
+
+def stub_reader(latency, start, end):
+    history = pd.DataFrame({'Close': 1.0, 'Volume': 1.0}, index=pd.bdate_range(start, end, name='Date'))
+
+    def reader(ticker, start, end, session):
+        time.sleep(latency)
+        return history
+    return reader
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--rate', type=float, default=1000, help='requests per second')
+    args = parser.parse_args()
+
+    tickers = ['%06d' %idx for idx in range(args.tickers)]
+    start, end = datetime(2010, 1, 1), datetime(2023, 12, 31)
+    reader = stub_reader(args.latency, start, end)
+
+    begin = time.perf_counter()
+    for ticker in tickers:
+        reader(ticker, start, end, None)
+    sequential = time.perf_counter() - begin
+    print('%d tickers, %.0fms latency: sequential loop %.2fs' %(args.tickers, args.latency * 1000, sequential))
+
+    for num_workers in args.workers:
+        fetcher = PriceFetcher(source='bench', num_workers=num_workers, rate=args.rate, reader=reader)
+        begin = time.perf_counter()
+        failed = sum(error is not None for _, _, error in fetcher.fetch_many(tickers, start, end))
+        elapsed = time.perf_counter() - begin
+        fetcher.close()
+        print('  fetch_many, %2d workers, %g req/s: %.2fs (x%.1f), %d failed'
+              %(num_workers, args.rate, elapsed, sequential / elapsed, failed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+''' Benchmark of RiskAverseOptimization.risk_aversion_curve (long-only active-set sweep)
+Synthetic moments: a 10-factor covariance of daily returns with specific variance.
+The time grows with the number of assets that are not at a bound (free) along the sweep,
+which is reported with the timings. Each asset entering costs one O(k^2) update of the factorization.
+500 assets x 20 gammas (best of 3):
+    gammas up to 10: 0.04s (7..22 assets held), up to 100: 0.08s (7..122)
+    up to 1,000: 0.49s (7..464), up to 10,000: 0.52s (7..500)
+    (dense KKT solve of every iteration: 0.03s, 0.13s, 2.31s, 2.80s)
+
+usage: PYTHONPATH=. python benchmarks/bench_risk_aversion_curve.py [--assets 500] [--gammas 20] [--max-gamma 1e4] [--upper 1.0]
+'''
+import argparse
+import time
+import numpy as np
+
+from finml.portfolio_optimization import RiskAverseOptimization
+
+
+def synthetic_moments(num_assets, seed=0):
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(0, 0.01, (num_assets, 10))
+    covariance = loadings @ loadings.T + np.diag(rng.uniform(1e-4, 4e-4, num_assets))
+    mean_return = rng.normal(5e-4, 3e-4, (num_assets, 1))
+    return mean_return, covariance
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--assets', type=int, default=500)
+    parser.add_argument('--gammas', type=int, default=20)
+    parser.add_argument('--max-gamma', type=float, default=1e4, help='gammas are log-spaced from 1')
+    parser.add_argument('--upper', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    mean_return, covariance = synthetic_moments(args.assets)
+    optimizer = RiskAverseOptimization(mean_return, covariance)
+    gammas = np.logspace(0, np.log10(args.max_gamma), args.gammas)
+
+    timings = list()
+    for _ in range(args.repeat):
+        begin = time.perf_counter()
+        wts = optimizer.risk_aversion_curve(gammas, upper=args.upper)
+        timings.append(time.perf_counter() - begin)
+    free = (wts > 1e-10).sum(axis=0)
+    print('%d assets x %d gammas up to %g (upper=%.2f): best %.3fs, assets held %d..%d'
+          %(args.assets, args.gammas, args.max_gamma, args.upper, min(timings), free.min(), free.max()))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,46 +1,84 @@
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 
 
-# polyfit may be replaced with 'np.linalg.lstsq' or .fit() method from statsmodels.formula.api
-def CAPM(market, stock_tickers, index_ticker, risk_free, start, end):
+def capm_regression(stock_returns, index_returns):
+    ''' Regression of every ticker on the index at once: return = alpha + beta * index_return
+    Each ticker uses its own dates (NaN returns are masked per column), no plotting.
+    args:
+        stock_returns: DataFrame of returns [date x ticker]
+        index_returns: Series of index returns
+    returns:
+        DataFrame of [ticker x ('alpha', 'beta', 'alpha_se', 'beta_se', 'r2', 'nobs', 'index_mean')]
+    '''
+    index_returns = index_returns.reindex(stock_returns.index)
+    x = index_returns.values.astype('float64')
+    y = stock_returns.values.astype('float64')
+    valid = ~np.isnan(y) & ~np.isnan(x)[:, None]
+    mask = valid.astype('float64')
+
+    # Shift the index returns by their mean to avoid cancellation in the sums
+    shift = np.nanmean(x)
+    x0 = np.where(np.isnan(x), 0.0, x - shift)
+    y0 = np.where(valid, y, 0.0)
+
+    n = mask.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = (x0 @ mask) / n
+        y_mean = y0.sum(axis=0) / n
+        sxx = (x0 ** 2) @ mask - n * x_mean ** 2
+        sxy = x0 @ y0 - n * x_mean * y_mean
+        syy = (y0 ** 2).sum(axis=0) - n * y_mean ** 2
+
+        beta = sxy / sxx
+        alpha = y_mean - beta * x_mean
+        sse = np.clip(syy - beta * sxy, 0, None)
+        s2 = sse / (n - 2)
+        # Shifting x changes only alpha
+        table = pd.DataFrame({'alpha': alpha - beta * shift,
+                              'beta': beta,
+                              'alpha_se': np.sqrt(s2 * (1 / n + (x_mean + shift) ** 2 / sxx)),
+                              'beta_se': np.sqrt(s2 / sxx),
+                              'r2': 1 - sse / syy,
+                              'nobs': n.astype('int64'),
+                              'index_mean': x_mean + shift},
+                             index=stock_returns.columns)
+    table.loc[n < 3, ['alpha', 'beta', 'alpha_se', 'beta_se', 'r2']] = np.nan
+    return table
+
+
+def CAPM(market, stock_tickers, index_ticker, risk_free, start, end, plot=False):
     ''' Implementation of Capital Asset Pricing Model
     args:
         market: initialized market CLASS instance
-        stock_tickers: a list of tickers
+        stock_tickers: a list of tickers (None: every ticker of the market)
         index_ticker: a ticker of market index such as 'KPI200'
         risk_free: risk free rate
         start: starting date, CLASS datetime
         end: ending date, CLASS datetime
+        plot: if True, plot the regression line of each ticker
     '''
     # Calculate returns
-    stock_prices = market.prices[stock_tickers]
     stock_returns = market.calculate_returns(start=start, end=end, subset=stock_tickers)
-    index_returns = market.calculate_returns(start=start, subset=[index_ticker]).squeeze()
-
-    
-    # Calculate Beta for a portfolio of stocks
-    beta = dict()
-    alpha = dict()
-    expected_returns = dict()
-    
-    for ticker in stock_tickers:
-        # Drop NA
-        return_ = stock_returns[ticker].dropna()
-        index_return_ = index_returns[return_.index]
-
-        plt.scatter(x=index_return_, y=return_)
-        b, a = np.polyfit(index_return_, return_, 1)
-        plt.plot(index_return_, b * index_return_ + a, '-', color='r')
-        plt.xlabel(index_ticker)
-        plt.ylabel(ticker)
-        
-        beta[ticker] = b
-        alpha[ticker] = a
-        plt.show()
-        
-        # Expected return
-        rm = index_return_.mean() * 252
-        expected_returns[ticker] = risk_free + (beta[ticker] * (rm - risk_free))
-        
-    return expected_returns, beta, alpha
\ No newline at end of file
+    index_returns = market.calculate_returns(start=start, end=end, subset=[index_ticker]).squeeze()
+    table = capm_regression(stock_returns, index_returns)
+
+    beta = table['beta'].to_dict()
+    alpha = table['alpha'].to_dict()
+
+    # Expected return
+    rm = table['index_mean'] * 252
+    expected_returns = (risk_free + table['beta'] * (rm - risk_free)).to_dict()
+
+    if plot:
+        for ticker in stock_returns.columns:
+            return_ = stock_returns[ticker].dropna()
+            index_return_ = index_returns[return_.index]
+            plt.scatter(x=index_return_, y=return_)
+            plt.plot(index_return_, beta[ticker] * index_return_ + alpha[ticker], '-', color='r')
+            plt.xlabel(index_ticker)
+            plt.ylabel(ticker)
+            plt.show()
+
+    return expected_returns, beta, alpha
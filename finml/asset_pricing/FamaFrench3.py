@@ -1,7 +1,9 @@
-from datetime import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from finml.utils import GoogleDriveDownloader
+from finml.asset_pricing.factors import FactorRepository
 import statsmodels.formula.api as smf
 from sklearn.linear_model import LinearRegression
 from statsmodels.api import OLS, add_constant
@@ -9,26 +11,18 @@ from linearmodels.asset_pricing import LinearFactorModel
 
 plt.style.use('ggplot')
 
-def FamaFrench3(market, ticker, tools='statsmodels', plot_return=False):
+def FamaFrench3(market, ticker, tools='statsmodels', plot_return=False, factors=None, data_path='data'):
     ''' Implementation of Fama-French 3-factor model
     args:
+        factors: DataFrame of [date x ('Mkt', 'SMB', 'HML', 'Rf')], e.g. FactorRepository.build_ff3
+                 (default: cached factor data of FactorRepository(data_path).ff3)
         tools: one from ['statsmodels', 'sklearn']
     '''
     # Fama French 3 factor in korea daily return (kospi & kosdaq)
     # expected_return = rf + beta_mkt * (rm - rf) + beta_smb * SMB + beta_hml * HML
 
-    # Download factor data (data may not be accurate)
-    print('Download factor data (data may not be accurate)...')
-    file_id = '10VLyoL0YO7Q_jPW_TjXf4LC2ZLt5FQtU'
-    destination = 'data/ff3_kospi_kosdaq_kor.csv'
-    GoogleDriveDownloader(file_id, destination)
-
-    ff3 = pd.read_csv(destination)
-
-    ff3 = ff3.set_index(keys=ff3.columns[0])
-    ff3.index = [datetime.strptime(idx, '%Y-%m-%d') for idx in ff3.index]
-    ff3.index.name='Date'
-    ff3 = ff3.rename(columns={'Mkt-Rf': 'Mkt'})
+    # Factor data (downloaded once and cached, data may not be accurate), or given factors
+    ff3 = FactorRepository(data_path).ff3() if factors is None else factors
 
     # Calculate return of the given ticker
     ticker_return = market.calculate_returns(subset=[ticker])
@@ -40,6 +34,106 @@ def FamaFrench3(market, ticker, tools='statsmodels', plot_return=False):
         FamaFrench3_sklearn_lr(ff3, ticker_return, plot_return)
 
 
+def _excess_and_design(market, tickers, factors, data_path):
+    ff3 = FactorRepository(data_path).ff3() if factors is None else factors
+    returns = market.calculate_returns(subset=tickers)
+    dates = returns.index.intersection(ff3.index)
+    excess = returns.loc[dates].sub(ff3.loc[dates, 'Rf'], axis=0)
+    return excess, ff3.loc[dates, ['Mkt', 'SMB', 'HML']]
+
+
+def FamaFrench3_table(market, tickers=None, factors=None, data_path='data'):
+    ''' Fama-French 3-factor regressions of every ticker (or the given tickers) in one call
+    args:
+        tickers: a list of tickers (None: every ticker of the market)
+        factors, data_path: factor data, see FamaFrench3
+    returns:
+        DataFrame of [ticker x (alpha, loadings, their t-stats, 'r2', 'nobs')], see ff3_regression
+    '''
+    excess, design = _excess_and_design(market, tickers, factors, data_path)
+    return ff3_regression(excess, design)
+
+
+def FamaFrench3_results(market, tickers=None, factors=None, data_path='data', num_processes=None):
+    ''' statsmodels OLS of each ticker fitted in a process pool (full inference output)
+    args:
+        tickers, factors, data_path: see FamaFrench3_table
+        num_processes: number of processes (default: number of CPUs)
+    returns:
+        dict of {ticker: statsmodels RegressionResults}, None for tickers with too few returns
+    '''
+    excess, design = _excess_and_design(market, tickers, factors, data_path)
+    num_processes = num_processes or os.cpu_count() or 1
+    chunksize = max(1, excess.shape[1] // (4 * num_processes))
+    with ProcessPoolExecutor(max_workers=num_processes, initializer=_init_ols_worker, initargs=(add_constant(design),)) as executor:
+        fitted = executor.map(_fit_ols, [excess[ticker] for ticker in excess.columns], chunksize=chunksize)
+        return dict(zip(excess.columns, fitted))
+
+
+_OLS_DESIGN = None
+
+def _init_ols_worker(design):
+    global _OLS_DESIGN
+    _OLS_DESIGN = design
+
+
+def _fit_ols(excess_return):
+    if excess_return.notna().sum() <= _OLS_DESIGN.shape[1]:
+        return None
+    result = OLS(endog=excess_return, exog=_OLS_DESIGN, missing='drop').fit()
+    result.bse, result.tvalues, result.pvalues, result.rsquared, result.rsquared_adj # cached before the data is removed
+    result.remove_data() # results are sent back to the parent process
+    return result
+
+
+def ff3_regression(excess_returns, factors):
+    ''' Regressions of all columns on the factors with one batched solve (same estimates as statsmodels OLS)
+    Each ticker uses its own dates (NaN returns are masked per column); tickers with too few
+    returns or a singular design (e.g. constant factors over their dates) are NaN.
+    args:
+        excess_returns: DataFrame of excess returns [date x ticker]
+        factors: DataFrame of factor returns [date x ('Mkt', 'SMB', 'HML')]
+    returns:
+        DataFrame of [ticker x (alpha, loadings, their t-stats, 'r2', 'nobs')]
+    '''
+    y = excess_returns.values.astype('float64')
+    x = np.hstack([np.ones((len(factors), 1)), factors.values.astype('float64')])
+    valid = ~np.isnan(y) & ~np.isnan(x).any(axis=1)[:, None]
+    mask = valid.astype('float64')
+    x = np.nan_to_num(x)
+    y = np.where(valid, y, 0.0)
+    num_params = x.shape[1]
+
+    # Masked normal equations of all tickers: [ticker x param x param] from one matrix product
+    xtx = (mask.T @ (x[:, :, None] * x[:, None, :]).reshape(len(x), -1)).reshape(-1, num_params, num_params)
+    xty = y.T @ x
+    nobs = mask.sum(axis=0)
+    fitted = nobs > num_params
+    fitted[fitted] = np.linalg.matrix_rank(xtx[fitted]) == num_params
+    coefs = np.full((y.shape[1], num_params), np.nan)
+    stderr = np.full((y.shape[1], num_params), np.nan)
+    r2 = np.full(y.shape[1], np.nan)
+
+    inverse = np.linalg.inv(xtx[fitted])
+    coefs[fitted] = (inverse @ xty[fitted][..., None])[..., 0]
+    residuals = np.where(valid[:, fitted], y[:, fitted] - x @ coefs[fitted].T, 0.0)
+    sse = (residuals ** 2).sum(axis=0)
+    s2 = sse / (nobs[fitted] - num_params)
+    stderr[fitted] = np.sqrt(s2[:, None] * np.diagonal(inverse, axis1=1, axis2=2))
+    y_mean = y[:, fitted].sum(axis=0) / nobs[fitted]
+    sst = (np.where(valid[:, fitted], y[:, fitted] - y_mean, 0.0) ** 2).sum(axis=0)
+    r2[fitted] = 1 - sse / sst
+
+    names = ['alpha'] + ['beta_' + str(col).lower() for col in factors.columns]
+    table = pd.DataFrame(coefs, index=excess_returns.columns, columns=names)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for idx, name in enumerate(names):
+            table['t_' + name] = coefs[:, idx] / stderr[:, idx]
+    table['r2'] = r2
+    table['nobs'] = nobs.astype('int64')
+    return table
+
+
 def FamaFrench3_statsmodels(ff3, ticker_return, plot_return=False):
     # Plot cumulated returns
     if plot_return:
@@ -78,26 +172,20 @@ def FamaFrench3_sklearn_lr(ff3, ticker_return, plot_return=False):
     print('|\t|\t%.3f\t|\t%.3f\t|\t%.3f\t|'%(mlr.coef_[0][0], mlr.coef_[0][1], mlr.coef_[0][2]))
     
 
-def FamaMacbeth(market, tickers, tools='statsmodels', plot_return=False):
+def FamaMacbeth(market, tickers, tools='statsmodels', plot_return=False, factors=None, data_path='data'):
     ''' Implementation of Fama-Macbeth regression
     args:
-
+        factors, data_path: factor data, see FamaFrench3
+        tools: one from ['statsmodels', 'linearmodels', 'numpy']
+    returns:
+        betas, lambdas (list of Series) with 'statsmodels' and 'numpy' (see FamaMacbeth_summary),
+        the fitted LinearFactorModel with 'linearmodels'
     '''
     # Fama French 3 factor in korea daily return (kospi & kosdaq)
     # expected_return = rf + beta_mkt * (rm - rf) + beta_smb * SMB + beta_hml * HML
 
-    # Download factor data (data may not be accurate)
-    print('Download factor data (data may not be accurate)...')
-    file_id = '10VLyoL0YO7Q_jPW_TjXf4LC2ZLt5FQtU'
-    destination = 'data/ff3_kospi_kosdaq_kor.csv'
-    GoogleDriveDownloader(file_id, destination)
-
-    ff3 = pd.read_csv(destination)
-
-    ff3 = ff3.set_index(keys=ff3.columns[0])
-    ff3.index = [datetime.strptime(idx, '%Y-%m-%d') for idx in ff3.index]
-    ff3.index.name='Date'
-    ff3 = ff3.rename(columns={'Mkt-Rf': 'Mkt'})
+    # Factor data (downloaded once and cached, data may not be accurate), or given factors
+    ff3 = FactorRepository(data_path).ff3() if factors is None else factors
     
     
     ff3 = ff3.drop(['Rf'], axis=1)
@@ -113,6 +201,8 @@ def FamaMacbeth(market, tickers, tools='statsmodels', plot_return=False):
         return FamaMacbeth_linearmodels(ff3_m_, portfolio_returns_, plot_return)
     elif tools == 'statsmodels':
         return FamaMacbeth_statsmodels(ff3_m_, portfolio_returns_, plot_return)
+    elif tools == 'numpy':
+        return FamaMacbeth_numpy(ff3_m_, portfolio_returns_, plot_return)
 
     
 def FamaMacbeth_linearmodels(ff3, returns, plot_return=False):
@@ -139,3 +229,73 @@ def FamaMacbeth_statsmodels(ff3, returns, plot_return=False):
                     exog=betas, missing='drop').fit()
         lambdas.append(lmda.params)
     return betas, lambdas
+
+
+def newey_west(series, lags=None):
+    ''' Newey-West standard errors of the means of the columns of series [T x k]
+    args:
+        lags: number of lags (default: floor(4 * (T / 100) ** (2 / 9)))
+    '''
+    values = np.asarray(series, dtype='float64')
+    num_periods = len(values)
+    if lags is None:
+        lags = int(4 * (num_periods / 100) ** (2 / 9))
+    demeaned = values - values.mean(axis=0)
+    covariance = demeaned.T @ demeaned / num_periods
+    for lag in range(1, lags + 1):
+        gamma = demeaned[lag:].T @ demeaned[:-lag] / num_periods
+        covariance += (1 - lag / (lags + 1)) * (gamma + gamma.T)
+    return np.sqrt(np.diag(covariance) / num_periods)
+
+
+def FamaMacbeth_numpy(ff3, returns, plot_return=False):
+    ''' Both passes of FamaMacbeth_statsmodels as batched least squares (same betas and lambdas)
+    Missing values are dropped as in statsmodels: per asset in the first pass, per period in the second.
+    returns:
+        betas: DataFrame of [asset x factor]
+        lambdas: list of Series [factor], risk premia of each cross-sectional regression
+                 (as FamaMacbeth_statsmodels; all NaN for a period whose betas are rank deficient)
+    An asset with a singular first-pass design has NaN betas and is left out of the second pass.
+    '''
+    y = returns.values.astype('float64')
+    f = ff3.loc[returns.index].values.astype('float64')
+    x = np.hstack([np.ones((len(f), 1)), f])
+
+    # First pass: one multi-RHS regression, each asset over its own valid periods
+    valid = ~np.isnan(y) & ~np.isnan(x).any(axis=1)[:, None]
+    mask = valid.astype('float64')
+    filled_x = np.nan_to_num(x)
+    xtx = np.einsum('ti,tj,tk->ijk', mask, filled_x, filled_x)
+    xty = np.einsum('ti,tj->ij', np.where(valid, y, 0.0), filled_x)
+    fitted = valid.sum(axis=0) > x.shape[1]
+    fitted[fitted] = np.linalg.matrix_rank(xtx[fitted]) == x.shape[1]
+    coefs = np.full((y.shape[1], x.shape[1]), np.nan)
+    coefs[fitted] = np.linalg.solve(xtx[fitted], xty[fitted][..., None])[..., 0]
+    betas = pd.DataFrame(coefs[:, 1:], index=returns.columns, columns=ff3.columns)
+
+    # Second pass: cross-sectional regressions of all periods, batched
+    cross = ~np.isnan(y) & fitted
+    b = np.nan_to_num(coefs[:, 1:])
+    btb = np.einsum('tn,nj,nk->tjk', cross.astype('float64'), b, b)
+    bty = np.where(cross, y, 0.0) @ b
+    solvable = cross.sum(axis=1) >= b.shape[1]
+    solvable[solvable] = np.linalg.matrix_rank(btb[solvable]) == b.shape[1]
+    premia = np.full((len(y), b.shape[1]), np.nan)
+    premia[solvable] = np.linalg.solve(btb[solvable], bty[solvable][..., None])[..., 0]
+    lambdas = [pd.Series(premium, index=ff3.columns) for premium in premia]
+    return betas, lambdas
+
+
+def FamaMacbeth_summary(lambdas, lags=None):
+    ''' Mean risk premia of the cross-sectional regressions with Newey-West standard errors
+    args:
+        lambdas: list of Series [factor] (second output of FamaMacbeth) or DataFrame of [period x factor]
+        lags: see newey_west
+    returns:
+        DataFrame of [factor x ('premium', 'std_err', 't_stat')]
+    '''
+    estimated = pd.DataFrame(lambdas).dropna()
+    premium = estimated.mean().values
+    std_err = newey_west(estimated.values, lags)
+    return pd.DataFrame({'premium': premium, 'std_err': std_err, 't_stat': premium / std_err},
+                        index=estimated.columns)
@@ -1,2 +1,4 @@
-from finml.asset_pricing.CAPM import CAPM
-from finml.asset_pricing.FamaFrench3 import FamaFrench3, FamaMacbeth
+from finml.asset_pricing.CAPM import CAPM, capm_regression
+from finml.asset_pricing.FamaFrench3 import FamaFrench3, FamaMacbeth, FamaMacbeth_summary, FamaFrench3_table, FamaFrench3_results, ff3_regression
+from finml.asset_pricing.rolling import rolling_regression, rolling_beta
+from finml.asset_pricing.factors import FactorRepository, construct_ff3
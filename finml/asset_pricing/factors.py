@@ -0,0 +1,202 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+from finml.utils import GoogleDriveDownloader, set_path
+from finml.data_reader.indicators import UNIT
+
+FF3_FILE_ID = '10VLyoL0YO7Q_jPW_TjXf4LC2ZLt5FQtU' # Fama French 3 factor in korea (kospi & kosdaq)
+
+
+class FactorRepository:
+    ''' Local cache of parsed factor returns [date x factor]
+    <name>.npz: dates (datetime64[ns]) and values (float64) in binary
+    <name>.json: factor names, sha256 checksum of the arrays and the source
+    A file whose checksum does not match is ignored (rebuilt or downloaded again).
+    args:
+        data_path: the repository is <data_path>/factors
+    '''
+    def __init__(self, data_path='data'):
+        self.path_dir = set_path(os.path.join(data_path, 'factors'))
+
+    def path(self, name, suffix):
+        return os.path.join(self.path_dir, name + suffix)
+
+    @staticmethod
+    def checksum(dates, values):
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(dates).tobytes())
+        digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()
+
+    def save(self, name, frame, source=''):
+        dates = np.asarray(frame.index.values).astype('datetime64[ns]')
+        values = np.ascontiguousarray(frame.values, dtype='float64')
+        fd, tmp_path = tempfile.mkstemp(dir=self.path_dir, prefix='.tmp_', suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, dates=dates, values=values)
+            os.replace(tmp_path, self.path(name, '.npz'))
+        except:
+            os.remove(tmp_path)
+            raise
+
+        # The sidecar is written last: a factor file is valid only once it is complete
+        meta = {'columns': [str(col) for col in frame.columns],
+                'checksum': self.checksum(dates, values),
+                'source': source}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path_dir, prefix='.tmp_', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.path(name, '.json'))
+
+    def load(self, name):
+        ''' returns: DataFrame of [date x factor], None if not cached or corrupted '''
+        if not os.path.exists(self.path(name, '.json')) or not os.path.exists(self.path(name, '.npz')):
+            return None
+        with open(self.path(name, '.json')) as f:
+            meta = json.load(f)
+        try:
+            with np.load(self.path(name, '.npz')) as arrays:
+                dates, values = arrays['dates'], arrays['values']
+        except Exception: # truncated or corrupted archive
+            dates, values = np.zeros(0), np.zeros(0)
+        if self.checksum(dates, values) != meta['checksum']:
+            print('Checksum mismatch: %s' %self.path(name, '.npz'))
+            return None
+        index = pd.DatetimeIndex(dates, name='Date')
+        return pd.DataFrame(values, index=index, columns=meta['columns'])
+
+    def ff3(self, refresh=False):
+        ''' Korean Fama-French 3 factors (daily; Mkt, SMB, HML, Rf), downloaded only if not cached '''
+        name = 'ff3_kospi_kosdaq_kor'
+        factors = None if refresh else self.load(name)
+        if factors is None:
+            print('Download factor data (data may not be accurate)...')
+            destination = self.path(name, '.csv')
+            GoogleDriveDownloader(FF3_FILE_ID, destination)
+            factors = parse_factor_csv(destination)
+            self.save(name, factors, source='google drive: %s' %FF3_FILE_ID)
+            os.remove(destination)
+        return factors
+
+    def build_ff3(self, market, risk_free=0.0, name='ff3_krx', initialize=False):
+        ''' Fama-French 3 factors constructed from the market data (offline), updated incrementally:
+        only dates after the last cached date are computed
+        args:
+            market: initialized market CLASS instance with prices, fss and shares
+            risk_free: annual risk free rate
+        '''
+        cached = None if initialize else self.load(name)
+        start = cached.index[-1] if cached is not None and len(cached) > 0 else None
+        factors = construct_ff3(market.prices, market.fss, market.shares, risk_free, start)
+        if cached is not None:
+            factors = pd.concat([cached, factors], axis=0)
+        self.save(name, factors, source='constructed')
+        return factors
+
+
+def parse_factor_csv(path):
+    ''' Factor CSV of [date x factor] with 'Mkt-Rf' renamed to 'Mkt' '''
+    factors = pd.read_csv(path, index_col=0)
+    factors.index = pd.to_datetime(factors.index, format='%Y-%m-%d')
+    factors.index.name = 'Date'
+    return factors.rename(columns={'Mkt-Rf': 'Mkt'}).astype('float64')
+
+
+def _fiscal_year_ends(periods):
+    ''' Period labels of statements ('2020/12', '2020/12(E)', ...) to dates, NaT if not parsed '''
+    matched = pd.Series(periods.astype(str)).str.extract(r'(\d{4})/(\d{2})')
+    return pd.to_datetime(matched[0] + '-' + matched[1], format='%Y-%m', errors='coerce') + pd.offsets.MonthEnd(0)
+
+
+def construct_ff3(prices, fss, shares, risk_free=0.0, start=None):
+    ''' Fama-French 3 factors from prices, book equity ('자본' of fss) and shares
+    Portfolios are formed at the end of each June (2 size x 3 book-to-market groups) with
+    the size at that date and the book equity of the fiscal year ending in the previous December
+    (or before), and held value-weighted from July to the next June: the weights of the formation
+    date drift with the returns of the stocks (buy and hold).
+    Market caps at formation use the shares known at that date if shares is a history. With a Series
+    of current shares (market.shares, the history is not scraped) past market caps are approximated
+    with today's shares: issues and buybacks since then leak into the size and book-to-market sorts.
+    args:
+        prices: DataFrame of prices [date x ticker]
+        fss: FinancialPanel (or dict of [ticker x period] DataFrames)
+        shares: Series of current number of issued shares per ticker,
+                or DataFrame of [date x ticker] of the number of shares from each date on
+        risk_free: annual risk free rate
+        start: only dates after start are returned
+    returns:
+        DataFrame of [date x ('Mkt', 'SMB', 'HML', 'Rf')], Mkt is the excess return of the market
+    '''
+    if '자본' not in fss:
+        raise ValueError('book equity (자본) is not in financial statements')
+    listed = shares.columns if isinstance(shares, pd.DataFrame) else shares.index
+    tickers = prices.columns.intersection(listed).intersection(fss['자본'].index)
+    prices = prices[tickers]
+    returns = prices.pct_change(fill_method=None)
+    if isinstance(shares, pd.DataFrame):
+        shares = shares[tickers].sort_index().reindex(prices.index, method='ffill').values
+    else:
+        shares = shares.reindex(tickers).values
+    market_caps = prices * shares
+    book = fss['자본'].reindex(tickers)
+    year_ends = _fiscal_year_ends(book.columns)
+
+    dates = returns.index
+    columns = list()
+    for year in range(dates[0].year - 1, dates[-1].year + 1):
+        hold_from, hold_to = pd.Timestamp(year, 7, 1), pd.Timestamp(year + 1, 6, 30, 23, 59)
+        if hold_to < dates[0] or (start is not None and hold_to <= start) or hold_from > dates[-1]:
+            continue
+        lo, hi = dates.searchsorted(hold_from), dates.searchsorted(hold_to, side='right')
+        formation = dates.searchsorted(pd.Timestamp(year, 6, 30, 23, 59), side='right') - 1
+        december = dates.searchsorted(pd.Timestamp(year - 1, 12, 31, 23, 59), side='right') - 1
+        if formation < 0 or december < 0 or lo >= hi:
+            continue
+
+        # Book equity of the last fiscal year ending before the formation year
+        available = np.nonzero((year_ends <= pd.Timestamp(year - 1, 12, 31)).values)[0]
+        if len(available) == 0:
+            continue
+        equity = pd.to_numeric(book.iloc[:, available[-1]], errors='coerce').values * UNIT
+        size = market_caps.iloc[formation].values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bm = equity / market_caps.iloc[december].values
+        eligible = (size > 0) & (bm > 0) & np.isfinite(bm)
+        if eligible.sum() < 6:
+            continue
+
+        small = size <= np.median(size[eligible])
+        low, high = np.percentile(bm[eligible], [30, 70])
+        groups = [bm <= low, (bm > low) & (bm <= high), bm > high]
+        # Columns of weights: market, S/L, S/M, S/H, B/L, B/M, B/H
+        members = [eligible] + [eligible & s & g for s in [small, ~small] for g in groups]
+        weights = np.stack([np.where(m, size, 0.0) for m in members], axis=1)
+
+        # Weights drift with the returns since formation (a missing return leaves a stock out that day)
+        segment = returns.values[lo:hi]
+        valid = ~np.isnan(segment)
+        growth = np.cumprod(np.where(valid, 1 + segment, 1.0), axis=0)
+        drift = np.vstack([np.ones((1, len(tickers))), growth[:-1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            portfolio = ((np.where(valid, segment, 0.0) * drift) @ weights) / ((valid * drift) @ weights)
+        columns.append(pd.DataFrame(portfolio, index=dates[lo:hi]))
+
+    if len(columns) == 0:
+        return pd.DataFrame(columns=['Mkt', 'SMB', 'HML', 'Rf'], dtype='float64')
+    portfolios = pd.concat(columns, axis=0)
+    index, portfolios = portfolios.index, portfolios.values
+    rf = risk_free / 252
+    factors = pd.DataFrame({'Mkt': portfolios[:, 0] - rf,
+                            'SMB': portfolios[:, 1:4].mean(axis=1) - portfolios[:, 4:7].mean(axis=1),
+                            'HML': portfolios[:, [3, 6]].mean(axis=1) - portfolios[:, [1, 4]].mean(axis=1),
+                            'Rf': rf},
+                           index=index)
+    factors.index.name = 'Date'
+    if start is not None:
+        factors = factors[factors.index > start]
+    return factors
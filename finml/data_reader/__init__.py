@@ -3,4 +3,11 @@ DATA READER
 """
 
 from finml.data_reader.stockmarket import StockMarket
-from finml.data_reader.getdata import GetInitData
\ No newline at end of file
+from finml.data_reader.getdata import GetInitData
+from finml.data_reader.store import PickleStore, NpyStore
+from finml.data_reader.fspanel import FinancialPanel
+from finml.data_reader.scraper import Scraper
+from finml.data_reader.indicators import compute_indicators, INDICATORS
+from finml.data_reader.manifest import JobManifest
+from finml.data_reader.symbolcache import SymbolCache
+from finml.data_reader.fundamentals import FundamentalsStore
@@ -0,0 +1,123 @@
+''' Essential packages '''
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+import pandas_datareader as pdr
+
+
+class RateLimiter:
+    ''' Token bucket shared by every worker hitting the same source
+    args:
+        rate: number of requests allowed per second
+        burst: maximum number of requests sent back-to-back (default: rate)
+    '''
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate, burst=None):
+        ''' Change the rate; tokens accumulated so far are kept (up to the new capacity) '''
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.rate = float(rate)
+            self.capacity = float(burst if burst is not None else max(1, rate))
+            self.tokens = min(self.tokens, self.capacity)
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# One limiter per source, so concurrent fetchers do not exceed the source limit together
+_rate_limiters = dict()
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(source, rate):
+    ''' Shared limiter of the source, set to the rate of the latest request for it '''
+    with _rate_limiters_lock:
+        if source not in _rate_limiters:
+            _rate_limiters[source] = RateLimiter(rate)
+        elif _rate_limiters[source].rate != float(rate):
+            _rate_limiters[source].set_rate(rate)
+        return _rate_limiters[source]
+
+
+def make_session(pool_size=8):
+    ''' requests.Session keeping up to pool_size connections alive per host '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class PriceFetcher:
+    ''' Download daily data of many tickers with bounded concurrency
+    args:
+        source: data source of pandas-datareader ('naver', ...)
+        num_workers: number of concurrent downloads
+        rate: maximum number of requests per second to the source
+        max_retries: number of retries after the first failure
+        backoff: base delay (seconds) of the exponential backoff between retries
+        reader: function (ticker, start, end, session) -> DataFrame,
+                replaces pdr.DataReader (e.g. a local stub source)
+    '''
+    def __init__(self, source='naver', num_workers=8, rate=10, max_retries=3, backoff=0.5, reader=None):
+        self.source = source
+        self.num_workers = num_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.reader = reader if reader is not None else self._datareader
+        self.rate_limiter = get_rate_limiter(source, rate)
+        self.session = make_session(num_workers)
+
+    def _datareader(self, ticker, start, end, session):
+        return pdr.DataReader(ticker, self.source, start=start, end=end, retry_count=0, session=session)
+
+    def fetch(self, ticker, start, end):
+        ''' Download a single ticker, retrying with exponential backoff (and jitter) '''
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.reader(ticker, start, end, self.session)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    def fetch_many(self, tickers, start, end):
+        ''' Download tickers concurrently
+        args:
+            start: datetime, or dict of {ticker: datetime} to fetch a different period per ticker
+        returns:
+            generator of (ticker, data, error) in the order of completion,
+            data is None if the download failed and error holds the exception
+        '''
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            starts = start if isinstance(start, dict) else dict.fromkeys(tickers, start)
+            futures = {executor.submit(self.fetch, ticker, starts[ticker], end): ticker for ticker in tickers}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    yield ticker, future.result(), None
+                except Exception as e:
+                    yield ticker, None, e
+
+    def close(self):
+        self.session.close()
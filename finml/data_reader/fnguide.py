@@ -0,0 +1,69 @@
+''' Parsers of fnguide pages (module-level, so they can run in a process pool) '''
+from io import StringIO
+import pandas as pd
+from lxml.html import fromstring
+
+BASE_URL = 'http://comp.fnguide.com'
+FINANCE_PATH = '/SVO2/ASP/SVD_Finance.asp?pGB=1&gicode=A%s'
+MAIN_PATH = '/SVO2/ASP/SVD_main.asp?pGB=1&gicode=A%s'
+FINANCE_URL = BASE_URL + FINANCE_PATH
+MAIN_URL = BASE_URL + MAIN_PATH
+
+
+def parse_finance(text):
+    ''' Annual financial statement from the finance page
+    returns:
+        DataFrame [element x period], None if the page has no statement
+    '''
+    # fs_tables consists of:
+    # [0]: Income statement (annual)
+    # [1]: Income statement (quarterly)
+    # [2]: Balance sheet (annual)
+    # [3]: Balance sheet (quarterly)
+    # [4]: Statement of cash flow (annual)
+    # [5]: Statement of cash flow (quarterly)
+    try:
+        fs_tables = pd.read_html(StringIO(text), displayed_only=False)
+        if len(fs_tables) != 6:
+            fs_tables.pop(2)
+    except:
+        return None
+
+    # We only use annual information
+    is_data = fs_tables[0]
+    bs_data = fs_tables[2]
+    cf_data = fs_tables[4]
+
+    # Remove '전년동기', '전년동기(%)' columns in is_data
+    is_data = is_data.drop(columns = ['전년동기', '전년동기(%)'])
+
+    # Concatenation
+    fs_data = pd.concat([is_data, bs_data, cf_data], axis = 0)
+
+    # Refinement
+    fs_data.iloc[:, 0] = fs_data.iloc[:, 0].str.replace('계산에 참여한 계정 펼치기', '', regex=False)
+    fs_data = fs_data.drop_duplicates(fs_data.columns[0], keep='first')
+    fs_data = fs_data.set_index(keys=fs_data.columns[0])
+    last_col = fs_data.columns[-1] # last quarter
+    fs_data = fs_data.drop(columns=last_col)
+    #valid_cols = [col for col in fs_data.columns if col.endswith('/12')]
+    #fs_data = fs_data[valid_cols]
+
+    return fs_data
+
+
+def parse_main(text):
+    ''' Price and number of issued (common) shares from the main page
+    returns:
+        (price, num_issued), None if the page cannot be parsed
+    '''
+    try:
+        parser = fromstring(text)
+        xpath_price = '//*[@id="svdMainChartTxt11"]'
+        xpath_num_issued = '//*[@id="svdMainGrid1"]/table/tbody/tr[7]/td[1]'
+        price = float(parser.xpath(xpath_price)[0].text.replace(',',''))
+        num_issued = float(parser.xpath(xpath_num_issued)[0].text.split('/')[0].replace(',','')) # only common share
+    except:
+        return None
+
+    return price, num_issued
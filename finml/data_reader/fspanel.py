@@ -0,0 +1,60 @@
+''' Essential packages '''
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+
+class FinancialPanel(Mapping):
+    ''' Financial statements of all tickers as one [ticker x element x period] float64 array
+    Behaves like the former dict of DataFrames: panel[element] is a [ticker x period]
+    DataFrame viewing the array (no copy). The view is read-only: copy it to modify it.
+    args:
+        values: array of size [len(tickers), len(elements), len(periods)]
+        tickers, elements, periods: labels of each axis
+    '''
+    def __init__(self, values, tickers, elements, periods):
+        self.values = np.asarray(values, dtype='float64')
+        self.tickers = pd.Index(tickers)
+        self.elements = pd.Index(elements)
+        self.periods = pd.Index(periods)
+
+    @classmethod
+    def from_frames(cls, fs_datas, elements, periods):
+        ''' Stack per-ticker statements in a single pass
+        args:
+            fs_datas: dict of {ticker: DataFrame [element x period]}
+            elements, periods: axes of the panel, each statement is reindexed to them
+        '''
+        elements, periods = pd.Index(elements), pd.Index(periods)
+        values = np.full((len(fs_datas), len(elements), len(periods)), np.nan)
+        for idx, fs_data in enumerate(fs_datas.values()):
+            fs_data = fs_data[~fs_data.index.duplicated(keep='first')]
+            fs_data = fs_data.loc[:, ~fs_data.columns.duplicated(keep='first')]
+            fs_data = fs_data.reindex(index=elements, columns=periods)
+            values[idx] = fs_data.apply(pd.to_numeric, errors='coerce').values
+        return cls(values, list(fs_datas.keys()), elements, periods)
+
+    def __getitem__(self, element):
+        # A new frame each time: a caller replacing its columns does not change the panel for others
+        values = self.values[:, self.elements.get_loc(element), :]
+        values.flags.writeable = False
+        return pd.DataFrame(values, index=self.tickers, columns=self.periods, copy=False)
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __contains__(self, element):
+        return element in self.elements
+
+    def to_dict(self):
+        return {element: self[element] for element in self.elements}
+
+    def __getstate__(self):
+        return {'values': self.values, 'tickers': self.tickers,
+                'elements': self.elements, 'periods': self.periods}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -0,0 +1,190 @@
+''' Essential packages '''
+import os
+import sqlite3
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from finml.data_reader.fspanel import FinancialPanel
+
+
+def period_ends(periods):
+    ''' Period labels of statements ('2020/12', ...) to fiscal period ends, NaT for estimates ('(E)') or unparsed '''
+    periods = pd.Series(periods, dtype='object').astype(str)
+    matched = periods.str.extract(r'^(\d{4})/(\d{2})$')
+    return pd.to_datetime(matched[0] + '-' + matched[1], format='%Y-%m', errors='coerce') + pd.offsets.MonthEnd(0)
+
+
+def _date(date):
+    return pd.Timestamp(date).strftime('%Y-%m-%d')
+
+
+class FundamentalsStore:
+    ''' Point-in-time financial statements in SQLite, append-only and versioned
+    A value is keyed by (ticker, item, period, available_from): a new version is appended only when
+    a scraped value differs from the latest known one, so history is never overwritten.
+    The first version of a period is dated back to the end of the period plus the reporting lag
+    (if it was observed later than that), a revised value is available from the date it was observed.
+    As-of queries read the latest version of each key at a date with one seek on the primary key.
+    args:
+        path: SQLite file
+        lag_days: assumed reporting lag after the end of a fiscal period (annual reports: 90 days)
+    '''
+    def __init__(self, path, lag_days=90):
+        self.path = path
+        self.lag_days = lag_days
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS facts (
+                ticker TEXT NOT NULL, item TEXT NOT NULL, period TEXT NOT NULL, available_from TEXT NOT NULL,
+                value REAL NOT NULL, observed TEXT NOT NULL,
+                PRIMARY KEY (ticker, item, period, available_from)) WITHOUT ROWID''')
+            self.connection.execute('''CREATE INDEX IF NOT EXISTS facts_item
+                ON facts (item, ticker, period, available_from)''')
+            # Scraped files already recorded (by modification time and size)
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS sources (
+                name TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)''')
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM facts').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __getstate__(self):
+        return {'path': self.path, 'lag_days': self.lag_days}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def query(self, as_of=None, items=None, tickers=None):
+        ''' Latest version of each (ticker, item, period) available at as_of
+        args:
+            as_of: date (default: every version, i.e. the latest values)
+            items, tickers: lists to restrict the query (default: all)
+        returns:
+            DataFrame of ['ticker', 'item', 'period', 'value', 'available_from']
+        '''
+        as_of = '9999-12-31' if as_of is None else _date(as_of)
+        conditions, params = ['available_from <= ?'], [as_of]
+        if items is not None:
+            items = list(items)
+            conditions.append('item IN (%s)' %','.join('?' * len(items)))
+            params += items
+        if tickers is not None:
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS query_tickers (ticker TEXT PRIMARY KEY)')
+            self.connection.execute('DELETE FROM query_tickers')
+            self.connection.executemany('INSERT OR IGNORE INTO query_tickers VALUES (?)', [(str(t),) for t in tickers])
+            conditions.append('ticker IN (SELECT ticker FROM query_tickers)')
+
+        # Keys known at as_of, each with its latest version found by a descending seek on the primary key
+        rows = self.connection.execute('''SELECT keys.ticker, keys.item, keys.period, facts.value, facts.available_from
+            FROM (SELECT DISTINCT ticker, item, period FROM facts WHERE %s) AS keys
+            JOIN facts ON facts.ticker = keys.ticker AND facts.item = keys.item AND facts.period = keys.period
+            AND facts.available_from = (SELECT latest.available_from FROM facts AS latest
+                WHERE latest.ticker = keys.ticker AND latest.item = keys.item AND latest.period = keys.period
+                AND latest.available_from <= ? ORDER BY latest.available_from DESC LIMIT 1)'''
+            %' AND '.join(conditions), params + [as_of]).fetchall()
+        facts = pd.DataFrame(rows, columns=['ticker', 'item', 'period', 'value', 'available_from'])
+        return facts.astype({'value': 'float64'})
+
+    def as_of(self, date, items=None, tickers=None):
+        ''' Financial statements known at the date, as a FinancialPanel (like market.fss)
+        Periods are sorted, and a period not reported yet by a ticker is NaN. '''
+        facts = self.query(date, items, tickers)
+        ticker_codes, ticker_labels = pd.factorize(facts['ticker'], sort=True)
+        item_codes, item_labels = pd.factorize(facts['item'], sort=True)
+        period_codes, period_labels = pd.factorize(facts['period'], sort=True)
+        if items is not None:
+            item_codes = pd.Index(items).get_indexer(item_labels)[item_codes]
+            item_labels = pd.Index(items)
+        values = np.full((len(ticker_labels), len(item_labels), len(period_labels)), np.nan)
+        values[ticker_codes, item_codes, period_codes] = facts['value'].values
+        return FinancialPanel(values, ticker_labels, item_labels, period_labels)
+
+    def history(self, ticker, item, period=None):
+        ''' Every version of an item of a ticker, DataFrame of ['period', 'available_from', 'value', 'observed'] '''
+        sql = 'SELECT period, available_from, value, observed FROM facts WHERE ticker = ? AND item = ?'
+        params = [ticker, item]
+        if period is not None:
+            sql += ' AND period = ?'
+            params.append(period)
+        rows = self.connection.execute(sql + ' ORDER BY period, available_from', params).fetchall()
+        return pd.DataFrame(rows, columns=['period', 'available_from', 'value', 'observed'])
+
+    def record(self, fs_datas, observed=None):
+        ''' Append the values that are new or differ from the latest version
+        args:
+            fs_datas: dict of {ticker: DataFrame [item x period]} as scraped
+            observed: date the statements were scraped (default: now)
+        returns:
+            number of appended versions
+        '''
+        observed = pd.Timestamp(datetime.now() if observed is None else observed).normalize()
+        frames = list()
+        for ticker, fs_data in fs_datas.items():
+            fs_data = fs_data[~fs_data.index.duplicated(keep='first')]
+            fs_data = fs_data.loc[:, ~fs_data.columns.duplicated(keep='first')]
+            values = fs_data.apply(pd.to_numeric, errors='coerce').stack().dropna()
+            if len(values):
+                frames.append(pd.DataFrame({'ticker': str(ticker),
+                                            'item': values.index.get_level_values(0).astype(str),
+                                            'period': values.index.get_level_values(1).astype(str),
+                                            'value': values.values.astype('float64')}))
+        if len(frames) == 0:
+            return 0
+        new = pd.concat(frames, ignore_index=True)
+
+        # Compare with the latest versions of the same tickers
+        keys = ['ticker', 'item', 'period']
+        latest = self.query(tickers=new['ticker'].unique())
+        merged = new.merge(latest[keys + ['value']].rename(columns={'value': 'latest'}), on=keys, how='left')
+        first = merged['latest'].isna().values
+        changed = first | ~np.isclose(merged['value'].values, merged['latest'].values, rtol=1e-9, equal_nan=True)
+        merged = merged[changed]
+        first = first[changed]
+
+        # First versions: available from the end of the period + reporting lag (if observed after it)
+        reported = (period_ends(merged['period'].values) + pd.Timedelta(days=self.lag_days)).values
+        available = np.full(len(merged), observed.to_datetime64())
+        backdate = first & ~np.isnat(reported) & (reported < available)
+        available[backdate] = reported[backdate]
+        merged = merged.assign(available_from=pd.DatetimeIndex(available).strftime('%Y-%m-%d'),
+                               observed=_date(observed))
+
+        with self.connection:
+            cursor = self.connection.executemany(
+                'INSERT OR IGNORE INTO facts VALUES (?, ?, ?, ?, ?, ?)',
+                merged[keys + ['available_from', 'value', 'observed']].itertuples(index=False, name=None))
+        return cursor.rowcount
+
+    def is_recorded(self, name, path):
+        ''' True if the file was recorded with its current modification time and size '''
+        stat = os.stat(path)
+        row = self.connection.execute('SELECT mtime, size FROM sources WHERE name = ?', (name,)).fetchone()
+        return row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size
+
+    def record_files(self, paths):
+        ''' Record scraped statement files (pickled DataFrames [item x period]) not recorded yet
+        Each file is observed at its modification time.
+        args:
+            paths: dict of {ticker: path of pickle}
+        returns:
+            number of appended versions
+        '''
+        by_date = dict()
+        for ticker, path in paths.items():
+            if os.path.exists(path) and not self.is_recorded(ticker, path):
+                observed = pd.Timestamp(os.path.getmtime(path), unit='s').normalize()
+                by_date.setdefault(observed, dict())[ticker] = path
+
+        # Dates in order: a revision is compared with the versions observed before it
+        num_appended = 0
+        for observed in sorted(by_date):
+            fs_datas = {ticker: pd.read_pickle(path) for ticker, path in by_date[observed].items()}
+            num_appended += self.record(fs_datas, observed)
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO sources VALUES (?, ?, ?)',
+                                            [(ticker, os.stat(path).st_mtime, os.stat(path).st_size)
+                                             for ticker, path in by_date[observed].items()])
+        return num_appended
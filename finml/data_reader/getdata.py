@@ -1,33 +1,74 @@
 import os
 from tqdm import tqdm
 import pickle as pkl
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
-import pandas_datareader as pdr
-import requests
-import lxml
-from lxml.html import fromstring
 
 from math import nan
 import numpy as np
 
+from finml.data_reader.fetcher import PriceFetcher
+from finml.data_reader.store import get_store
+from finml.data_reader.fspanel import FinancialPanel
+from finml.data_reader.fundamentals import FundamentalsStore
+from finml.data_reader.scraper import Scraper
+from finml.data_reader.fnguide import BASE_URL, FINANCE_PATH, MAIN_PATH, parse_finance, parse_main
+from finml.data_reader.indicators import compute_indicators
+from finml.data_reader.manifest import JobManifest
+from finml.portfolio_optimization.covariance import estimate_covariance, FactorCovariance
+from finml.utils.frame_utils import assemble_frame
+from finml.utils.path_utils import atomic_dump
+from finml.utils.cache import LRUCache
+
 
 class GetInitData:
-    def __init__(self, source='krx', data_path = 'data'):
+    def __init__(self, source='krx', data_path = 'data', storage='pickle', scraper=None, cache_bytes=2**30):
         '''
         args:
             source: name of data source ('krx', ...)
+            storage: storage of the price/volume matrices, one from ['pickle', 'npy']
+                     ('npy': memory-mapped float64 arrays, which can be shared between processes)
+            scraper: Scraper of web pages (default: pages are cached under <data_path>/<source>/html;
+                     Scraper(base_url=...) points the scraping at another host, e.g. a local fixture server)
+            cache_bytes: memory bound of cached returns and their statistics
         '''
         self.source = source
         self.tickers = None
+        self.return_cache = LRUCache(cache_bytes)
         self.prices = pd.DataFrame()
         self.volumes = pd.DataFrame()
         self.fss = dict()
         self.indicators = pd.DataFrame()
+        self.delisted = pd.Series(dtype='datetime64[ns]')
+        self.shares = pd.Series(dtype='float64')
         
         self.data_path = os.path.join(data_path, self.source)
         if not os.path.exists(self.data_path):
             os.makedirs(self.data_path)
+        self.store = get_store(storage, self.data_path)
+        self.scraper = scraper
+        self._fundamentals = None
+
+    @property
+    def prices(self):
+        return self._prices
+
+    @prices.setter
+    def prices(self, prices):
+        # Cached returns are computed from the previous prices
+        self._prices = prices
+        self.return_cache.clear()
+
+    @property
+    def fundamentals(self):
+        ''' Point-in-time store of financial statements (<data_path>/fundamentals.sqlite) '''
+        if self._fundamentals is None:
+            self._fundamentals = FundamentalsStore(os.path.join(self.data_path, 'fundamentals.sqlite'))
+        return self._fundamentals
+
+    def cache_info(self):
+        ''' Hit/miss counters and size of the return cache '''
+        return self.return_cache.info()
     
     def get_tickers(self, initialize=False):
         ''' Get tickers from the given source
@@ -66,18 +107,31 @@ class GetInitData:
     def get_prices_and_volumes(self, 
                    start=datetime(2010, 1, 1), 
                    end=datetime.now(), 
-                   initialize=False):
+                   initialize=False,
+                   update=False,
+                   num_workers=8,
+                   rate_limit=10,
+                   reader=None,
+                   retry_failed=False):
         ''' Get stock prices & volumes with pandas-datareader
+        Downloads are recorded in a job manifest (manifest_prices.json): an interrupted run
+        is resumed by calling it again, skipping the tickers already stored.
         args:
             initialize: if True, ignore existing price data and initialize 
+            update: if True, download only the dates after the last stored date of each ticker
+                    (newly listed tickers from start) and merge them into the existing data
+            retry_failed: if True, download only the tickers failed in the last run of the same job
+                          (the last update if update, else the last full download) and rebuild the matrices
+            num_workers: number of concurrent downloads
+            rate_limit: maximum number of requests per second to the source
+            reader: function (ticker, start, end, session) -> DataFrame, replaces pdr.DataReader
         '''
         if self.tickers is None:
             raise ValueError('ticker is not initialized')
         
         price_path = os.path.join(self.data_path, 'price')
-        prices_path = os.path.join(self.data_path, 'prices.pkl')
         volume_path = os.path.join(self.data_path, 'volume')
-        volumes_path = os.path.join(self.data_path, 'volumes.pkl')
+        delisted_path = os.path.join(self.data_path, 'delisted.pkl')
         
         if not os.path.exists(price_path):
             os.makedirs(price_path)
@@ -85,43 +139,175 @@ class GetInitData:
         if not os.path.exists(volume_path):
             os.makedirs(volume_path)
             
-        if not os.path.exists(prices_path) or initialize == True:
+        # retry_failed reopens the manifest of the job selected by initialize/update
+        if not self.store.exists('prices') or initialize == True or (retry_failed == True and update == False):
             print('Get prices/volumes from [naver] ...', end='')
             if self.source == 'krx':
-                for ticker in tqdm(list(self.tickers['종목코드'])+['KOSPI', 'KPI200', 'KOSDAQ']):
-                    cv = pdr.DataReader(ticker, 'naver', start=start, end=end)[['Close', 'Volume']]
-                    cv = cv.astype('float64')
-                    price_data = cv[['Close']].rename(columns={'Close': ticker})
-                    volume_data = cv[['Volume']].rename(columns={'Volume': ticker})
-
-                    with open(os.path.join(price_path, ticker)+'.pkl', 'wb') as f:
-                        pkl.dump(price_data, f)
-                    with open(os.path.join(volume_path, ticker)+'.pkl', 'wb') as f:
-                        pkl.dump(volume_data, f)
-                    self.prices = pd.concat([self.prices, price_data], axis=1)
-                    self.volumes = pd.concat([self.volumes, volume_data], axis=1)
-                self.prices = self.prices.astype('float64')
-                self.volumes = self.volumes.astype('float64')
+                tickers = list(self.tickers['종목코드'])+['KOSPI', 'KPI200', 'KOSDAQ']
+                manifest = self._manifest('prices', retry_failed)
+                pending = manifest.pending(tickers, lambda ticker: os.path.join(price_path, ticker)+'.pkl')
+                price_datas, volume_datas = self._download_prices_and_volumes(
+                    pending, start, end, num_workers, rate_limit, reader, manifest=manifest)
+
+                # Tickers done in a previous (interrupted) run are read from their shards
+                # Keep the order of tickers regardless of the order of completion
+                done = manifest.done(tickers)
+                price_datas.update(self._load_shards(price_path, [t for t in done if t not in price_datas]))
+                volume_datas.update(self._load_shards(volume_path, [t for t in done if t not in volume_datas]))
+                self.prices = assemble_frame({ticker: price_datas[ticker] for ticker in done})
+                self.volumes = assemble_frame({ticker: volume_datas[ticker] for ticker in done}, index=self.prices.index)
                 
-            with open(prices_path, 'wb') as f:
-                pkl.dump(self.prices, f)
-            with open(volumes_path, 'wb') as f:
-                pkl.dump(self.volumes, f)
+            self.store.save('prices', self.prices)
+            self.store.save('volumes', self.volumes)
+            if self.source == 'krx':
+                manifest.finalize()
                 
             print('Complete!')
+            if self.source == 'krx':
+                manifest.summary()
+
+        elif update == True:
+            print('Update prices/volumes from [naver] ...', end='')
+            self.prices, self.volumes = self._load_prices_and_volumes()
+
+            if self.source == 'krx':
+                tickers = list(self.tickers['종목코드'])+['KOSPI', 'KPI200', 'KOSDAQ']
+                last_dates = self.prices.apply(pd.Series.last_valid_index)
+
+                # Fetch only the missing tail (newly listed tickers: the whole period)
+                starts = dict()
+                for ticker in tickers:
+                    last_date = last_dates.get(ticker)
+                    starts[ticker] = start if last_date is None or pd.isnull(last_date) else last_date + timedelta(days=1)
+                outdated = [ticker for ticker in tickers if starts[ticker] <= end]
+                manifest = self._manifest('prices_update', retry_failed)
+                pending = manifest.pending(outdated, lambda ticker: os.path.join(price_path, ticker)+'.pkl')
+
+                price_datas, volume_datas = self._download_prices_and_volumes(
+                    pending, starts, end, num_workers, rate_limit, reader, append=True, manifest=manifest)
+
+                # Tails appended in a previous (interrupted) run are read from their shards
+                done = manifest.done(outdated)
+                for datas, path in [(price_datas, price_path), (volume_datas, volume_path)]:
+                    shards = self._load_shards(path, [t for t in done if t not in datas])
+                    datas.update({ticker: data[starts[ticker] <= data.index] for ticker, data in shards.items()})
+                # The shards are shared with the full download: keep its checksums valid for a later retry
+                full_manifest = JobManifest(os.path.join(self.data_path, 'manifest_prices.json'))
+                full_manifest.refresh(done, lambda ticker: os.path.join(price_path, ticker)+'.pkl')
+                price_tail = assemble_frame({ticker: price_datas[ticker] for ticker in done})
+                volume_tail = assemble_frame({ticker: volume_datas[ticker] for ticker in done}, index=price_tail.index)
+                self.prices = self._merge_tail(self.prices, price_tail)
+                self.volumes = self._merge_tail(self.volumes, volume_tail)
+
+                # Tickers no longer listed keep their history and are marked with their last date
+                listed = set(tickers)
+                self.delisted = last_dates[[ticker for ticker in last_dates.index if ticker not in listed]]
+                atomic_dump(self.delisted, delisted_path)
+
+            self.store.save('prices', self.prices)
+            self.store.save('volumes', self.volumes)
+            if self.source == 'krx':
+                manifest.finalize()
+
+            print('Complete!')
+            if self.source == 'krx':
+                manifest.summary()
                     
         else:
-            print('Load prices & volumes: %s & %s' %(prices_path, volumes_path))
-            with open(prices_path, 'rb') as f:
-                self.prices = pkl.load(f)
-            with open(volumes_path, 'rb') as f:
-                self.volumes = pkl.load(f)
+            print('Load prices & volumes: %s' %self.data_path)
+            self.prices, self.volumes = self._load_prices_and_volumes()
+            if os.path.exists(delisted_path):
+                with open(delisted_path, 'rb') as f:
+                    self.delisted = pkl.load(f)
+
+    def _download_prices_and_volumes(self, tickers, start, end, num_workers, rate_limit, reader, append=False,
+                                     manifest=None):
+        ''' Download tickers concurrently and save per-ticker price/volume files
+        args:
+            start: datetime or dict of {ticker: datetime}
+            append: if True, merge downloaded data into existing per-ticker files
+            manifest: JobManifest recording the status of each ticker
+        returns:
+            price_datas, volume_datas: dicts of {ticker: single-column DataFrame} (downloaded part only)
+        '''
+        price_path = os.path.join(self.data_path, 'price')
+        volume_path = os.path.join(self.data_path, 'volume')
+
+        fetcher = PriceFetcher('naver', num_workers=num_workers, rate=rate_limit, reader=reader)
+        price_datas, volume_datas = dict(), dict()
+        for ticker, cv, error in tqdm(fetcher.fetch_many(tickers, start, end), total=len(tickers)):
+            if error is not None:
+                if manifest is not None:
+                    manifest.mark_failed(ticker, error)
+                else:
+                    print('Error in ticker: %s (%s)' %(ticker, error))
+                continue
+            cv = cv[['Close', 'Volume']].astype('float64')
+            price_data = cv[['Close']].rename(columns={'Close': ticker})
+            volume_data = cv[['Volume']].rename(columns={'Volume': ticker})
+            price_datas[ticker] = price_data
+            volume_datas[ticker] = volume_data
+
+            for path, data in [(price_path, price_data), (volume_path, volume_data)]:
+                file_path = os.path.join(path, ticker)+'.pkl'
+                if append and os.path.exists(file_path):
+                    with open(file_path, 'rb') as f:
+                        stored = pkl.load(f)
+                    data = pd.concat([stored, data])
+                    data = data[~data.index.duplicated(keep='last')]
+                atomic_dump(data, file_path)
+            if manifest is not None:
+                manifest.mark_done(ticker, os.path.join(price_path, ticker)+'.pkl')
+        fetcher.close()
+        if manifest is not None:
+            manifest.flush() # the shards are recorded before the matrices are saved
+
+        return price_datas, volume_datas
+
+    def _manifest(self, job, retry_failed=False):
+        ''' Job manifest of an ingestion step, resumed if the last run was interrupted (or retry_failed) '''
+        return JobManifest(os.path.join(self.data_path, 'manifest_%s.json' %job)).start(retry_failed)
+
+    @staticmethod
+    def _load_shards(path, tickers):
+        ''' dict of {ticker: per-ticker file <path>/<ticker>.pkl} '''
+        shards = dict()
+        for ticker in tickers:
+            with open(os.path.join(path, ticker)+'.pkl', 'rb') as f:
+                shards[ticker] = pkl.load(f)
+        return shards
+
+    def _load_prices_and_volumes(self):
+        ''' Stored prices and volumes on the dates and tickers they have in common
+        They are saved one after the other: if a run stopped in between, the newer one is cut back to
+        the older one, and the next update (resuming its manifest) rebuilds the tail from the shards.
+        '''
+        prices, volumes = self.store.load('prices'), self.store.load('volumes')
+        if not (prices.index.equals(volumes.index) and prices.columns.equals(volumes.columns)):
+            print('prices (%s) and volumes (%s) were not saved together, keeping their common part'
+                  %(prices.index[-1].date() if len(prices) else None, volumes.index[-1].date() if len(volumes) else None))
+            index = prices.index.intersection(volumes.index)
+            columns = prices.columns.intersection(volumes.columns, sort=False)
+            prices, volumes = prices.loc[index, columns], volumes.loc[index, columns]
+        return prices, volumes
+
+    @staticmethod
+    def _merge_tail(stored, tail):
+        ''' Merge newly downloaded rows/columns into the stored frame (downloaded values take precedence) '''
+        index = stored.index.union(tail.index)
+        columns = list(stored.columns) + [col for col in tail.columns if col not in stored.columns]
+        merged = stored.reindex(index=index, columns=columns)
+        merged.update(tail)
+        return merged.astype('float64')
                 
     
-    def get_fs(self, initialize=False):
+    def get_fs(self, initialize=False, retry_failed=False):
         ''' Get financial statement with pandas
+        Pages are recorded in a job manifest (manifest_fs.json): an interrupted run
+        is resumed by calling it again, skipping the tickers already stored.
         args:
             initialize: if True, ignore existing financial statement data and initialize
+            retry_failed: if True, scrape only the tickers failed in the last run
         '''
         if self.tickers is None:
             raise ValueError('ticker is not initialized')
@@ -131,59 +317,59 @@ class GetInitData:
         if not os.path.exists(fs_path):
             os.makedirs(fs_path)
         
-        if len(os.listdir(fs_path)) == 0 or initialize == True:
+        if len(os.listdir(fs_path)) == 0 or initialize == True or retry_failed == True:
             print('Get financial statements from [fnguide] ...', end='')
             if self.source == 'krx':
-                for ticker in tqdm(self.tickers['종목코드']):
-                    fs_url = 'http://comp.fnguide.com/SVO2/ASP/SVD_Finance.asp?pGB=1&gicode=A%s' %ticker
-                    fs_page = requests.get(fs_url)
-
-                    # fs_tables consists of:
-                    # [0]: Income statement (annual)
-                    # [1]: Income statement (quarterly)
-                    # [2]: Balance sheet (annual)
-                    # [3]: Balance sheet (quarterly)
-                    # [4]: Statement of cash flow (annual)
-                    # [5]: Statement of cash flow (quarterly)
-                    try:
-                        fs_tables = pd.read_html(fs_page.text, displayed_only=False)
-                        if len(fs_tables) != 6:
-                            fs_tables.pop(2)
-                    except: 
-                        print('No indicator calculated with ticker: %s' %ticker)
+                manifest = self._manifest('fs', retry_failed)
+                pending = manifest.pending(list(self.tickers['종목코드']), lambda ticker: os.path.join(fs_path, ticker)+'.pkl')
+                fs_datas = self._scrape(FINANCE_PATH, parse_finance, pending, manifest)
+                for ticker, fs_data in fs_datas.items():
+                    if fs_data is None:
+                        manifest.mark_failed(ticker, 'no financial statement in page')
                         continue
-                    
-                    # We only use annual information
-                    is_data = fs_tables[0]
-                    bs_data = fs_tables[2]
-                    cf_data = fs_tables[4]
-
-                    # Remove '전년동기', '전년동기(%)' columns in is_data
-                    is_data = is_data.drop(columns = ['전년동기', '전년동기(%)'])
-
-                    # Concatenation
-                    fs_data = pd.concat([is_data, bs_data, cf_data], axis = 0)
-
-                    # Refinement
-                    fs_data.iloc[:, 0] = fs_data.iloc[:, 0].str.replace('계산에 참여한 계정 펼치기', '', regex=False)
-                    fs_data = fs_data.drop_duplicates(fs_data.columns[0], keep='first')
-                    fs_data = fs_data.set_index(keys=fs_data.columns[0])
-                    last_col = fs_data.columns[-1] # last quarter
-                    fs_data = fs_data.drop(columns=last_col)
-                    #valid_cols = [col for col in fs_data.columns if col.endswith('/12')]
-                    #fs_data = fs_data[valid_cols]
-                    
-                    with open(os.path.join(fs_path, ticker)+'.pkl', 'wb') as f:
-                        pkl.dump(fs_data, f)
+                    path = os.path.join(fs_path, ticker)+'.pkl'
+                    atomic_dump(fs_data, path)
+                    manifest.mark_done(ticker, path)
+                manifest.finalize()
                         
             print('Complete!')
+            if self.source == 'krx':
+                manifest.summary()
             
         else:
             print('Financial statements exists: %s' %fs_path)
 
                 
+    def _scrape(self, path_format, parser, tickers=None, manifest=None):
+        ''' Fetch the (cached) page of every ticker concurrently and parse the pages in a process pool
+        args:
+            path_format: path of the page of a ticker on the host of the scraper (fnguide by default)
+            tickers: a list of tickers (default: all tickers)
+            manifest: JobManifest, tickers whose page could not be fetched are marked failed
+        returns:
+            dict of {ticker: parsed page}, tickers whose page could not be fetched are omitted
+        '''
+        if self.scraper is None:
+            self.scraper = Scraper(os.path.join(self.data_path, 'html'))
+
+        tickers = self.tickers['종목코드'] if tickers is None else tickers
+        urls = {self.scraper.url(path_format %ticker, BASE_URL): ticker for ticker in tickers}
+        texts = dict()
+        for url, text, error in tqdm(self.scraper.fetch_many(list(urls)), total=len(urls)):
+            if error is not None:
+                if manifest is not None:
+                    manifest.mark_failed(urls[url], error)
+                else:
+                    print('Error in ticker: %s (%s)' %(urls[url], error))
+                continue
+            texts[urls[url]] = text
+
+        return self.scraper.parse_many(texts, parser)
+
     def fs_cleansing(self, standard='005930', initialize=False):
         ''' Get refined financial statement with pandas
+        fss holds the statements as currently scraped; every scraped version is also appended
+        to the point-in-time store (self.fundamentals), which keeps the history for as-of queries.
         args:
             initialize: if True, ignore existing financial statement (fss.pkl) data and initialize
             standard: elements of financial statement are selected based on the given standard
@@ -198,34 +384,21 @@ class GetInitData:
             standard_fs = pkl.load(f)
         standard_date = standard_fs.columns
         standard_elements = standard_fs.index
-        years = [date.split('/')[0] for date in standard_fs.columns]
-
-        for item in standard_elements:
-            self.fss[item] = pd.DataFrame(columns=standard_date)
         
         if not os.path.exists(fss_path) or initialize == True:
             print('Cleansing financial statements ...', end='')
             if self.source == 'krx':
+                fs_datas = dict()
                 for ticker in tqdm(self.tickers['종목코드']):
-                    try:
-                        path = os.path.join(fs_path, ticker)+'.pkl'
-                        with open(path, 'rb') as f:
-                            fs_data = pkl.load(f)
-
-                        if (fs_data.columns != standard_date).any():
-                            print('Financial statement is not complete: %s'%ticker)
-                            for element in standard_elements:
-                                self.fss[element].loc[ticker] = nan
-
-                        else:
-                            for element in standard_elements:
-                                if element in fs_data.index:
-                                    self.fss[element].loc[ticker] = fs_data.loc[element]
-                                else:
-                                    self.fss[element].loc[ticker] = nan
-
-                    except:
+                    path = os.path.join(fs_path, ticker)+'.pkl'
+                    if not os.path.exists(path):
                         print('Not exists: %s'%ticker)
+                        continue
+                    with open(path, 'rb') as f:
+                        fs_datas[ticker] = pkl.load(f)
+
+                # Statements with missing/extra periods are aligned to the standard
+                self.fss = FinancialPanel.from_frames(fs_datas, standard_elements, standard_date)
             
             with open(fss_path, 'wb') as f:
                 pkl.dump(self.fss, f)
@@ -236,6 +409,13 @@ class GetInitData:
             print('Load financial statements: %s' %fss_path)
             with open(fss_path, 'rb') as f:
                 self.fss = pkl.load(f)        
+
+        # Statements scraped since the last call are appended to the point-in-time store
+        if self.source == 'krx':
+            paths = {ticker: os.path.join(fs_path, ticker)+'.pkl' for ticker in self.tickers['종목코드']}
+            num_appended = self.fundamentals.record_files(paths)
+            if num_appended > 0:
+                print('Point-in-time financial statements: %d new versions' %num_appended)
             
     
     def calculate_returns(self,
@@ -243,15 +423,19 @@ class GetInitData:
                           start=datetime(2010, 1, 1),
                           end=datetime.now(),
                           subset=None):
-        ''' Calculate returns
+        ''' Calculate returns (cached until prices are replaced)
         args:
             interval: 'd' (daily), 'w' (weekly), 'm' (monthly), and 'y' (annual)
         returns:
-            returns: dataframe of float64
+            returns: dataframe of float64 (a copy of the cached returns, free to modify)
         '''
         if self.prices.empty:
             raise ValueError('prices are not initialized')
         
+        key = self._return_key(interval, start, end, subset)
+        returns = self.return_cache.get(key)
+        if returns is not None:
+            return returns.copy()
         
         prices = self.prices[subset] if subset is not None else self.prices
         prices = prices[start <= prices.index]
@@ -260,91 +444,161 @@ class GetInitData:
         # Calculate return (related to the given time interval)
         returns = prices.pct_change() if interval=='d' else prices.resample(interval).ffill().pct_change()
         returns = returns.dropna(axis=0, how='all')
+        self.return_cache.put(key, returns)
             
-        return returns
-    
+        return returns.copy()
+
+    def return_statistics(self,
+                          stat,
+                          interval='d',
+                          start=datetime(2010, 1, 1),
+                          end=datetime.now(),
+                          subset=None):
+        ''' Statistics of returns (cached together with the returns)
+        args:
+            stat: one from ['mean', 'std', 'cov']
+        returns:
+            Series of tickers ('mean', 'std') or DataFrame of [ticker x ticker] ('cov'), a copy of the cached value
+        '''
+        if stat not in ['mean', 'std', 'cov']:
+            raise ValueError('stat should be one of ["mean", "std", "cov"]')
+
+        key = (stat,) + self._return_key(interval, start, end, subset)
+        value = self.return_cache.get(key)
+        if value is None:
+            returns = self.calculate_returns(interval, start, end, subset)
+            value = getattr(returns, stat)()
+            self.return_cache.put(key, value)
+
+        return value.copy()
+
+    @staticmethod
+    def _return_key(interval, start, end, subset):
+        return (interval, pd.Timestamp(start), pd.Timestamp(end),
+                tuple(subset) if subset is not None else None)
         
     
-    def calculate_indicators(self, initialize=False):
+    def calculate_indicators(self, initialize=False, retry_failed=False):
         ''' Calculate investment indicators (currently: PER/PBR/PCR/PSR)
+        Quotes (price, shares) of each ticker are stored in quote/<ticker>.pkl and recorded in a job
+        manifest (manifest_indicators.json): an interrupted run is resumed by calling it again.
         args:
             initialize: if True, ignore calculated indicators and initialize
+            retry_failed: if True, scrape only the tickers failed in the last run and recalculate
         '''
         if self.tickers is None:
             raise ValueError('ticker is not initialized')    
         
         indicator_path = os.path.join(self.data_path, 'indicator')
         indicators_path = os.path.join(self.data_path, 'indicators.pkl')
+        shares_path = os.path.join(self.data_path, 'shares.pkl')
         
         if not os.path.exists(indicator_path):
             os.makedirs(indicator_path)
         
-        if not os.path.exists(indicators_path) or initialize == True:
+        if not os.path.exists(indicators_path) or initialize == True or retry_failed == True:
             print('Calculate investment indicators ...')
             if self.source == 'krx':
-                for ticker in tqdm(self.tickers['종목코드']):
-                    try:
-                        earning = self.fss['지배주주순이익'].loc[ticker][-1]
-                        book = self.fss['자본'].loc[ticker][-1]
-                        cashflow = self.fss['영업활동으로인한현금흐름'].loc[ticker][-1]
-                        sale = self.fss['매출액'].loc[ticker][-1]
-                        denominator = pd.DataFrame([earning, book, cashflow, sale])
-                        #fs_data = self.fss.loc[:,[ticker]]
-                        #last_col = fs_data.columns[-1]
-                        #earnings = '지배주주순이익' if '지배주주순이익' in fs_data.index else '당기순이익'
-                        #denominator = fs_data.loc[[earnings, '자본', '영업활동으로인한현금흐름', '매출액'], [last_col]]
-
-                        url = 'http://comp.fnguide.com/SVO2/ASP/SVD_main.asp?pGB=1&gicode=A%s' %ticker
-                        page = requests.get(url)
-                        parser = fromstring(page.text)
-                        xpath_price = '//*[@id="svdMainChartTxt11"]'
-                        xpath_num_issued = '//*[@id="svdMainGrid1"]/table/tbody/tr[7]/td[1]'
-                        price = float(parser.xpath(xpath_price)[0].text.replace(',',''))
-                        num_issued = float(parser.xpath(xpath_num_issued)[0].text.split('/')[0].replace(',','')) # only common share
-
-                    except: 
-                        print('Error in ticker: %s' %ticker)
-                        continue
-                    
+                quote_path = os.path.join(self.data_path, 'quote')
+                if not os.path.exists(quote_path):
+                    os.makedirs(quote_path)
+                tickers = list(self.tickers['종목코드'])
+                fs_tickers = set(self.fss['지배주주순이익'].index) if '지배주주순이익' in self.fss else set()
 
-                    indicator = price / (denominator * 1e8 / num_issued)
-                    indicator[indicator < 0] = nan
+                manifest = self._manifest('indicators', retry_failed)
+                pending = manifest.pending(tickers, lambda ticker: os.path.join(quote_path, ticker)+'.pkl')
+                mains = self._scrape(MAIN_PATH, parse_main, [t for t in pending if t in fs_tickers], manifest)
+                for ticker in pending:
+                    if ticker not in fs_tickers:
+                        manifest.mark_failed(ticker, 'no financial statement')
+                    elif ticker in mains and mains[ticker] is None:
+                        manifest.mark_failed(ticker, 'no price/shares in page')
+                    elif ticker in mains:
+                        path = os.path.join(quote_path, ticker)+'.pkl'
+                        atomic_dump(mains[ticker], path)
+                        manifest.mark_done(ticker, path)
 
-                    # Set names
-                    indicator.index.name = 'indicator'
-                    indicator.index = ['PER', 'PBR', 'PCR', 'PSR']
-                    indicator.columns = [ticker]
-                    
+                # Quotes of this and previous (interrupted) runs
+                valid = [ticker for ticker in manifest.done(tickers) if ticker in fs_tickers]
+                mains.update(self._load_shards(quote_path, [t for t in valid if mains.get(t) is None]))
+                quotes = pd.DataFrame([mains[ticker] for ticker in valid], index=valid, columns=['price', 'shares'])
+                self.shares = quotes['shares']
+                self.indicators = compute_indicators(self.fss, quotes['price'], self.shares)
+                
+                for ticker in valid:
                     with open(os.path.join(indicator_path, ticker)+'.pkl', 'wb') as f:
-                        pkl.dump(indicator, f)
-                    self.indicators = pd.concat([self.indicators, indicator], axis=1)
+                        pkl.dump(self.indicators[[ticker]], f)
 
-                with open(indicators_path, 'wb') as f:
-                    pkl.dump(self.indicators, f)
+                atomic_dump(self.indicators, indicators_path)
+                atomic_dump(self.shares, shares_path)
+                manifest.finalize()
 
             print('Complete!')
+            if self.source == 'krx':
+                manifest.summary()
         else:
             print('Load indicators: %s' %indicators_path)
             with open(indicators_path, 'rb') as f:
                 self.indicators = pkl.load(f)
+            if os.path.exists(shares_path):
+                with open(shares_path, 'rb') as f:
+                    self.shares = pkl.load(f)
+
+    def refresh_indicators(self, price=None, names=['PER', 'PBR', 'PCR', 'PSR']):
+        ''' Recalculate indicators from cached financial statements and shares (no scraping)
+        args:
+            price: Series of price per ticker (default: last price in self.prices)
+            names: indicators to calculate, see finml.data_reader.indicators.INDICATORS
+        '''
+        if self.shares.empty:
+            raise ValueError('shares are not initialized (run calculate_indicators first)')
+
+        if price is None:
+            prices = self.prices.reindex(columns=self.shares.index)
+            price = prices.ffill().iloc[-1] if not prices.empty else pd.Series(nan, index=self.shares.index)
+        self.indicators = compute_indicators(self.fss, price, self.shares, names)
+
+        return self.indicators
         
     
     def get_mean_cov(self, 
                      interval='d',
                      start=datetime(2010, 1, 1),
                      end=datetime.now(),
-                     subset=None):
+                     subset=None,
+                     estimator='sample',
+                     compact=False,
+                     **kwargs):
         ''' Calculate mean and covariance of returns
         args:
             interval: 'd' (daily), 'w' (weekly), 'm' (monthly), and 'y' (annual)
             subset: a list of tickers
+            estimator: covariance estimator, one from ['sample', 'ledoit_wolf', 'ewma', 'pca', 'factor']
+                       (see portfolio_optimization.covariance.estimate_covariance)
+            compact: if True, factor models ('pca', 'factor') return FactorCovariance
+            kwargs: arguments of the estimator
         returns:
             mean, variance
         '''
-        returns = self.calculate_returns(interval, start, end, subset)
-        mean_returns = np.array(returns.mean(axis=0)).reshape(len(subset), 1)
-        covariance = np.array(returns.cov())
-        
+        mean = self.return_statistics('mean', interval, start, end, subset)
+        mean_returns = np.array(mean).reshape(len(subset), 1)
+        if estimator == 'sample':
+            return mean_returns, np.array(self.return_statistics('cov', interval, start, end, subset))
+
+        key = ('cov', estimator, compact, tuple(sorted(kwargs.items()))) + self._return_key(interval, start, end, subset)
+        try:
+            hash(key)
+        except TypeError: # e.g. factors=DataFrame
+            key = None
+        covariance = self.return_cache.get(key) if key is not None else None
+        if covariance is None:
+            returns = self.calculate_returns(interval, start, end, subset)
+            covariance = estimate_covariance(returns, estimator, compact, **kwargs)
+            if key is not None:
+                self.return_cache.put(key, covariance)
+        if not isinstance(covariance, FactorCovariance):
+            covariance = np.array(covariance)
+
         return mean_returns, covariance
     
     def convert_to_date(self, last_nyears=1):
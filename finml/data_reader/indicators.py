@@ -0,0 +1,86 @@
+''' Vectorized investment indicators over the whole universe '''
+import numpy as np
+import pandas as pd
+
+UNIT = 1e8 # fnguide statements are in 100 million won
+
+
+class IndicatorInputs:
+    ''' Cross-section used by indicator functions, aligned to one list of tickers
+    args:
+        fss: FinancialPanel (or dict of [ticker x period] DataFrames)
+        price: Series of price per ticker
+        shares: Series of number of issued shares per ticker
+        period: column of the financial statement used (default: latest)
+    '''
+    def __init__(self, fss, price, shares, period=-1):
+        self.fss = fss
+        self.tickers = price.index
+        self.price = price.values.astype('float64')
+        self.shares = shares.reindex(self.tickers).values.astype('float64')
+        self.market_cap = self.price * self.shares
+        self.period = period
+        self._elements = dict()
+
+    def fs(self, element):
+        ''' Value of the element (in won) per ticker, NaN if the element does not exist '''
+        if element not in self._elements:
+            if element in self.fss:
+                values = self.fss[element].iloc[:, self.period].reindex(self.tickers)
+                self._elements[element] = pd.to_numeric(values, errors='coerce').values * UNIT
+            else:
+                self._elements[element] = np.full(len(self.tickers), np.nan)
+        return self._elements[element]
+
+
+    def fs_sum(self, elements):
+        ''' Sum of elements per ticker, blank values count as 0 (NaN if no element is in the statements) '''
+        elements = [element for element in elements if element in self.fss]
+        if len(elements) == 0:
+            return np.full(len(self.tickers), np.nan)
+        return np.nansum(np.stack([self.fs(element) for element in elements]), axis=0)
+
+
+# Interest-bearing debt: borrowings and bonds (short-term, current portion of long-term, long-term)
+DEBT_ELEMENTS = ['단기차입금', '단기사채', '유동성장기부채', '장기차입금', '사채']
+
+def _ev_ebitda(x):
+    ev = x.market_cap + x.fs_sum(DEBT_ELEMENTS) - x.fs('현금및현금성자산')
+    ebitda = x.fs('영업이익') + x.fs('감가상각비')
+    return ev / ebitda
+
+
+# name: (function of IndicatorInputs -> array, True if negative values are meaningless)
+# e.g. INDICATORS['PEG'] = (lambda x: ..., True) adds a new indicator
+INDICATORS = {
+    'PER': (lambda x: x.market_cap / x.fs('지배주주순이익'), True),
+    'PBR': (lambda x: x.market_cap / x.fs('자본'), True),
+    'PCR': (lambda x: x.market_cap / x.fs('영업활동으로인한현금흐름'), True),
+    'PSR': (lambda x: x.market_cap / x.fs('매출액'), True),
+    'ROE': (lambda x: x.fs('지배주주순이익') / x.fs('자본'), False),
+    'EV/EBITDA': (_ev_ebitda, True),
+}
+
+
+def compute_indicators(fss, price, shares, names=['PER', 'PBR', 'PCR', 'PSR'], period=-1):
+    ''' Calculate indicators of all tickers at once
+    args:
+        fss: FinancialPanel (or dict of [ticker x period] DataFrames)
+        price: Series of price per ticker
+        shares: Series of number of issued (common) shares per ticker
+        names: indicators to calculate, keys of INDICATORS
+    returns:
+        DataFrame of [len(names), len(price)]
+    '''
+    inputs = IndicatorInputs(fss, price, shares, period)
+    matrix = np.empty((len(names), len(inputs.tickers)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for row, name in enumerate(names):
+            func, positive_only = INDICATORS[name]
+            values = func(inputs)
+            if positive_only:
+                values = np.where(values < 0, np.nan, values)
+            matrix[row] = values
+    matrix[~np.isfinite(matrix)] = np.nan
+
+    return pd.DataFrame(matrix, index=names, columns=inputs.tickers)
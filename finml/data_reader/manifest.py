@@ -0,0 +1,134 @@
+''' Essential packages '''
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class JobManifest:
+    ''' Per-unit (e.g. ticker) status of a bulk ingestion job, kept in a JSON file
+    Each unit has a status ('done' or 'failed'), the checksum of its shard file, a timestamp,
+    the number of attempts and the last error. A job interrupted before finalize() is resumed:
+    units whose shard is intact are skipped, the others (failed or never run) are run again.
+    Writes are atomic, and mark_done/mark_failed may be called from several threads.
+    args:
+        path: JSON file of the manifest
+        flush_every: the file is rewritten every flush_every updates (and on start/finalize)
+    '''
+    def __init__(self, path, flush_every=50):
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.updates = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+        else:
+            self.state = {'finalized': False, 'units': dict()}
+
+    @property
+    def finalized(self):
+        return self.state['finalized']
+
+    def start(self, retry_failed=False):
+        ''' Start a job: an unfinished job is resumed, a finalized one starts over
+        (or is reopened to run its failed units again if retry_failed) '''
+        if self.finalized and not retry_failed:
+            self.state = {'finalized': False, 'started': datetime.now().isoformat(), 'units': dict()}
+        self.state['finalized'] = False
+        self.flush()
+        return self
+
+    def is_done(self, unit, path=None):
+        ''' True if the unit is done and its shard (if given) still has the recorded checksum '''
+        record = self.state['units'].get(unit)
+        if record is None or record['status'] != 'done':
+            return False
+        if path is None or record.get('checksum') is None:
+            return True
+        return os.path.exists(path) and file_checksum(path) == record['checksum']
+
+    def pending(self, units, path_of=None):
+        ''' Units to run: not done, or whose shard path_of(unit) is missing or modified '''
+        return [unit for unit in units if not self.is_done(unit, path_of(unit) if path_of else None)]
+
+    def done(self, units):
+        return [unit for unit in units if self.is_done(unit)]
+
+    def _update(self, unit, **record):
+        with self.lock:
+            previous = self.state['units'].get(unit, {})
+            record['attempts'] = previous.get('attempts', 0) + 1
+            record['timestamp'] = datetime.now().isoformat()
+            self.state['units'][unit] = record
+            self.updates += 1
+            if self.updates % self.flush_every == 0:
+                self._write()
+
+    def mark_done(self, unit, path=None):
+        self._update(unit, status='done', checksum=file_checksum(path) if path else None, error=None)
+
+    def mark_failed(self, unit, error):
+        self._update(unit, status='failed', checksum=None, error=str(error))
+
+    def refresh(self, units, path_of):
+        ''' Record the current checksum of done units whose shards were rewritten by another job
+        (e.g. tails appended by an update), so they are not taken as modified and run again
+        returns:
+            number of refreshed units
+        '''
+        with self.lock:
+            refreshed = 0
+            for unit in units:
+                record = self.state['units'].get(unit)
+                if record is None or record['status'] != 'done' or record.get('checksum') is None:
+                    continue
+                path = path_of(unit)
+                if os.path.exists(path):
+                    record['checksum'] = file_checksum(path)
+                    refreshed += 1
+            if refreshed > 0:
+                self._write()
+        return refreshed
+
+    def failures(self):
+        ''' dict of {unit: last error} of failed units '''
+        return {unit: record['error'] for unit, record in self.state['units'].items() if record['status'] == 'failed'}
+
+    def _write(self):
+        dir_path = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix='.tmp_', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def finalize(self):
+        ''' Mark the job complete (aggregates are written): the next run starts a new job '''
+        self.state['finalized'] = True
+        self.state['completed'] = datetime.now().isoformat()
+        self.flush()
+
+    def summary(self, max_units=10):
+        ''' Print the number of done/failed units and the errors of the first max_units failures '''
+        failures = self.failures()
+        num_done = sum(record['status'] == 'done' for record in self.state['units'].values())
+        print('%d done, %d failed' %(num_done, len(failures)))
+        for unit, error in list(failures.items())[:max_units]:
+            print('  %s: %s' %(unit, error))
+        if len(failures) > max_units:
+            print('  ... and %d more (see %s)' %(len(failures) - max_units, self.path))
+        return failures
@@ -0,0 +1,167 @@
+''' Essential packages '''
+import os
+import json
+import time
+import random
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from finml.data_reader.fetcher import get_rate_limiter, make_session
+
+
+class HTMLCache:
+    ''' Content-addressed on-disk cache of web pages
+    Page bodies are stored once per content hash (objects/<sha256>.html),
+    and each url has a small record (urls/<sha256(url)>.json) with the content hash,
+    the time it was fetched and the validators (ETag/Last-Modified) for conditional requests.
+    '''
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        for sub in ['objects', 'urls']:
+            if not os.path.exists(os.path.join(cache_dir, sub)):
+                os.makedirs(os.path.join(cache_dir, sub))
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _record_path(self, url):
+        return os.path.join(self.cache_dir, 'urls', self.digest(url) + '.json')
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.cache_dir, 'objects', content_hash + '.html')
+
+    def get(self, url):
+        ''' returns: (text, record) or (None, None) if url is not cached '''
+        record_path = self._record_path(url)
+        if not os.path.exists(record_path):
+            return None, None
+        with open(record_path) as f:
+            record = json.load(f)
+        object_path = self._object_path(record['content'])
+        if not os.path.exists(object_path):
+            return None, None
+        with open(object_path, encoding='utf-8') as f:
+            return f.read(), record
+
+    def put(self, url, text, headers=None):
+        headers = headers or dict()
+        content_hash = self.digest(text)
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            self._write(object_path, text)
+        record = {'url': url,
+                  'content': content_hash,
+                  'fetched': time.time(),
+                  'etag': headers.get('ETag'),
+                  'last_modified': headers.get('Last-Modified')}
+        self._write(self._record_path(url), json.dumps(record))
+
+    def touch(self, url, record):
+        ''' Mark a cached page as fresh again (e.g. after 304 Not Modified) '''
+        record['fetched'] = time.time()
+        self._write(self._record_path(url), json.dumps(record))
+
+    @staticmethod
+    def _write(path, text):
+        # A unique temp file per writer: threads may put the same page (same object path) at once
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+
+class Scraper:
+    ''' Concurrent and cached web page scraper shared by get_fs and calculate_indicators
+    args:
+        cache_dir: directory of the HTML cache
+        ttl: seconds a cached page is used without asking the server (None: forever)
+        num_workers: number of concurrent requests
+        rate: maximum number of requests per second to the source
+        num_processes: number of processes parsing pages (0: parse in this process)
+        source: name of the source, requests to the same source share the rate limit
+        base_url: host of the pages, e.g. 'http://localhost:8000' for a local fixture server
+                  (default: the host of the source)
+    '''
+    def __init__(self, cache_dir, ttl=24*60*60, num_workers=8, rate=5, num_processes=None,
+                 max_retries=3, backoff=0.5, source='fnguide', base_url=None):
+        self.cache = HTMLCache(cache_dir)
+        self.base_url = base_url
+        self.ttl = ttl
+        self.num_workers = num_workers
+        self.num_processes = num_processes
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = get_rate_limiter(source, rate)
+        self.session = make_session(num_workers)
+
+    def url(self, path, default_base_url=''):
+        ''' Absolute url of a path on the host of the scraper '''
+        return (self.base_url or default_base_url).rstrip('/') + path
+
+    def fetch(self, url):
+        ''' Get a page: cached page if fresh, otherwise a conditional request to the server '''
+        text, record = self.cache.get(url)
+        if text is not None and (self.ttl is None or time.time() - record['fetched'] < self.ttl):
+            return text
+
+        headers = dict()
+        if record is not None:
+            if record.get('etag'):
+                headers['If-None-Match'] = record['etag']
+            if record.get('last_modified'):
+                headers['If-Modified-Since'] = record['last_modified']
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=30)
+                if response.status_code == 304 and text is not None:
+                    self.cache.touch(url, record)
+                    return text
+                response.raise_for_status()
+                self.cache.put(url, response.text, response.headers)
+                return response.text
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    def fetch_many(self, urls):
+        ''' Get pages concurrently
+        returns:
+            generator of (url, text, error) in the order of completion
+        '''
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    yield url, future.result(), None
+                except Exception as e:
+                    yield url, None, e
+
+    def parse_many(self, texts, parser):
+        ''' Parse pages in a process pool
+        args:
+            texts: dict of {key: page text}
+            parser: module-level function text -> result (None if the page cannot be parsed)
+        returns:
+            dict of {key: result}
+        '''
+        keys = list(texts.keys())
+        if self.num_processes == 0 or len(keys) < 2:
+            return {key: parser(texts[key]) for key in keys}
+        num_processes = self.num_processes or os.cpu_count() or 1
+        chunksize = max(1, len(keys) // (4 * num_processes))
+        with ProcessPoolExecutor(max_workers=num_processes) as executor:
+            results = executor.map(parser, [texts[key] for key in keys], chunksize=chunksize)
+            return dict(zip(keys, results))
+
+    def close(self):
+        self.session.close()
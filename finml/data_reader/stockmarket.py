@@ -1,19 +1,52 @@
 ''' Essential packages '''
 import os
-import pickle as pkl
+import tempfile
 from datetime import datetime
 import numpy as np
 import pandas as pd
-import pandas_datareader as pdr
+
+from finml.data_reader.symbolcache import SymbolCache
+from finml.portfolio_optimization.covariance import estimate_covariance, FactorCovariance, OnlineCovariance
 
 
 class StockMarket:
-    def __init__(self, start_date=datetime(2010, 1, 1), end_date=datetime.now(), data_dir='data'):
+    def __init__(self, start_date=datetime(2010, 1, 1), end_date=datetime.now(), data_dir='data',
+                 cache_bytes=None, reader=None):
+        '''
+        args:
+            cache_bytes: disk budget of cached price histories in data_dir (None: no limit)
+            reader: function (symbol, start, end) -> DataFrame with 'Adj Close', replaces pdr.DataReader
+        '''
         self.start_date = start_date
         self.end_date = end_date
         self.price_data = dict()
 
         self.data_dir = data_dir
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        self.cache = SymbolCache(data_dir, cache_bytes, reader)
+
+    def iter_prices(self, symbols, memoize=True):
+        ''' Generator of (symbol, price history in [start_date, end_date]), one symbol read at a time
+        Histories are cached in data_dir (see SymbolCache): downloaded once, then refreshed by their tail.
+        args:
+            memoize: if True, histories are also kept in memory for later calls
+        '''
+        try:
+            for symbol in symbols:
+                price_data = self.cache.get(symbol, self.end_date, memoize)
+                price_data = price_data[self.start_date <= price_data.index]
+                price_data = price_data[price_data.index <= self.end_date]
+                yield symbol, price_data
+        finally:
+            self.cache.evict()
+
+    @staticmethod
+    def price_to_return(price_data, log_return=True):
+        ''' Price history (newest first) with 'return' column, the cached price data is not modified '''
+        df = price_data.sort_index(ascending=False)
+        df['return'] =  np.log(df['Adj Close'].shift(1) / df['Adj Close']) if log_return else df['Adj Close'].shift(1) / df['Adj Close']-1
+        return df.dropna() # remove rows with NaN
 
     def get_stock_price(self, symbols, log_return=True):
         '''
@@ -21,45 +54,66 @@ class StockMarket:
             symbols: list of stock symbols, e.g. ['AAPL', 'AMZN', 'GOOGL']
             log_return: boolean. log return
         '''
-        # File name starts with dates
-        prefix = datetime.now().strftime('%Y%m%d')
-        done_list = [file.split('.')[0] for file in os.listdir(self.data_dir)]
-        
-        # Load price data: if not exists, download with pdr.DataReader
-        for symbol in symbols:
-            if prefix+symbol in done_list:
-                with open(os.path.join(self.data_dir, prefix+symbol+'.pkl'), 'rb') as f:
-                    price_data = pkl.load(f)
-            else:
-                price_data = pdr.DataReader(symbol, 'yahoo', start=datetime(2000,1,1), end=self.end_date)
-                with open(os.path.join(self.data_dir, prefix+symbol+'.pkl'), 'wb') as f:
-                    pkl.dump(price_data, f)
-            
-            price_data = price_data[self.start_date <= price_data.index]
-            price_data = price_data[price_data.index <= self.end_date]
-            self.price_data[symbol] = price_data
+        for symbol, price_data in self.iter_prices(symbols):
+            self.price_data[symbol] = self.price_to_return(price_data, log_return)
 
-        for symbol, df in self.price_data.items():
-            df.sort_index(ascending=False, inplace=True)
-            df['return'] =  np.log(df['Adj Close'].shift(1) / df['Adj Close']) if log_return else df['Adj Close'].shift(1) / df['Adj Close']-1
-            self.price_data[symbol] = df.dropna() # remove rows with NaN
+    def iter_returns(self, symbols, log_return=True):
+        ''' Generator of (symbol, Series of returns); price histories are dropped once returns are computed '''
+        for symbol, price_data in self.iter_prices(symbols, memoize=False):
+            yield symbol, self.price_to_return(price_data, log_return)['return'].rename(symbol)
 
-            
-    def get_stock_statistics(self):
+    def stream_statistics(self, symbols, log_return=True, chunk_size=256):
+        ''' Mean and pairwise-complete covariance of returns of many symbols with bounded memory
+        Returns of each symbol are written to a temporary memory-mapped [business day x symbol] matrix
+        in data_dir, which is read back in chunks of dates and accumulated online (OnlineCovariance).
+        args:
+            symbols: list of stock symbols
+            chunk_size: number of dates per chunk
+        return:
+            mean_return: array of size [len(symbols), 1]
+            covariance: array of size [len(symbols), len(symbols)]
+            symbols: Index of symbols
+        '''
+        dates = pd.bdate_range(self.start_date, self.end_date)
+        fd, path = tempfile.mkstemp(dir=self.data_dir, prefix='.tmp_', suffix='.npy')
+        os.close(fd)
+        try:
+            # Column-major, so each symbol is one contiguous write
+            matrix = np.lib.format.open_memmap(path, mode='w+', dtype='float64',
+                                               shape=(len(dates), len(symbols)), fortran_order=True)
+            for col, (symbol, returns) in enumerate(self.iter_returns(symbols, log_return)):
+                column = np.full(len(dates), np.nan)
+                positions = dates.get_indexer(returns.index)
+                found = positions >= 0
+                column[positions[found]] = returns.values[found]
+                matrix[:, col] = column
+            matrix.flush()
+
+            online = OnlineCovariance(len(symbols))
+            for lo in range(0, len(dates), chunk_size):
+                online.update(matrix[lo:lo + chunk_size])
+            del matrix
+        finally:
+            os.remove(path)
+
+        return online.mean.reshape(len(symbols), 1), online.covariance, pd.Index(symbols)
+
+    def get_stock_statistics(self, estimator='sample', compact=False, **kwargs):
         '''
+        args:
+            estimator: covariance estimator, one from ['sample', 'ledoit_wolf', 'ewma', 'pca', 'factor']
+                       (see portfolio_optimization.covariance.estimate_covariance)
+            compact: if True, factor models ('pca', 'factor') return FactorCovariance
         return:
             df_return.columns: list of symbols
             mean_return: array of size [len(self.price_data), 1]
             covariance: array of size [len(self.price_data), len(self.price_data)]
         '''
-        df_return = pd.DataFrame()
-
-        for symbol, df in self.price_data.items():
-            stock_return = df['return']
-            stock_return.name = symbol
-            df_return = pd.concat([df_return, stock_return], axis=1)
+        df_return = pd.concat([df['return'].rename(symbol) for symbol, df in self.price_data.items()], axis=1)
 
         mean_return = np.array(df_return.mean()).reshape(len(self.price_data), 1)
-        covariance = np.array(df_return.cov())
+        covariance = estimate_covariance(df_return, estimator, compact, **kwargs)
+        if not isinstance(covariance, FactorCovariance):
+            covariance = np.array(covariance)
 
         return mean_return, covariance, df_return.columns
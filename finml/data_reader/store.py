@@ -0,0 +1,162 @@
+''' Essential packages '''
+import os
+import json
+import pickle as pkl
+import tempfile
+import uuid
+import numpy as np
+import pandas as pd
+
+from finml.utils.path_utils import atomic_dump
+
+
+class PickleStore:
+    ''' Legacy store: each matrix is a pickled DataFrame (<name>.pkl) '''
+    def __init__(self, data_path):
+        self.data_path = data_path
+
+    def path(self, name):
+        return os.path.join(self.data_path, name + '.pkl')
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def save(self, name, frame):
+        atomic_dump(frame, self.path(name))
+
+    def load(self, name, start=None, end=None, tickers=None):
+        with open(self.path(name), 'rb') as f:
+            frame = pkl.load(f)
+        if tickers is not None:
+            frame = frame[list(tickers)]
+        if start is not None:
+            frame = frame[start <= frame.index]
+        if end is not None:
+            frame = frame[frame.index <= end]
+        return frame
+
+
+class NpyStore:
+    ''' Columnar store: each date x ticker matrix is a contiguous float64 array
+    <name>.<version>.npy (memory-mapped on load) with a sidecar index:
+        <name>.<version>.dates.npy: datetime64[ns] row index
+        <name>.json: version of the data files, tickers (columns), the name of the row index and the shape
+    A save writes new data files and then replaces the sidecar, so a reader sees either the old
+    or the new version as a whole, never new values with old labels.
+    args:
+        data_path: directory of the store
+        legacy: if True, matrices not yet converted are read from <name>.pkl
+    '''
+    def __init__(self, data_path, legacy=True):
+        self.data_path = data_path
+        self.legacy = PickleStore(data_path) if legacy else None
+
+    def path(self, name, suffix):
+        return os.path.join(self.data_path, name + suffix)
+
+    def exists(self, name):
+        if os.path.exists(self.path(name, '.json')):
+            return True
+        return self.legacy is not None and self.legacy.exists(name)
+
+    def _write(self, array, path):
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_path, prefix='.tmp_', suffix='.npy')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+    def _read_meta(self, name):
+        with open(self.path(name, '.json')) as f:
+            return json.load(f)
+
+    def _data_paths(self, name, meta):
+        # Sidecars written before versioning point to <name>.npy
+        prefix = name if meta.get('version') is None else '%s.%s' %(name, meta['version'])
+        return self.path(prefix, '.npy'), self.path(prefix, '.dates.npy')
+
+    def save(self, name, frame):
+        values = np.ascontiguousarray(frame.values, dtype='float64')
+        dates = np.asarray(frame.index.values).astype('datetime64[ns]')
+        previous = self._read_meta(name) if os.path.exists(self.path(name, '.json')) else None
+
+        meta = {'version': uuid.uuid4().hex[:12],
+                'tickers': [str(col) for col in frame.columns],
+                'index_name': frame.index.name,
+                'shape': list(values.shape)}
+        values_path, dates_path = self._data_paths(name, meta)
+        self._write(values, values_path)
+        self._write(dates, dates_path)
+
+        # The sidecar is written last: a version is visible only once it is complete
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_path, prefix='.tmp_', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.path(name, '.json'))
+
+        # Files of the previous version (open memory maps keep their data)
+        if previous is not None:
+            for path in self._data_paths(name, previous):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def open(self, name):
+        ''' Open a matrix without reading it
+        returns:
+            values (read-only np.memmap), dates (DatetimeIndex), tickers (Index)
+        '''
+        for attempt in range(3):
+            meta = self._read_meta(name)
+            values_path, dates_path = self._data_paths(name, meta)
+            try:
+                values = np.load(values_path, mmap_mode='r')
+                dates = np.load(dates_path)
+                break
+            except FileNotFoundError:
+                # Replaced by a concurrent save between reading the sidecar and the data: read again
+                if attempt == 2:
+                    raise
+        tickers = pd.Index(meta['tickers'])
+        if values.shape != (len(dates), len(tickers)) or list(values.shape) != list(meta.get('shape', values.shape)):
+            raise ValueError('Inconsistent store %s: values %s, %d dates, %d tickers'
+                             %(name, values.shape, len(dates), len(tickers)))
+        return values, pd.DatetimeIndex(dates, name=meta['index_name']), tickers
+
+    def load(self, name, start=None, end=None, tickers=None):
+        ''' Slice a date range and/or a ticker subset; the full matrix is never read
+        args:
+            start, end: datetime (inclusive)
+            tickers: a list of tickers
+        returns:
+            DataFrame backed by the memory map if no ticker subset is given
+        '''
+        if not os.path.exists(self.path(name, '.json')) and self.legacy is not None:
+            return self.legacy.load(name, start, end, tickers)
+
+        values, dates, columns = self.open(name)
+        lo = 0 if start is None else dates.searchsorted(start, side='left')
+        hi = len(dates) if end is None else dates.searchsorted(end, side='right')
+        values = values[lo:hi]
+        if tickers is not None:
+            subset = pd.Index(list(tickers))
+            positions = columns.get_indexer(subset)
+            if (positions < 0).any():
+                raise KeyError('Not in store: %s' %list(subset[positions < 0]))
+            values, columns = values[:, positions], subset
+        return pd.DataFrame(values, index=dates[lo:hi], columns=columns, copy=False)
+
+
+STORES = {'pickle': PickleStore, 'npy': NpyStore}
+
+def get_store(storage, data_path):
+    ''' storage: one from ['pickle', 'npy'] '''
+    if storage not in STORES:
+        raise ValueError('storage should be one of %s' %list(STORES))
+    return STORES[storage](data_path)
@@ -0,0 +1,150 @@
+''' Essential packages '''
+import os
+import re
+import json
+import tempfile
+import pickle as pkl
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pandas_datareader as pdr
+
+from finml.utils.path_utils import atomic_dump
+
+
+def yahoo_reader(symbol, start, end):
+    return pdr.DataReader(symbol, 'yahoo', start=start, end=end)
+
+
+class SymbolCache:
+    ''' Price histories of symbols on disk with an index (<data_dir>/index.json)
+    The index maps each symbol to its file, stored date range, last refresh and last access.
+    A history is refreshed at most once a day, by downloading only the dates after the stored ones;
+    if the adjusted close of the last stored date changed (dividends, splits), the whole history
+    is downloaded again. Loaded histories are kept in memory for the session.
+    args:
+        data_dir: directory of the files
+        max_bytes: disk budget, least recently used symbols are evicted beyond it (None: no limit)
+        reader: function (symbol, start, end) -> DataFrame with 'Adj Close', default: yahoo
+        first_date: start of a full download
+    '''
+    def __init__(self, data_dir, max_bytes=None, reader=None, first_date=datetime(2000, 1, 1)):
+        self.data_dir = data_dir
+        self.max_bytes = max_bytes
+        self.reader = reader or yahoo_reader
+        self.first_date = first_date
+        self.index_path = os.path.join(data_dir, 'index.json')
+        self.memo = dict()
+        self.dirty = False # index modified
+        self.saved = True # files written (or not yet scanned in this session)
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = dict()
+
+    def flush(self):
+        if not self.dirty:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, prefix='.tmp_', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def _file_name(self, symbol, today):
+        return '%s.%s.pkl' %(symbol, today.strftime('%Y%m%d'))
+
+    def _save(self, symbol, price_data, today):
+        file_name = self._file_name(symbol, today)
+        path = os.path.join(self.data_dir, file_name)
+        atomic_dump(price_data, path)
+
+        # The previous version is replaced
+        previous = self.index.get(symbol)
+        if previous is not None and previous['file'] != file_name:
+            old_path = os.path.join(self.data_dir, previous['file'])
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+        self.index[symbol] = {'file': file_name,
+                              'start': str(price_data.index.min()) if len(price_data) else None,
+                              'end': str(price_data.index.max()) if len(price_data) else None,
+                              'refreshed': today.strftime('%Y-%m-%d'),
+                              'accessed': datetime.now().isoformat(),
+                              'bytes': os.path.getsize(path)}
+        self.dirty = self.saved = True
+
+    def get(self, symbol, end=None, memoize=True):
+        ''' Full price history of the symbol, refreshed up to end if not refreshed today '''
+        end = datetime.now() if end is None else end
+        if symbol in self.memo:
+            return self.memo[symbol]
+
+        today = datetime.now()
+        record = self.index.get(symbol)
+        path = os.path.join(self.data_dir, record['file']) if record else None
+        if record is None or not os.path.exists(path):
+            price_data = self.reader(symbol, self.first_date, end)
+            self._save(symbol, price_data, today)
+        else:
+            with open(path, 'rb') as f:
+                price_data = pkl.load(f)
+            if record['refreshed'] < today.strftime('%Y-%m-%d') and record['end'] is not None:
+                price_data = self._refresh(symbol, price_data, end, today)
+            record = self.index[symbol]
+            record['accessed'] = datetime.now().isoformat()
+            self.dirty = True
+
+        if memoize:
+            self.memo[symbol] = price_data
+        return price_data
+
+    def _refresh(self, symbol, stored, end, today):
+        ''' Download from the last stored date (one overlapping row) and append the new rows '''
+        last = stored.index.max()
+        if last >= pd.Timestamp(end):
+            self.index[symbol]['refreshed'] = today.strftime('%Y-%m-%d')
+            self.dirty = True
+            return stored
+        tail = self.reader(symbol, last, end)
+        overlap = tail.index.intersection([last])
+        if len(overlap) and not np.isclose(tail.loc[last, 'Adj Close'], stored.loc[last, 'Adj Close'], rtol=1e-6):
+            # Adjusted prices changed retroactively: the stored history is stale
+            price_data = self.reader(symbol, self.first_date, end)
+        else:
+            price_data = pd.concat([stored, tail[tail.index > last]])
+        self._save(symbol, price_data, today)
+        return price_data
+
+    def evict(self):
+        ''' Remove stale files of indexed symbols (previous versions <symbol>.<YYYYMMDD>.pkl and legacy
+        <YYYYMMDD><symbol>.pkl files), then the least recently used symbols while the total size exceeds max_bytes
+        Only file names built from the symbols of the index are removed, other files in data_dir are kept.
+        The directory is scanned only if files were written since the last eviction. '''
+        if not self.saved:
+            self.flush()
+            return
+        self.saved = False
+        referenced = set(record['file'] for record in self.index.values())
+        for file_name in os.listdir(self.data_dir):
+            if file_name in referenced:
+                continue
+            version = re.match(r'^(.+)\.\d{8}\.pkl$', file_name)
+            legacy = re.match(r'^\d{8}(.+)\.pkl$', file_name)
+            if (version and version.group(1) in self.index) or (legacy and legacy.group(1) in self.index):
+                os.remove(os.path.join(self.data_dir, file_name))
+
+        if self.max_bytes is not None:
+            total = sum(record['bytes'] for record in self.index.values())
+            for symbol in sorted(self.index, key=lambda symbol: self.index[symbol]['accessed']):
+                if total <= self.max_bytes:
+                    break
+                record = self.index.pop(symbol)
+                path = os.path.join(self.data_dir, record['file'])
+                if os.path.exists(path):
+                    os.remove(path)
+                total -= record['bytes']
+                self.memo.pop(symbol, None)
+                self.dirty = True
+        self.flush()
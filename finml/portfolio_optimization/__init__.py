@@ -1,2 +1,7 @@
 from finml.portfolio_optimization.riskaverse import RiskAverseOptimization
 from finml.portfolio_optimization.simplemeanvariance import SimpleMeanVariance
+from finml.portfolio_optimization.solver import CovarianceSolver
+from finml.portfolio_optimization.constrained import ActiveSetQP, ADMMQP
+from finml.portfolio_optimization.covariance import estimate_covariance, FactorCovariance, OnlineCovariance
+from finml.portfolio_optimization.resampling import ResampledFrontier
+from finml.portfolio_optimization.risk import value_at_risk, parametric_var, max_drawdown, risk_contributions, tracking_error, risk_report
@@ -0,0 +1,408 @@
+''' Essential packages '''
+import warnings
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+
+from finml.portfolio_optimization.solver import CovarianceSolver
+
+
+def project_l1_ball(v, radius):
+    ''' Euclidean projection of v onto {x: |x|_1 <= radius} (Duchi et al., 2008) '''
+    if np.abs(v).sum() <= radius:
+        return v
+    u = np.sort(np.abs(v))[::-1]
+    cumsum = np.cumsum(u)
+    idx = np.nonzero(u * np.arange(1, len(u) + 1) > (cumsum - radius))[0][-1]
+    theta = (cumsum[idx] - radius) / (idx + 1)
+    return np.sign(v) * np.maximum(np.abs(v) - theta, 0)
+
+
+def project_budget(v, lower, upper, total=1.0):
+    ''' Euclidean projection of v onto {x: lower <= x <= upper, sum of x = total}
+    x = clip(v - tau, lower, upper), with tau found by bisection (the sum is monotone in tau) '''
+    lo, hi = (v - upper).min(), (v - lower).max()
+    for _ in range(200):
+        tau = 0.5 * (lo + hi)
+        if np.clip(v - tau, lower, upper).sum() > total:
+            lo = tau
+        else:
+            hi = tau
+        if hi - lo <= 1e-15 * max(1.0, abs(tau)):
+            break
+    return np.clip(v - 0.5 * (lo + hi), lower, upper)
+
+
+class ADMMQP:
+    ''' ADMM solver (OSQP-style operator splitting) of
+        Minimize: 0.5 * wts.T @ P @ wts + q.T @ wts
+        Subject to: ones.T @ wts = 1
+                    lower <= wts <= upper
+                    sum of wts in each group <= group cap
+                    |wts - prev_wts|_1 <= max_turnover
+    Constraints are set once; solve() is warm-started from the previous solution.
+    Used for the turnover constraint, which ActiveSetQP does not handle.
+    After solve(), converged is False (with a warning) if max_iter was reached before the tolerances.
+    The returned weights are the iterate projected onto all the constraints (project_feasible).
+    args:
+        num_assets: number of assets
+        lower, upper: bounds of weights (scalars or arrays), lower=0 is long-only
+        groups: array of group labels of assets (e.g. sectors)
+        group_caps: dict of {group label: maximum total weight}
+        prev_wts: current weights, required with max_turnover
+        max_turnover: maximum of |wts - prev_wts|_1
+    '''
+    def __init__(self, num_assets, lower=0.0, upper=1.0, groups=None, group_caps=None,
+                 prev_wts=None, max_turnover=None, rho=0.1, sigma=1e-6, alpha=1.6,
+                 max_iter=4000, eps_abs=1e-6, eps_rel=1e-6):
+        n = num_assets
+        self.n = n
+        self.lower = np.broadcast_to(np.asarray(lower, dtype='float64'), (n,)).copy()
+        self.upper = np.broadcast_to(np.asarray(upper, dtype='float64'), (n,)).copy()
+        if self.lower.sum() > 1 or self.upper.sum() < 1:
+            raise ValueError('bounds are infeasible with sum of weights = 1')
+
+        # Group constraints: G @ wts <= caps
+        if group_caps:
+            groups = np.asarray(groups)
+            labels = list(group_caps.keys())
+            self.group_matrix = np.array([groups == label for label in labels], dtype='float64')
+            self.group_caps = np.array([group_caps[label] for label in labels], dtype='float64')
+        else:
+            self.group_matrix = np.zeros((0, n))
+            self.group_caps = np.zeros(0)
+
+        self.max_turnover = max_turnover
+        if max_turnover is not None:
+            if prev_wts is None:
+                raise ValueError('prev_wts is required with max_turnover')
+            self.prev_wts = np.asarray(prev_wts, dtype='float64').ravel()
+
+        self.rho, self.sigma, self.alpha = rho, sigma, alpha
+        self.max_iter, self.eps_abs, self.eps_rel = max_iter, eps_abs, eps_rel
+
+        # Constraint rows: [box (n), budget (1), groups (g), turnover (n or 0)]
+        self.num_turnover = n if max_turnover is not None else 0
+        self.m = n + 1 + len(self.group_caps) + self.num_turnover
+        self.rhos = np.full(self.m, rho)
+        self.rhos[n] = rho * 1e3 # equality constraint
+        self.x, self.z, self.y, self.scale = None, None, None, None
+
+    def A(self, x):
+        parts = [x, [x.sum()], self.group_matrix @ x]
+        if self.num_turnover:
+            parts.append(x)
+        return np.concatenate(parts)
+
+    def AT(self, v):
+        n, g = self.n, len(self.group_caps)
+        out = v[:n] + v[n] + self.group_matrix.T @ v[n + 1:n + 1 + g]
+        if self.num_turnover:
+            out = out + v[n + 1 + g:]
+        return out
+
+    def ATRA(self):
+        n = self.n
+        rhos = self.rhos
+        matrix = np.diag(rhos[:n] + (rhos[n + 1 + len(self.group_caps):] if self.num_turnover else 0))
+        matrix += rhos[n]
+        matrix += self.group_matrix.T @ (rhos[n + 1:n + 1 + len(self.group_caps), None] * self.group_matrix)
+        return matrix
+
+    def project(self, v):
+        n, g = self.n, len(self.group_caps)
+        out = np.empty_like(v)
+        out[:n] = np.clip(v[:n], self.lower, self.upper)
+        out[n] = 1.0
+        out[n + 1:n + 1 + g] = np.minimum(v[n + 1:n + 1 + g], self.group_caps)
+        if self.num_turnover:
+            out[n + 1 + g:] = self.prev_wts + project_l1_ball(v[n + 1 + g:] - self.prev_wts, self.max_turnover)
+        return out
+
+    def solve(self, P, q):
+        ''' returns: array of size [n] (warm-started from the previous solve) '''
+        q = np.asarray(q, dtype='float64').ravel()
+
+        # Scale the objective, so that the same rho works for daily or annual moments
+        scale = max(np.abs(P).max(), np.abs(q).max(), 1e-12)
+        P, q = P / scale, q / scale
+
+        if self.x is None:
+            self.x = np.clip(np.full(self.n, 1.0 / self.n), self.lower, self.upper)
+            self.z = self.project(self.A(self.x))
+            self.y = np.zeros(self.m)
+        else:
+            self.y = self.y * self.scale / scale # dual variables of the previous scaling
+        self.scale = scale
+        x, z, y = self.x, self.z, self.y
+
+        factor = cho_factor(P + self.sigma * np.eye(self.n) + self.ATRA())
+        rhos, alpha = self.rhos, self.alpha
+        self.converged = False
+        for iteration in range(self.max_iter):
+            x_tilde = cho_solve(factor, self.sigma * x - q + self.AT(rhos * z - y))
+            z_tilde = self.A(x_tilde)
+            x = alpha * x_tilde + (1 - alpha) * x
+            z_relaxed = alpha * z_tilde + (1 - alpha) * z
+            z_new = self.project(z_relaxed + y / rhos)
+            y = y + rhos * (z_relaxed - z_new)
+            z = z_new
+
+            Ax, Px, ATy = self.A(x), P @ x, self.AT(y)
+            primal = np.abs(Ax - z).max()
+            dual = np.abs(Px + q + ATy).max()
+            if primal <= self.eps_abs + self.eps_rel * max(np.abs(Ax).max(), np.abs(z).max()) and \
+               dual <= self.eps_abs + self.eps_rel * max(np.abs(Px).max(), np.abs(ATy).max(), np.abs(q).max()):
+                self.converged = True
+                break
+
+            # Adapt rho to balance primal and dual residuals (refactorization)
+            if iteration % 25 == 24:
+                ratio = np.sqrt((primal / max(np.abs(Ax).max(), np.abs(z).max(), 1e-12)) /
+                                (dual / max(np.abs(Px).max(), np.abs(ATy).max(), np.abs(q).max(), 1e-12) + 1e-12))
+                if ratio > 5 or ratio < 0.2:
+                    self.rhos = rhos = np.clip(rhos * ratio, 1e-6, 1e6)
+                    factor = cho_factor(P + self.sigma * np.eye(self.n) + self.ATRA())
+        self.iterations = iteration + 1
+        if not self.converged:
+            warnings.warn('ADMMQP did not converge in %d iterations (primal residual %.1e, dual residual %.1e)'
+                          %(self.max_iter, primal, dual))
+
+        self.x, self.z, self.y = x, z, y
+        # The iterate meets the constraints up to the tolerances only
+        return self.project_feasible(x)
+
+    def violation(self, x):
+        ''' Largest violation of the group caps and the turnover bound by weights x '''
+        violations = [0.0, (self.group_matrix @ x - self.group_caps).max(initial=0.0)]
+        if self.max_turnover is not None:
+            violations.append(np.abs(x - self.prev_wts).sum() - self.max_turnover)
+        return max(violations)
+
+    def project_feasible(self, v, tol=1e-12, max_iter=10000):
+        ''' Projection of v onto all the constraints (Dykstra's alternating projections)
+        Sets: bounds and budget (project_budget), group caps (groups are disjoint), turnover (l1 ball).
+        The returned point meets the bounds and the budget exactly, groups and turnover up to tol. '''
+        n = self.n
+        members = self.group_matrix.sum(axis=1)
+        x = v.copy()
+        corrections = [np.zeros(n), np.zeros(n), np.zeros(n)]
+        for _ in range(max_iter):
+            y = project_budget(x + corrections[0], self.lower, self.upper)
+            corrections[0] = x + corrections[0] - y
+            if self.violation(y) <= tol:
+                return y
+            z = y + corrections[1]
+            excess = np.maximum(self.group_matrix @ z - self.group_caps, 0) / np.maximum(members, 1)
+            z = z - self.group_matrix.T @ excess
+            corrections[1] = y + corrections[1] - z
+            x = z
+            if self.max_turnover is not None:
+                x = self.prev_wts + project_l1_ball(z + corrections[2] - self.prev_wts, self.max_turnover)
+                corrections[2] = z + corrections[2] - x
+        warnings.warn('ADMMQP weights violate the group caps or the turnover bound by %.1e' %self.violation(y))
+        return y
+
+
+class ActiveSetQP:
+    ''' Primal active-set solver (Nocedal & Wright, Algorithm 16.3) of
+        Minimize: 0.5 * wts.T @ P @ wts + q.T @ wts
+        Subject to: ones.T @ wts = 1
+                    lower <= wts <= upper
+                    sum of wts in each group <= group cap
+    It starts from a vertex, so each iteration solves a small system over the assets
+    not at their bounds; the feasible point and the working set are kept between
+    solve() calls, so a sweep over gamma needs only a few changes of the working set.
+    The Cholesky factor of P over the free assets (CovarianceSolver) is updated in O(k^2) when a
+    bound enters or leaves the working set, and reused when P is a multiple of the previous one
+    (gamma * covariance); the step is solved through the Schur complement of the equality constraints.
+    After solve(), converged is False (with a warning) if max_iter was reached before optimality.
+    args:
+        num_assets: number of assets
+        lower, upper: bounds of weights (scalars or arrays), lower=0 is long-only
+        groups: array of group labels of assets (e.g. sectors)
+        group_caps: dict of {group label: maximum total weight}
+    '''
+    def __init__(self, num_assets, lower=0.0, upper=1.0, groups=None, group_caps=None, max_iter=None, tol=1e-10):
+        n = num_assets
+        self.n = n
+        self.lower = np.broadcast_to(np.asarray(lower, dtype='float64'), (n,)).copy()
+        self.upper = np.broadcast_to(np.asarray(upper, dtype='float64'), (n,)).copy()
+        if group_caps:
+            groups = np.asarray(groups)
+            labels = list(group_caps.keys())
+            self.group_matrix = np.array([groups == label for label in labels], dtype='float64')
+            self.group_caps = np.array([group_caps[label] for label in labels], dtype='float64')
+        else:
+            self.group_matrix = np.zeros((0, n))
+            self.group_caps = np.zeros(0)
+        self.max_iter = max_iter if max_iter is not None else 10 * n + 100
+        self.tol = tol
+        self.x = None
+        self.base, self.factor, self.order = None, None, np.zeros(0, dtype=int)
+
+    def _rescale(self, P):
+        ''' Scale of P relative to the factorized matrix (None: not a multiple of it) '''
+        if self.base is None or P.shape != self.base.shape:
+            return None
+        # Compared along a fixed random direction: one product instead of an elementwise comparison
+        projected = P @ self.probe
+        scale = (projected @ self.base_probe) / (self.base_probe @ self.base_probe)
+        if scale > 0 and np.allclose(projected, scale * self.base_probe, rtol=1e-10, atol=0):
+            return scale
+        return None
+
+    def _sync_factor(self, free):
+        ''' Bring the factor of the free block up to date with the working set
+        returns: True if the factor is a Cholesky factor of the free block '''
+        in_factor = np.zeros(self.n, dtype=bool)
+        in_factor[self.order] = True
+        leaving = np.nonzero(~free[self.order])[0]
+        entering = np.nonzero(free & ~in_factor)[0]
+        if self.factor is None or self.factor.method != 'cholesky' or len(leaving) + len(entering) > len(self.order):
+            # (Re)factorize: cheaper than many single updates
+            self.order = np.nonzero(free)[0]
+            self.factor = CovarianceSolver(self.base[np.ix_(self.order, self.order)], rcond=1e-10) if len(self.order) else None
+        else:
+            for position in leaving[::-1]:
+                self.factor.remove_asset(position)
+            self.order = np.delete(self.order, leaving)
+            for i in entering:
+                self.order = np.append(self.order, i)
+                self.factor.add_asset(self.base[i, self.order])
+        return self.factor is not None and self.factor.method == 'cholesky'
+
+    def _step(self, P, scale, gradient, constraints, free):
+        ''' Equality-constrained step over the free assets and the multipliers of the constraints '''
+        step = np.zeros(self.n)
+        if self._sync_factor(free):
+            # P_FF @ s + C_F.T @ lambda = -g_F, C_F @ s = 0, with P_FF = scale * base_FF
+            idx = self.order
+            c = constraints[:, idx]
+            solved = self.factor.solve(np.column_stack([gradient[idx], c.T])) / scale
+            schur = c @ solved[:, 1:]
+            multipliers = np.linalg.lstsq(schur, -c @ solved[:, 0], rcond=None)[0]
+            step_free = -(solved[:, 0] + solved[:, 1:] @ multipliers)
+            # An ill-conditioned free block passes the pivot test but not the KKT conditions
+            residual = scale * (self.factor.covariance @ step_free) + c.T @ multipliers + gradient[idx]
+            if np.abs(residual).max() <= 1e-9 * max(np.abs(gradient[idx]).max(), 1e-300):
+                step[idx] = step_free
+                return step, multipliers
+
+        # Singular free block: dense KKT system
+        idx = np.nonzero(free)[0]
+        k, m = len(idx), len(constraints)
+        kkt = np.zeros((k + m, k + m))
+        kkt[:k, :k] = P[np.ix_(idx, idx)]
+        kkt[:k, k:] = constraints[:, idx].T
+        kkt[k:, :k] = constraints[:, idx]
+        rhs = np.concatenate([-gradient[idx], np.zeros(m)])
+        try:
+            solution = np.linalg.solve(kkt, rhs)
+        except np.linalg.LinAlgError:
+            solution = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+        step[idx] = solution[:k]
+        return step, solution[k:]
+
+    def initial_point(self, q):
+        ''' Feasible vertex: fill weights greedily, the most attractive assets (lowest q) first '''
+        x = self.lower.copy()
+        remaining = 1 - x.sum()
+        room = self.group_caps - self.group_matrix @ x
+        if remaining < -self.tol or (room < -self.tol).any():
+            raise ValueError('constraints are infeasible')
+        for i in np.argsort(q):
+            if remaining <= self.tol:
+                break
+            members = self.group_matrix[:, i] > 0
+            amount = min(self.upper[i] - x[i], remaining, room[members].min() if members.any() else np.inf)
+            if amount > 0:
+                x[i] += amount
+                remaining -= amount
+                room[members] -= amount
+        if remaining > self.tol:
+            raise ValueError('constraints are infeasible with sum of weights = 1')
+
+        # Working set: bounds of assets at their bounds, leaving at least one asset free for the budget
+        at_lower = np.isclose(x, self.lower, rtol=0, atol=self.tol)
+        at_upper = np.isclose(x, self.upper, rtol=0, atol=self.tol) & ~at_lower
+        if (at_lower | at_upper).all():
+            last = np.nonzero(x > self.lower + self.tol)[0]
+            last = last[-1] if len(last) else 0
+            at_lower[last] = at_upper[last] = False
+        self.x, self.at_lower, self.at_upper = x, at_lower, at_upper
+        self.active_groups = np.zeros(len(self.group_caps), dtype=bool)
+
+    def solve(self, P, q):
+        ''' returns: array of size [n] '''
+        q = np.asarray(q, dtype='float64').ravel()
+        if self.x is None:
+            self.initial_point(q)
+        x, at_lower, at_upper, active_groups = self.x, self.at_lower, self.at_upper, self.active_groups
+
+        scale = self._rescale(P)
+        if scale is None:
+            self.base, self.factor, self.order, scale = np.array(P, dtype='float64'), None, np.zeros(0, dtype=int), 1.0
+            self.probe = np.random.default_rng(0).standard_normal(self.n)
+            self.base_probe = self.base @ self.probe
+
+        self.converged = False
+        full_step = False
+        for self.iterations in range(1, self.max_iter + 1):
+            free = ~(at_lower | at_upper)
+            constraints = np.vstack([np.ones((1, self.n)), self.group_matrix[active_groups]])
+            gradient = P @ x + q
+
+            # Equality-constrained step over free assets, multipliers of the budget and active group constraints
+            # (after a full step, x minimizes over the same working set and the multipliers still hold)
+            if full_step:
+                step = np.zeros(self.n)
+            else:
+                step, multipliers = self._step(P, scale, gradient, constraints, free)
+            full_step = False
+
+            if np.abs(step).max() <= self.tol * max(1.0, np.abs(x).max()):
+                # Multipliers of inequality constraints in the working set must be non-negative
+                reduced = gradient + constraints.T @ multipliers
+                bound_multipliers = np.where(at_lower, reduced, np.where(at_upper, -reduced, np.inf))
+                group_multipliers = np.full(len(self.group_caps), np.inf)
+                group_multipliers[active_groups] = multipliers[1:]
+                worst_bound, worst_group = bound_multipliers.argmin(), group_multipliers.argmin() if len(group_multipliers) else None
+                min_bound = bound_multipliers[worst_bound]
+                min_group = group_multipliers[worst_group] if worst_group is not None else np.inf
+                if min(min_bound, min_group) >= -self.tol:
+                    self.converged = True
+                    break
+                if min_bound <= min_group:
+                    at_lower[worst_bound] = at_upper[worst_bound] = False
+                else:
+                    active_groups[worst_group] = False
+                continue
+
+            # Longest feasible step along the direction
+            alpha, blocking = 1.0, None
+            with np.errstate(divide='ignore', invalid='ignore'):
+                to_lower = np.where(free & (step < 0), (self.lower - x) / step, np.inf)
+                to_upper = np.where(free & (step > 0), (self.upper - x) / step, np.inf)
+                group_step = self.group_matrix @ step
+                to_group = np.where(~active_groups & (group_step > self.tol),
+                                    (self.group_caps - self.group_matrix @ x) / group_step, np.inf)
+            for kind, ratios in [('lower', to_lower), ('upper', to_upper), ('group', to_group)]:
+                if len(ratios) and ratios.min() < alpha:
+                    alpha, blocking = max(ratios.min(), 0.0), (kind, ratios.argmin())
+
+            x = x + alpha * step
+            full_step = blocking is None
+            if blocking is not None:
+                kind, i = blocking
+                if kind == 'lower':
+                    at_lower[i], x[i] = True, self.lower[i]
+                elif kind == 'upper':
+                    at_upper[i], x[i] = True, self.upper[i]
+                else:
+                    active_groups[i] = True
+
+        if not self.converged:
+            warnings.warn('ActiveSetQP did not converge in %d iterations, the weights are feasible but not optimal'
+                          %self.max_iter)
+        self.x = x
+        return x.copy()
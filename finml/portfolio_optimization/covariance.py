@@ -0,0 +1,244 @@
+''' Essential packages '''
+import numpy as np
+import pandas as pd
+
+
+def _demeaned(returns, weights=None):
+    ''' Returns minus (weighted) column means, missing returns are set to the mean (zero after demeaning)
+    The fill adds nothing to sums of products, so the estimators divide them by the number of rows
+    where both columns are valid (pairwise-complete); dividing by all rows would shrink the variances
+    of tickers with missing returns toward zero. '''
+    values = np.asarray(returns, dtype='float64')
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    if weights is None:
+        weights = np.ones(len(values))
+    weight_sum = weights @ valid
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(weight_sum > 0, (weights @ filled) / weight_sum, 0.0)
+    return np.where(valid, values - mean, 0.0)
+
+
+def _frame(covariance, returns):
+    if isinstance(returns, pd.DataFrame):
+        return pd.DataFrame(covariance, index=returns.columns, columns=returns.columns)
+    return covariance
+
+
+class FactorCovariance:
+    ''' Low-rank plus diagonal covariance: loadings @ factor_cov @ loadings.T + diag(specific_var)
+    Stores O(n*k) numbers instead of a dense n x n matrix; products and solves cost O(n*k).
+    args:
+        loadings: array of size [n, k]
+        factor_cov: array of size [k, k]
+        specific_var: array of size [n]
+        tickers: labels of the n assets (optional)
+    '''
+    def __init__(self, loadings, factor_cov, specific_var, tickers=None):
+        self.loadings = np.asarray(loadings, dtype='float64')
+        self.factor_cov = np.asarray(factor_cov, dtype='float64')
+        self.specific_var = np.asarray(specific_var, dtype='float64').ravel()
+        self.tickers = tickers
+        self._woodbury = None
+
+    @classmethod
+    def from_pca(cls, returns, num_factors=3):
+        ''' Statistical factor model: the first num_factors principal components of returns
+        The components are taken from the mean-filled returns (see _demeaned); the variance of each
+        ticker is computed over its own valid returns, so the specific variance absorbs the fill. '''
+        demeaned = _demeaned(returns)
+        num_obs = len(demeaned)
+        _, singular, vt = np.linalg.svd(demeaned, full_matrices=False)
+        loadings = vt[:num_factors].T
+        factor_var = singular[:num_factors] ** 2 / (num_obs - 1)
+        num_valid = (~np.isnan(np.asarray(returns, dtype='float64'))).sum(axis=0)
+        total_var = (demeaned ** 2).sum(axis=0) / np.clip(num_valid - 1, 1, None)
+        specific_var = np.clip(total_var - (loadings ** 2) @ factor_var, 1e-12, None)
+        tickers = returns.columns if isinstance(returns, pd.DataFrame) else None
+        return cls(loadings, np.diag(factor_var), specific_var, tickers)
+
+    @classmethod
+    def from_factors(cls, returns, factors):
+        ''' Time-series regression of each asset on given factor returns (e.g. Fama-French 3 factors)
+        args:
+            returns: DataFrame of returns [date x ticker], missing returns are skipped per ticker
+            factors: DataFrame of factor returns [date x factor], dates are intersected with returns
+        '''
+        dates = returns.index.intersection(factors.index)
+        y = returns.loc[dates].values.astype('float64')
+        f = factors.loc[dates].values.astype('float64')
+        x = np.hstack([np.ones((len(dates), 1)), f])
+        valid = ~np.isnan(y)
+        filled = np.where(valid, y, 0.0)
+
+        # Normal equations of every ticker over its own valid dates, solved in one batch
+        xtx = np.einsum('ti,tj,tk->ijk', valid.astype('float64'), x, x)
+        xty = np.einsum('ti,tj->ij', filled, x)
+        coefs = np.linalg.solve(xtx + 1e-12 * np.eye(x.shape[1]), xty[..., None])[..., 0]
+        residuals = np.where(valid, y - x @ coefs.T, 0.0)
+        dof = np.clip(valid.sum(axis=0) - x.shape[1], 1, None)
+        specific_var = (residuals ** 2).sum(axis=0) / dof
+
+        return cls(coefs[:, 1:], np.atleast_2d(np.cov(f.T)), specific_var, returns.columns)
+
+    @property
+    def shape(self):
+        n = len(self.specific_var)
+        return (n, n)
+
+    @property
+    def nbytes(self):
+        return self.loadings.nbytes + self.factor_cov.nbytes + self.specific_var.nbytes
+
+    def __len__(self):
+        return len(self.specific_var)
+
+    def diagonal(self):
+        return np.einsum('ij,jk,ik->i', self.loadings, self.factor_cov, self.loadings) + self.specific_var
+
+    def matvec(self, x):
+        ''' covariance @ x, x may have several columns '''
+        x = np.asarray(x, dtype='float64')
+        d = self.specific_var.reshape((-1,) + (1,) * (x.ndim - 1))
+        return self.loadings @ (self.factor_cov @ (self.loadings.T @ x)) + d * x
+
+    def __matmul__(self, x):
+        return self.matvec(x)
+
+    def solve(self, b):
+        ''' inv(covariance) @ b with the Woodbury identity, O(n*k^2) '''
+        if self._woodbury is None:
+            # factor_cov = R @ R.T, covariance = D + (B @ R) @ (B @ R).T
+            eigenvalues, eigenvectors = np.linalg.eigh(self.factor_cov)
+            scaled = self.loadings @ (eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None)))
+            scaled_d = scaled / self.specific_var[:, None]
+            capacitance = np.eye(scaled.shape[1]) + scaled.T @ scaled_d
+            self._woodbury = (scaled_d, np.linalg.inv(capacitance))
+        scaled_d, capacitance_inverse = self._woodbury
+        b = np.asarray(b, dtype='float64')
+        d = self.specific_var.reshape((-1,) + (1,) * (b.ndim - 1))
+        return b / d - scaled_d @ (capacitance_inverse @ (scaled_d.T @ b))
+
+    def dense(self):
+        return self.loadings @ self.factor_cov @ self.loadings.T + np.diag(self.specific_var)
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    def to_frame(self):
+        return pd.DataFrame(self.dense(), index=self.tickers, columns=self.tickers)
+
+
+class OnlineCovariance:
+    ''' Pairwise-complete mean and covariance accumulated over chunks of rows (Welford/Chan updates)
+    Each pair of columns uses the rows where both are valid, as DataFrame.cov,
+    so the statistics never need all rows in memory at once.
+    args:
+        num_columns: number of columns (e.g. symbols)
+    '''
+    def __init__(self, num_columns):
+        shape = (num_columns, num_columns)
+        self.count = np.zeros(shape) # [i, j]: number of rows where i and j are valid
+        self.pair_mean = np.zeros(shape) # [i, j]: mean of column i over those rows
+        self.comoment = np.zeros(shape) # [i, j]: sum of products of deviations
+
+    def update(self, chunk):
+        ''' chunk: array of size [rows, num_columns], NaN for missing values '''
+        chunk = np.asarray(chunk, dtype='float64')
+        valid = ~np.isnan(chunk)
+        mask = valid.astype('float64')
+        filled = np.where(valid, chunk, 0.0)
+
+        count = mask.T @ mask
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, (filled.T @ mask) / count, 0.0)
+        comoment = filled.T @ filled - count * mean * mean.T
+
+        # Merge two sets of rows (Chan et al.): deviations of the means weighted by the counts
+        total = self.count + count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(total > 0, count / total, 0.0)
+        delta = mean - self.pair_mean
+        self.comoment += comoment + delta * delta.T * self.count * weight
+        self.pair_mean += delta * weight
+        self.count = total
+
+    @property
+    def mean(self):
+        return np.diag(self.pair_mean).copy()
+
+    @property
+    def covariance(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 1, self.comoment / (self.count - 1), np.nan)
+
+
+def sample_covariance(returns):
+    ''' Pairwise-complete sample covariance (same as DataFrame.cov) '''
+    if isinstance(returns, pd.DataFrame):
+        return returns.cov()
+    return _frame(pd.DataFrame(returns).cov().values, returns)
+
+
+def ledoit_wolf(returns):
+    ''' Ledoit-Wolf (2004) shrinkage toward a scaled identity, well-conditioned even if tickers > dates
+    The sample covariance and the variance of its entries are pairwise-complete (see _demeaned);
+    with no missing returns they are the formulas of the paper.
+    returns:
+        covariance [ticker x ticker], shrinkage intensity in [0, 1]
+    '''
+    x = _demeaned(returns)
+    valid = (~np.isnan(np.asarray(returns, dtype='float64'))).astype('float64')
+    num_assets = x.shape[1]
+    pairs = np.clip(valid.T @ valid, 1, None) # number of rows where both are valid
+    sample = x.T @ x / pairs
+    mu = np.trace(sample) / num_assets
+    delta = ((sample - mu * np.eye(num_assets)) ** 2).sum()
+    # Sum of the variances of the entries of sample: mean of (x_ti * x_tj)^2 minus sample^2, over pairs
+    beta = (((x ** 2).T @ (x ** 2) / pairs - sample ** 2) / pairs).sum()
+    shrinkage = min(max(beta, 0.0), delta) / delta if delta > 0 else 1.0
+    covariance = shrinkage * mu * np.eye(num_assets) + (1 - shrinkage) * sample
+    return _frame(covariance * pairs / np.clip(pairs - 1, 1, None), returns), shrinkage
+
+
+def ewma_covariance(returns, halflife=60):
+    ''' Exponentially weighted covariance, the weight of a return halves every halflife observations
+    Products are normalized by the weights of the rows where both returns are valid (pairwise-complete). '''
+    values = np.asarray(returns, dtype='float64')
+    weights = 0.5 ** (np.arange(len(values))[::-1] / halflife)
+    x = _demeaned(values, weights)
+    valid = (~np.isnan(values)).astype('float64')
+    weight_sum = (valid * weights[:, None]).T @ valid # pairwise normalization
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = (x * weights[:, None]).T @ x / weight_sum
+    return _frame(covariance, returns)
+
+
+# name: function of (returns, **kwargs) returning a dense covariance or a FactorCovariance
+ESTIMATORS = {
+    'sample': sample_covariance,
+    'ledoit_wolf': lambda returns: ledoit_wolf(returns)[0],
+    'ewma': ewma_covariance,
+    'pca': FactorCovariance.from_pca,
+    'factor': FactorCovariance.from_factors,
+}
+
+
+def estimate_covariance(returns, estimator='sample', compact=False, **kwargs):
+    ''' Covariance of returns with a pluggable estimator
+    args:
+        returns: DataFrame of returns [date x ticker]
+        estimator: one from ESTIMATORS, 'pca' and 'factor' are low-rank factor models
+                   ('factor' requires factors=DataFrame of factor returns, e.g. Fama-French 3 factors)
+        compact: if True, factor models are returned as FactorCovariance instead of a dense matrix
+        kwargs: arguments of the estimator (halflife of 'ewma', num_factors of 'pca')
+    returns:
+        DataFrame of [ticker x ticker], or FactorCovariance
+    '''
+    if estimator not in ESTIMATORS:
+        raise ValueError('estimator should be one of %s' %list(ESTIMATORS))
+    covariance = ESTIMATORS[estimator](returns, **kwargs)
+    if isinstance(covariance, FactorCovariance) and not compact:
+        return covariance.to_frame() if covariance.tickers is not None else covariance.dense()
+    return covariance
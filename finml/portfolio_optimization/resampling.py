@@ -0,0 +1,158 @@
+''' Essential packages '''
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from finml.portfolio_optimization.constrained import ActiveSetQP
+from finml.portfolio_optimization.risk import value_at_risk
+
+
+def draw_scenarios(rng, num_draws, num_obs, mean_return=None, cholesky=None, history=None):
+    ''' Scenarios of returns [num_draws, num_obs, n]: multivariate normal from the moments,
+    or bootstrapped rows of the history if given '''
+    if history is not None:
+        return history[rng.integers(0, len(history), size=(num_draws, num_obs))]
+    noise = rng.standard_normal((num_draws, num_obs, len(cholesky)))
+    return mean_return + noise @ cholesky.T
+
+
+def frontier_weights(means, covariances, num_points):
+    ''' Closed-form frontiers of many draws at once (see SimpleMeanVariance.frontier)
+    Target returns of each draw run from its minimum-variance portfolio to its largest mean return.
+    args:
+        means: array of size [draws, n]
+        covariances: array of size [draws, n, n]
+    returns:
+        weights: array of size [draws, n, num_points]
+    '''
+    rhs = np.stack([np.ones_like(means), means], axis=2)
+    inverse = np.linalg.solve(covariances, rhs) # [draws, n, 2]
+    a = inverse[:, :, 0].sum(axis=1)
+    b = inverse[:, :, 1].sum(axis=1)
+    c = (means * inverse[:, :, 1]).sum(axis=1)
+    d = a * c - b ** 2
+
+    steps = np.linspace(0, 1, num_points)
+    targets = b[:, None] / a[:, None] + steps * (means.max(axis=1) - b / a)[:, None] # [draws, points]
+    coef_ones = (c[:, None] - targets * b[:, None]) / d[:, None]
+    coef_mean = (targets * a[:, None] - b[:, None]) / d[:, None]
+    return inverse[:, :, [0]] * coef_ones[:, None, :] + inverse[:, :, [1]] * coef_mean[:, None, :]
+
+
+def _simulate_chunk(args):
+    ''' One chunk of draws (module-level, so it can run in a process pool) '''
+    seed, num_draws, num_obs, mean_return, cholesky, history, num_points, gammas, alpha = args
+    rng = np.random.default_rng(seed)
+    scenarios = draw_scenarios(rng, num_draws, num_obs, mean_return, cholesky, history)
+
+    # Moments estimated from each draw
+    means = scenarios.mean(axis=1)
+    centered = scenarios - means[:, None, :]
+    covariances = np.swapaxes(centered, 1, 2) @ centered / (num_obs - 1)
+    num_assets = means.shape[1]
+    ridge = 1e-10 * np.trace(covariances, axis1=1, axis2=2)[:, None, None] / num_assets
+    covariances = covariances + ridge * np.eye(num_assets)
+
+    if gammas is None:
+        weights = frontier_weights(means, covariances, num_points)
+    else:
+        # Long-only: risk aversion sweep of each draw (warm-started active set)
+        weights = np.empty((num_draws, num_assets, len(gammas)))
+        for draw in range(num_draws):
+            qp = ActiveSetQP(num_assets)
+            for idx, gamma in enumerate(gammas):
+                weights[draw, :, idx] = qp.solve(gamma * covariances[draw], -means[draw])
+
+    # Risk of each draw's portfolios over its own scenarios
+    portfolio_returns = scenarios @ weights # [draws, obs, points]
+    var, cvar = value_at_risk(portfolio_returns, alpha, axis=1)
+    return weights, var, cvar
+
+
+class ResampledFrontier:
+    ''' Michaud-style resampled frontier and Monte Carlo risk of its portfolios
+    Each draw simulates num_obs returns (multivariate normal from the moments, or bootstrapped
+    rows of the history), re-estimates the moments, and solves its frontier; the weights of the
+    portfolios of the same rank are averaged over draws.
+    Draws are split into chunks of fixed size with seeds spawned from one SeedSequence,
+    so the result depends on seed only (not on the number of processes).
+    args:
+        mean_return: array of size [n, 1]
+        covariance: array of size [n, n]
+        returns: DataFrame or array of historical returns [date x n] (bootstrap)
+        num_obs: number of observations per draw (e.g. 252 daily returns)
+        seed: seed of the SeedSequence
+    '''
+    def __init__(self, mean_return, covariance, returns=None, num_obs=252, seed=0):
+        self.mean_return = np.asarray(mean_return, dtype='float64').ravel()
+        self.covariance = np.asarray(covariance, dtype='float64')
+        self.history = None if returns is None else np.nan_to_num(np.asarray(returns, dtype='float64'))
+        self.num_obs = num_obs
+        self.seed = seed
+        eigenvalues, eigenvectors = np.linalg.eigh(self.covariance)
+        self.cholesky = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None)) # covariance = C @ C.T
+
+    def _run(self, num_draws, method, num_points, gammas, alpha, chunk_size, num_processes):
+        if method not in ['parametric', 'bootstrap']:
+            raise ValueError('method should be one of ["parametric", "bootstrap"]')
+        if method == 'bootstrap' and self.history is None:
+            raise ValueError('returns are required for bootstrap')
+        history = self.history if method == 'bootstrap' else None
+
+        sizes = [min(chunk_size, num_draws - lo) for lo in range(0, num_draws, chunk_size)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        tasks = [(seed, size, self.num_obs, self.mean_return, self.cholesky, history, num_points, gammas, alpha)
+                 for seed, size in zip(seeds, sizes)]
+        if num_processes == 0 or len(tasks) == 1:
+            results = [_simulate_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=num_processes or os.cpu_count()) as executor:
+                results = list(executor.map(_simulate_chunk, tasks))
+        return [np.concatenate(parts, axis=0) for parts in zip(*results)]
+
+    def run(self, num_draws=1000, method='parametric', num_points=21, long_only=False, gammas=None,
+            alpha=0.05, chunk_size=50, num_processes=None):
+        ''' Resampled frontier
+        args:
+            method: 'parametric' (normal from the moments) or 'bootstrap' (rows of returns)
+            num_points: number of portfolios of each (unconstrained) frontier
+            long_only: if True, each draw solves the long-only risk aversion curve over gammas
+                       (default: 21 values between 1 and 1000) instead of the closed-form frontier
+            alpha: tail probability of VaR/CVaR
+            num_processes: number of processes (default: number of CPUs, 0: no process pool)
+        returns:
+            dict of
+                weights: averaged weights [n, points]
+                weights_std: standard deviation of weights over draws [n, points]
+                mean, variance: of the averaged portfolios under the estimated moments [points]
+                var, cvar: VaR/CVaR of each draw's portfolios over its scenarios [draws, points]
+        '''
+        if long_only and gammas is None:
+            gammas = np.logspace(0, 3, 21)
+        weights, var, cvar = self._run(num_draws, method, num_points, gammas if long_only else None,
+                                       alpha, chunk_size, num_processes)
+        averaged = weights.mean(axis=0)
+        return {'weights': averaged,
+                'weights_std': weights.std(axis=0),
+                'mean': self.mean_return @ averaged,
+                'variance': np.einsum('ik,ij,jk->k', averaged, self.covariance, averaged),
+                'var': var,
+                'cvar': cvar}
+
+    def simulate_risk(self, weights, num_draws=1000, method='parametric', alpha=0.05, seed=None, chunk_size=50):
+        ''' Monte Carlo VaR/CVaR of given portfolios over num_draws x num_obs simulated returns
+        args:
+            weights: array of size [n, portfolios]
+        returns:
+            var, cvar: arrays of size [portfolios] (losses over one observation period)
+        '''
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed if seed is None else seed))
+        history = self.history if method == 'bootstrap' else None
+        if method == 'bootstrap' and history is None:
+            raise ValueError('returns are required for bootstrap')
+        weights = np.asarray(weights, dtype='float64').reshape(len(self.mean_return), -1)
+        portfolio_returns = np.concatenate([
+            (draw_scenarios(rng, min(chunk_size, num_draws - lo), self.num_obs, self.mean_return, self.cholesky,
+                            history) @ weights).reshape(-1, weights.shape[1])
+            for lo in range(0, num_draws, chunk_size)], axis=0)
+        return value_at_risk(portfolio_returns, alpha, axis=0)
@@ -0,0 +1,131 @@
+''' Essential packages '''
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+
+def _weight_matrix(weights):
+    ''' weights of portfolios as an array of size [n, portfolios] '''
+    if isinstance(weights, (pd.DataFrame, pd.Series)):
+        weights = weights.values
+    weights = np.asarray(weights, dtype='float64')
+    return weights.reshape(len(weights), -1)
+
+
+def portfolio_returns(weights, returns):
+    ''' Returns of many portfolios at once, missing returns count as 0
+    args:
+        weights: array of size [n, portfolios]
+        returns: DataFrame or array of returns [date x n]
+    returns:
+        array of size [date, portfolios]
+    '''
+    returns = np.nan_to_num(np.asarray(returns, dtype='float64'))
+    return returns @ _weight_matrix(weights)
+
+
+def value_at_risk(returns, alpha=0.05, axis=0):
+    ''' Historical VaR and CVaR (expected shortfall) of returns along axis, as positive losses
+    Only the tail is selected (np.partition), the returns are not fully sorted. '''
+    returns = np.asarray(returns, dtype='float64')
+    num_tail = max(1, int(np.floor(alpha * returns.shape[axis])))
+    partitioned = np.partition(returns, num_tail - 1, axis=axis)
+    tail = np.take(partitioned, np.arange(num_tail), axis=axis)
+    var = -np.take(partitioned, num_tail - 1, axis=axis)
+    cvar = -tail.mean(axis=axis)
+    return var, cvar
+
+
+def parametric_var(weights, mean_return, covariance, alpha=0.05):
+    ''' Gaussian VaR and CVaR of many portfolios from the moments, as positive losses
+    args:
+        weights: array of size [n, portfolios]
+        mean_return: array of size [n, 1]
+        covariance: array of size [n, n] (or FactorCovariance)
+    returns:
+        var, cvar: arrays of size [portfolios]
+    '''
+    weights = _weight_matrix(weights)
+    mean_p = np.asarray(mean_return, dtype='float64').ravel() @ weights
+    std_p = np.sqrt(np.clip((weights * (covariance @ weights)).sum(axis=0), 0, None))
+    z = norm.ppf(alpha)
+    var = -(mean_p + z * std_p)
+    cvar = -(mean_p - std_p * norm.pdf(z) / alpha)
+    return var, cvar
+
+
+def max_drawdown(returns):
+    ''' Maximum drawdown of each column of returns [date x portfolios] (compounded), as a positive fraction '''
+    wealth = np.cumprod(1 + np.nan_to_num(np.asarray(returns, dtype='float64')), axis=0)
+    peak = np.maximum.accumulate(np.maximum(wealth, 1.0), axis=0)
+    return (1 - wealth / peak).max(axis=0)
+
+
+def risk_contributions(weights, covariance):
+    ''' Marginal and component contributions to the volatility of many portfolios
+    The components of a portfolio sum to its volatility.
+    args:
+        weights: array of size [n, portfolios]
+        covariance: array of size [n, n] (or FactorCovariance)
+    returns:
+        marginal: array of size [n, portfolios], d(volatility) / d(weight)
+        component: array of size [n, portfolios], weight * marginal
+    '''
+    weights = _weight_matrix(weights)
+    cov_w = covariance @ weights
+    std_p = np.sqrt(np.clip((weights * cov_w).sum(axis=0), 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        marginal = np.where(std_p > 0, cov_w / std_p, 0.0)
+    return marginal, weights * marginal
+
+
+def tracking_error(weights, returns, benchmark_returns):
+    ''' Standard deviation of the active returns (portfolio - benchmark) of many portfolios
+    args:
+        returns: DataFrame or array of returns [date x n]
+        benchmark_returns: Series or array of returns [date], e.g. KPI200
+    returns:
+        array of size [portfolios] (per period of returns, not annualized)
+    '''
+    benchmark = np.nan_to_num(np.asarray(benchmark_returns, dtype='float64').ravel())
+    active = portfolio_returns(weights, returns) - benchmark[:, None]
+    return active.std(axis=0, ddof=1)
+
+
+def risk_report(market, weights, tickers, index_ticker='KPI200', start=None, end=None,
+                alpha=0.05, chunk_size=2000):
+    ''' Risk of many portfolios over the daily returns of the market
+    args:
+        market: initialized market CLASS instance
+        weights: array of size [len(tickers), portfolios] (or DataFrame with tickers as index)
+        tickers: a list of tickers of the rows of weights
+        index_ticker: benchmark of the tracking error
+        chunk_size: number of portfolios evaluated at once (bounds the memory of [date x portfolios])
+    returns:
+        DataFrame of [portfolio x (mean, std, var, cvar, parametric_var, parametric_cvar,
+                                   max_drawdown, tracking_error)]
+    '''
+    start = market.prices.index[0] if start is None else start
+    end = market.prices.index[-1] if end is None else end
+    returns = market.calculate_returns(start=start, end=end, subset=list(tickers) + [index_ticker])
+    benchmark = returns[index_ticker].fillna(0).values
+    returns = np.nan_to_num(returns[list(tickers)].values)
+    mean_return = returns.mean(axis=0)
+    covariance = np.cov(returns, rowvar=False)
+
+    names = None
+    if isinstance(weights, (pd.DataFrame, pd.Series)):
+        weights = weights.reindex(tickers).fillna(0)
+        names = weights.columns if isinstance(weights, pd.DataFrame) else [weights.name]
+    weights = _weight_matrix(weights)
+    stats = list()
+    for lo in range(0, weights.shape[1], chunk_size):
+        chunk = weights[:, lo:lo + chunk_size]
+        daily = returns @ chunk
+        var, cvar = value_at_risk(daily, alpha)
+        p_var, p_cvar = parametric_var(chunk, mean_return, covariance, alpha)
+        stats.append(np.column_stack([daily.mean(axis=0), daily.std(axis=0, ddof=1), var, cvar, p_var, p_cvar,
+                                      max_drawdown(daily), (daily - benchmark[:, None]).std(axis=0, ddof=1)]))
+    return pd.DataFrame(np.vstack(stats), index=names,
+                        columns=['mean', 'std', 'var', 'cvar', 'parametric_var', 'parametric_cvar',
+                                 'max_drawdown', 'tracking_error'])
@@ -1,6 +1,9 @@
 ''' Essential packages '''
 import numpy as np
 
+from finml.portfolio_optimization.solver import CovarianceSolver
+from finml.portfolio_optimization.constrained import ActiveSetQP, ADMMQP
+
 class RiskAverseOptimization:
     '''
     Maximize: \mu.T @ wts - \gamma * wts.T @ cov @ wts
@@ -9,21 +12,59 @@ class RiskAverseOptimization:
     def __init__(self, mean_return, covariance):
         self.mean_return = mean_return
         self.covariance = covariance
-        self.covariance_inverse = np.linalg.inv(self.covariance)
+        self.solver = CovarianceSolver(self.covariance)
 
         self.ones_vector = np.ones((len(self.mean_return), 1))
+        inverse = self.solver.solve(np.hstack([self.ones_vector, self.mean_return]))
+        self.inverse_ones, self.inverse_mean = inverse[:, [0]], inverse[:, [1]]
+
+    @property
+    def covariance_inverse(self):
+        return self.solver.inverse
 
     def get_weight(self, gamma):
-        coef = (self.ones_vector.T @ self.covariance_inverse @ self.mean_return - gamma) / \
-               (self.ones_vector.T @ self.covariance_inverse @ self.ones_vector)
-        wts = 1/gamma * self.covariance_inverse @ (self.mean_return - coef * self.ones_vector)
+        coef = ((self.ones_vector.T @ self.inverse_mean)[0][0] - gamma) / \
+               (self.ones_vector.T @ self.inverse_ones)[0][0]
+        wts = 1/gamma * (self.inverse_mean - coef * self.inverse_ones)
         
         return wts
 
+    def get_constrained_weight(self, gamma, lower=0.0, upper=1.0, groups=None, group_caps=None,
+                               prev_wts=None, max_turnover=None):
+        ''' Weights under constraints (long-only by default), same objective scale as get_weight
+        args:
+            lower, upper: bounds of weights (scalars or arrays)
+            groups: array of group labels of assets (e.g. sectors)
+            group_caps: dict of {group label: maximum total weight}
+            prev_wts: current weights, required with max_turnover
+            max_turnover: maximum of sum(|wts - prev_wts|)
+        returns:
+            wts: array of size [len(self.mean_return), 1]
+        '''
+        return self.risk_aversion_curve([gamma], lower, upper, groups, group_caps, prev_wts, max_turnover)
+
+    def risk_aversion_curve(self, gammas, lower=0.0, upper=1.0, groups=None, group_caps=None,
+                            prev_wts=None, max_turnover=None):
+        ''' Constrained weights for a sweep of gamma (each solve is warm-started from the previous one)
+        The active-set solver is used unless a turnover constraint is given (ADMM).
+        Its factorization is updated as assets enter or leave the portfolio and reused across gammas:
+        500 assets x 20 gammas take about 0.5s (see benchmarks/bench_risk_aversion_curve.py).
+        returns:
+            wts: array of size [len(self.mean_return), len(gammas)]
+        '''
+        if max_turnover is None:
+            qp = ActiveSetQP(len(self.mean_return), lower, upper, groups, group_caps)
+        else:
+            qp = ADMMQP(len(self.mean_return), lower, upper, groups, group_caps, prev_wts, max_turnover)
+        # Increasing risk aversion moves weights away from the vertex the solver starts from
+        covariance = np.asarray(self.covariance) # the active set is indexed, FactorCovariance is expanded
+        wts = {gamma: qp.solve(gamma * covariance, -self.mean_return) for gamma in sorted(gammas)}
+        wts = [wts[gamma] for gamma in gammas]
+
+        return np.stack(wts, axis=1)
+
     def portfolio_statistics(self, wts):
-        mean_p = 0
-        for m, w in zip(self.mean_return, wts):
-            mean_p += m[0]*w[0]
+        mean_p = (self.mean_return.T @ wts)[0][0]
 
-        cov_p = np.matmul(np.matmul(wts.T, self.covariance), wts)
+        cov_p = wts.T @ (self.covariance @ wts)
         return mean_p, cov_p[0][0]
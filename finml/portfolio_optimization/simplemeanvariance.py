@@ -4,51 +4,66 @@ import os
 from datetime import datetime
 import matplotlib.pyplot as plt
 
+from finml.portfolio_optimization.solver import CovarianceSolver
+
 class SimpleMeanVariance:
     def __init__(self, mean_return, covariance):
         self.mean_return = mean_return
         self.covariance = covariance
-        self.covariance_inverse = np.linalg.inv(self.covariance)
+        self.solver = CovarianceSolver(self.covariance)
 
         self.ones_vector = np.ones((len(self.mean_return), 1))
 
+        # Scalars of the closed-form frontier
+        inverse = self.solver.solve(np.hstack([self.ones_vector, self.mean_return]))
+        self.inverse_ones, self.inverse_mean = inverse[:, [0]], inverse[:, [1]]
+        self.A = (self.ones_vector.T @ self.inverse_ones)[0][0]
+        self.B = (self.ones_vector.T @ self.inverse_mean)[0][0]
+        self.C = (self.mean_return.T @ self.inverse_mean)[0][0]
+        self.D = self.A * self.C - self.B ** 2
+
+    @property
+    def covariance_inverse(self):
+        return self.solver.inverse
+
     def get_weight(self, target_return):
 
-        # @ == np.matmul
-        lambda2 = (target_return * self.ones_vector.T @ self.covariance_inverse @ self.mean_return - \
-              self.mean_return.T @ self.covariance_inverse @ self.mean_return) / \
-        ((self.ones_vector.T @ self.covariance_inverse @ self.ones_vector) * \
-         (self.mean_return.T @ self.covariance_inverse @ self.mean_return) - \
-        (self.ones_vector.T @ self.covariance_inverse @ self.mean_return) * \
-         (self.mean_return.T @ self.covariance_inverse @ self.ones_vector))
-        
-        lambda1 = -(lambda2 * self.mean_return.T @ self.covariance_inverse @ self.ones_vector + target_return) / \
-                  (self.mean_return.T @ self.covariance_inverse @ self.mean_return)
+        lambda2 = (target_return * self.B - self.C) / self.D
+        lambda1 = -(lambda2 * self.B + target_return) / self.C
 
-        self.weight = -lambda1 * self.covariance_inverse @ self.mean_return - \
-        lambda2 * self.covariance_inverse @ self.ones_vector
+        self.weight = -lambda1 * self.inverse_mean - lambda2 * self.inverse_ones
 
 
     def portfolio_statistics(self):
-        mean_p = 0
-        for m, w in zip(self.mean_return, self.weight):
-            mean_p += m[0]*w[0]
+        mean_p = (self.mean_return.T @ self.weight)[0][0]
 
-        cov_p = np.matmul(np.matmul(self.weight.T, self.covariance), self.weight)
+        cov_p = self.weight.T @ (self.covariance @ self.weight)
         return mean_p, cov_p[0][0]
 
-    def plot(self, show=True, save_path=None):
-        x, y = [], []
+    def frontier(self, target_returns=None, num_points=101):
+        ''' Minimum-variance frontier for many target returns at once
+        args:
+            target_returns: array of target returns (default: num_points between min and max mean return)
+        returns:
+            means: array of size [K]
+            variances: array of size [K]
+            weights: array of size [len(self.mean_return), K]
+        '''
+        if target_returns is None:
+            target_returns = np.linspace(self.mean_return.min(), self.mean_return.max(), num_points)
+        targets = np.asarray(target_returns, dtype='float64').reshape(1, -1)
+
+        # w = ((C - rB) * inv(cov) @ ones + (rA - B) * inv(cov) @ mean) / D
+        coefs = np.vstack([self.C - targets * self.B, targets * self.A - self.B]) / self.D
+        weights = np.hstack([self.inverse_ones, self.inverse_mean]) @ coefs
 
-        mean_max, mean_min = max(self.mean_return), min(self.mean_return)
-        divide = 100
-        for idx in range(divide + 1):
-            mean_target = mean_min + (float(idx) / float(divide)) * (mean_max - mean_min)
-            self.get_weight(mean_target)
-            mean_portfolio, covariance_portfolio = self.portfolio_statistics()
+        means = targets[0]
+        variances = (self.A * means ** 2 - 2 * self.B * means + self.C) / self.D
+        return means, variances, weights
 
-            x.append(covariance_portfolio)
-            y.append(mean_portfolio)
+    def plot(self, show=True, save_path=None):
+        y, x, weights = self.frontier(num_points=101)
+        self.weight = weights[:, -1:]
 
         plt.plot(x, y, color='black')
         plt.xlabel('std')
@@ -0,0 +1,98 @@
+''' Essential packages '''
+import numpy as np
+from scipy.linalg import cholesky, cho_solve, solve_triangular, LinAlgError
+
+from finml.portfolio_optimization.covariance import FactorCovariance
+
+
+class CovarianceSolver:
+    ''' Solve covariance @ x = b with a cached factorization instead of an explicit inverse
+    Cholesky factorization is used if the covariance is positive definite,
+    otherwise the pseudo-inverse from the eigen decomposition (near-singular covariance).
+    A FactorCovariance is solved with the Woodbury identity, without a dense matrix.
+    args:
+        covariance: array of size [n, n] or FactorCovariance
+        rcond: eigenvalues below rcond * largest eigenvalue are treated as zero
+    '''
+    def __init__(self, covariance, rcond=1e-12):
+        self.rcond = rcond
+        if isinstance(covariance, FactorCovariance):
+            self.covariance, self._inverse, self.lower, self.method = covariance, None, None, 'factor'
+        else:
+            self.factorize(np.array(covariance, dtype='float64'))
+
+    def factorize(self, covariance):
+        self.covariance = covariance
+        self._inverse = None
+        try:
+            self.lower = cholesky(covariance, lower=True)
+            # Same scale as the eigenvalue cut: squared diagonal of L (pivots) against rcond
+            if np.diag(self.lower).min() ** 2 <= self.rcond * np.diag(self.lower).max() ** 2:
+                raise LinAlgError('covariance is nearly singular')
+            self.method = 'cholesky'
+        except LinAlgError:
+            eigenvalues, eigenvectors = np.linalg.eigh((covariance + covariance.T) / 2)
+            keep = eigenvalues > self.rcond * max(eigenvalues.max(), 0)
+            self.lower = None
+            self.eigenvalues, self.eigenvectors = eigenvalues[keep], eigenvectors[:, keep]
+            self.method = 'eigen'
+
+    def solve(self, b):
+        ''' x = inv(covariance) @ b, b may have several columns (right-hand sides) '''
+        b = np.asarray(b, dtype='float64')
+        if self.method == 'cholesky':
+            return cho_solve((self.lower, True), b)
+        if self.method == 'factor':
+            return self.covariance.solve(b)
+        return self.eigenvectors @ ((self.eigenvectors.T @ b) / self.eigenvalues.reshape((-1,) + (1,) * (b.ndim - 1)))
+
+    @property
+    def inverse(self):
+        ''' Explicit (pseudo-)inverse, computed only on request '''
+        if self._inverse is None:
+            self._inverse = self.solve(np.eye(len(self.covariance)))
+        return self._inverse
+
+    def add_asset(self, covariances):
+        ''' Append an asset in O(n^2) (bordered Cholesky)
+        args:
+            covariances: array of size [n+1], covariances of the new asset with the existing ones and itself
+        '''
+        covariances = np.asarray(covariances, dtype='float64').ravel()
+        n = len(self.covariance)
+        covariance = np.empty((n + 1, n + 1))
+        covariance[:n, :n] = np.asarray(self.covariance)
+        covariance[n, :] = covariance[:, n] = covariances
+
+        if self.method == 'cholesky':
+            row = solve_triangular(self.lower, covariances[:n], lower=True)
+            pivot = covariances[n] - row @ row
+            if pivot > self.rcond * np.diag(self.lower).max() ** 2:
+                lower = np.zeros((n + 1, n + 1))
+                lower[:n, :n] = self.lower
+                lower[n, :n] = row
+                lower[n, n] = np.sqrt(pivot)
+                self.covariance, self.lower, self._inverse = covariance, lower, None
+                return
+        self.factorize(covariance)
+
+    def remove_asset(self, idx):
+        ''' Remove the asset at position idx in O(n^2) (rank-one update of the trailing factor) '''
+        keep = np.arange(len(self.covariance)) != idx
+        covariance = np.asarray(self.covariance)[np.ix_(keep, keep)]
+
+        if self.method != 'cholesky':
+            self.factorize(covariance)
+            return
+
+        # Deleting row idx of L leaves L33 with L33 @ L33.T = S33 - l32 @ l32.T: update it by l32
+        lower = np.delete(np.delete(self.lower, idx, axis=0), idx, axis=1)
+        x = self.lower[idx + 1:, idx].copy()
+        trailing = lower[idx:, idx:]
+        for k in range(len(x)):
+            r = np.hypot(trailing[k, k], x[k])
+            c, s = r / trailing[k, k], x[k] / trailing[k, k]
+            trailing[k, k] = r
+            trailing[k + 1:, k] = (trailing[k + 1:, k] + s * x[k + 1:]) / c
+            x[k + 1:] = c * x[k + 1:] - s * trailing[k + 1:, k]
+        self.covariance, self.lower, self._inverse = covariance, lower, None
@@ -1 +1,3 @@
-from finml.portfolio_selection.single_factor import lowVol, momentum, riskAdj, indicator, fscore_kr
\ No newline at end of file
+from finml.portfolio_selection.single_factor import lowVol, momentum, riskAdj, indicator, fscore_kr, fscore_table
+from finml.portfolio_selection.screening import Screener
+from finml.portfolio_selection.backtest import backtest
@@ -0,0 +1,168 @@
+import warnings
+from math import sqrt
+import numpy as np
+import pandas as pd
+
+from finml.portfolio_selection.single_factor import N_UNITS
+from finml.portfolio_selection.screening import composite_rank
+
+
+class RollingWindow:
+    ''' Trailing-window statistics of daily returns at any date in O(number of tickers)
+    Cumulative sums of returns are built once, so the statistics of a window are
+    differences of two rows instead of a re-slice of the whole price frame.
+    args:
+        returns: DataFrame of daily returns [date x ticker]
+    '''
+    def __init__(self, returns):
+        self.index = returns.index
+        self.columns = returns.columns
+        values = returns.values
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+
+        def cumulate(x):
+            return np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+
+        self.count = cumulate(valid.astype('float64'))
+        self.sum = cumulate(filled)
+        self.sum_sq = cumulate(filled ** 2)
+        self.sum_log = cumulate(np.log1p(filled))
+
+    def window(self, end, last_nyears=1):
+        ''' Positions [lo, hi) of the returns of the last n years of prices up to end (inclusive),
+        the same returns single_factor functions use when end is the last date '''
+        hi = self.index.searchsorted(end, side='right')
+        num_days = pd.Timedelta(days=last_nyears * 365) # 365 includes holidays
+        # The first price of the window has no return
+        lo = self.index.searchsorted(self.index[hi - 1] - num_days, side='right') + 1
+        return min(lo, hi), hi
+
+    def volatility(self, lo, hi):
+        n = self.count[hi] - self.count[lo]
+        s = self.sum[hi] - self.sum[lo]
+        ss = self.sum_sq[hi] - self.sum_sq[lo]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = (ss - s ** 2 / n) / (n - 1)
+        std = np.sqrt(np.clip(var, 0, None)) * sqrt(N_UNITS['d']) # annualize
+        std[(n < 2) | (std == 0)] = np.nan # Get rid of non-traded stocks
+        return std
+
+    def momentum(self, lo, hi):
+        return np.exp(self.sum_log[hi] - self.sum_log[lo])
+
+
+# name: (function of (RollingWindow, lo, hi), True if the lower is the better)
+PRICE_FACTORS = {
+    'lowvol': (lambda w, lo, hi: w.volatility(lo, hi), True),
+    'momentum': (lambda w, lo, hi: w.momentum(lo, hi), False),
+    'riskadj': (lambda w, lo, hi: w.momentum(lo, hi) / w.volatility(lo, hi), False),
+}
+
+
+def rebalance_dates(index, rebalance='m'):
+    ''' Last trading day of each month ('m') or quarter ('q') '''
+    if rebalance not in ['m', 'q']:
+        raise ValueError('rebalance should be one of ["m", "q"]')
+    periods = index.to_period(rebalance.upper())
+    return pd.Series(index, index=index).groupby(periods).max().values
+
+
+def backtest(market,
+             factors=['lowvol'],
+             weights=None,
+             method='zscore',
+             num_pf=30,
+             last_nyears=1,
+             rebalance='m',
+             start=None,
+             end=None,
+             cost=0.0,
+             selector=None):
+    ''' Backtest of a factor strategy rebalanced periodically (equal-weighted, buy-and-hold between rebalances)
+    At each rebalance date, tickers are selected with the returns of the last n years up to that date only.
+    args:
+        market: initialized market CLASS instance
+        factors: list of price factors, keys of PRICE_FACTORS (daily returns), combined as in Screener
+        weights, method: composite ranking of factors, see screening.composite_rank
+        num_pf: number of stocks included in the portfolio
+        last_nyears: int, period of returns used at each rebalance date
+        rebalance: 'm' (monthly) or 'q' (quarterly)
+        start, end: period of the backtest (default: whole period after the first window)
+        cost: transaction cost per unit of traded weight
+        selector: function (date) -> list of tickers, replaces factor selection
+                  (it is responsible for using only data available at the date;
+                   tickers without prices are dropped with a warning)
+    returns:
+        performance: DataFrame of ['nav', 'return', 'drawdown'] per date
+        turnover: Series of one-way turnover per rebalance date
+        holdings: dict of {rebalance date: list of tickers}
+    '''
+    for name in factors:
+        if name.lower() not in PRICE_FACTORS:
+            raise ValueError('factors should be in %s' %list(PRICE_FACTORS))
+    lower_better = [PRICE_FACTORS[name.lower()][1] for name in factors]
+
+    prices = market.prices
+    returns = market.calculate_returns(interval='d', start=prices.index[0], end=prices.index[-1])
+    rolling = RollingWindow(returns)
+    tradable = prices.reindex(returns.index).notna().values
+
+    first = returns.index[0] + pd.Timedelta(days=last_nyears * 365)
+    start = first if start is None else max(pd.Timestamp(start), first)
+    end = returns.index[-1] if end is None else pd.Timestamp(end)
+    dates = [date for date in rebalance_dates(returns.index, rebalance) if start <= date <= end]
+    if len(dates) == 0:
+        raise ValueError('no rebalance date between %s and %s' %(start, end))
+
+    values = returns.values
+    end_pos = returns.index.searchsorted(end, side='right')
+    navs, turnovers, holdings = list(), dict(), dict()
+    nav, drifted = 1.0, pd.Series(dtype='float64')
+
+    for idx, date in enumerate(dates):
+        lo, hi = rolling.window(date, last_nyears)
+
+        # Selection with data up to the rebalance date
+        if selector is not None:
+            tickers = list(selector(date))
+            unknown = [ticker for ticker in tickers if ticker not in returns.columns]
+            if unknown:
+                # Not in the price panel: dropped, the others are equal-weighted
+                warnings.warn('tickers without prices are not held on %s: %s' %(pd.Timestamp(date).date(), unknown))
+                tickers = [ticker for ticker in tickers if ticker in returns.columns]
+        else:
+            table = pd.DataFrame({name.lower(): PRICE_FACTORS[name.lower()][0](rolling, lo, hi) for name in factors},
+                                 index=returns.columns)
+            table = table[tradable[hi - 1]]
+            ranked = composite_rank(table, weights, method, lower_better)
+            tickers = list(ranked.index[ranked['rank'] <= num_pf])
+        holdings[date] = tickers
+
+        # Trade from the drifted weights to equal weights
+        target = pd.Series(1.0 / len(tickers), index=tickers) if len(tickers) > 0 else pd.Series(dtype='float64')
+        traded = target.subtract(drifted, fill_value=0).abs().sum()
+        turnovers[date] = traded / 2
+        nav *= 1 - cost * traded
+
+        # Hold until the next rebalance date: buy-and-hold growth of each position
+        next_pos = returns.index.searchsorted(dates[idx + 1], side='right') if idx + 1 < len(dates) else end_pos
+        columns = returns.columns.get_indexer(tickers)
+        segment = np.nan_to_num(values[hi:next_pos][:, columns], nan=0.0) # non-traded day: 0 return
+        growth = np.cumprod(1 + segment, axis=0)
+        if len(tickers) > 0 and len(segment) > 0:
+            segment_nav = growth @ target.values
+            navs.append(nav * segment_nav)
+            nav *= segment_nav[-1]
+            drifted = pd.Series(target.values * growth[-1] / segment_nav[-1], index=tickers)
+        else:
+            navs.append(np.full(len(segment), nav))
+            drifted = target
+
+    index = returns.index[returns.index.searchsorted(dates[0], side='right'):end_pos]
+    nav_series = pd.Series(np.concatenate(navs) if navs else [], index=index, dtype='float64')
+    performance = pd.DataFrame({'nav': nav_series,
+                                'return': nav_series / nav_series.shift(1, fill_value=1.0) - 1,
+                                'drawdown': nav_series / nav_series.cummax().clip(lower=1.0) - 1}) # from the initial capital
+
+    return performance, pd.Series(turnovers), holdings
@@ -0,0 +1,140 @@
+from math import sqrt, nan
+import numpy as np
+import pandas as pd
+
+from finml.portfolio_selection.single_factor import get_start, fscore_table, N_UNITS
+
+
+class Screener:
+    ''' Multi-factor screening over one shared return matrix
+    Factor scores are computed once per screener and reused by every screen.
+    args:
+        market: initialized market CLASS instance
+        last_nyears: int, period of returns (whole period if not int)
+        interval: time unit the volatility is calculated, ['d', 'w', 'm', 'y']
+        as_of: date of the financial statements (point-in-time f-score), default: the current ones
+        factors: factors to be screened, checked against the data when the screener is built (see check)
+    '''
+    # name: (method computing the raw factor value, True if the lower is the better)
+    FACTORS = {
+        'lowvol': ('volatility', True),
+        'momentum': ('momentum', False),
+        'riskadj': ('risk_adjusted', False),
+        'fscore': ('fscore', False),
+        'per': ('indicator', True),
+        'pbr': ('indicator', True),
+        'pcr': ('indicator', True),
+        'psr': ('indicator', True),
+        'ev/ebitda': ('indicator', True),
+        'roe': ('indicator', False),
+    }
+
+    def __init__(self, market, last_nyears=1, interval='d', as_of=None, factors=None):
+        self.market = market
+        self.interval = interval
+        self.as_of = as_of
+        self.start = get_start(market, last_nyears)
+        self.factors = dict()
+        if factors is not None:
+            self.check(factors)
+
+    def check(self, factors):
+        ''' Raise ValueError if a factor is unknown or its indicator is not in market.indicators '''
+        unknown = [name for name in factors if name.lower() not in self.FACTORS]
+        if unknown:
+            raise ValueError('factor should be one of %s, got %s' %(list(self.FACTORS), unknown))
+        required = [name.upper() for name in factors if self.FACTORS[name.lower()][0] == 'indicator']
+        missing = [name for name in required if name not in self.market.indicators.index]
+        if missing:
+            raise ValueError('indicators %s are not calculated, run refresh_indicators(names=[...]) with them'
+                             %missing)
+
+    def daily_returns(self):
+        return self.market.calculate_returns(interval='d', start=self.start)
+
+    def volatility(self, name):
+        returns = self.market.calculate_returns(interval=self.interval, start=self.start)
+        std = returns.std(axis=0, skipna=True) * sqrt(N_UNITS.get(self.interval, 1)) # annualize
+        std[std == 0] = nan # Get rid of non-traded stocks
+        return std
+
+    def momentum(self, name):
+        return (self.daily_returns()+1).prod(axis=0, skipna=True)
+
+    def risk_adjusted(self, name):
+        return self.factor('momentum') / self.factor('lowvol')
+
+    def fscore(self, name):
+        return fscore_table(self.market, self.as_of).sum(axis=1).astype('float64')
+
+    def indicator(self, name):
+        return self.market.indicators.loc[name.upper()].astype('float64')
+
+    def factor(self, name):
+        ''' Raw value of a factor for every ticker (cached) '''
+        name = name.lower()
+        if name not in self.FACTORS:
+            raise ValueError('factor should be one of %s' %list(self.FACTORS))
+        if name not in self.factors:
+            method, _ = self.FACTORS[name]
+            self.factors[name] = getattr(self, method)(name)
+        return self.factors[name]
+
+    def scores(self, factors):
+        ''' Table of raw factor values, [ticker x factor] '''
+        self.check(factors)
+        return pd.concat([self.factor(name).rename(name.lower()) for name in factors], axis=1)
+
+    def screen(self, factors, weights=None, method='zscore'):
+        ''' Composite ranking of several factors
+        args:
+            factors: list of factor names, keys of Screener.FACTORS
+            weights: list of weights of factors (default: equal weights)
+            method: 'zscore' (weighted sum of z-scores) or 'rank' (weighted sum of ranks)
+        returns:
+            DataFrame of [ticker x (factors, 'score', 'rank')] sorted by rank (1: the best);
+            the bigger the score, the better
+        '''
+        return composite_rank(self.scores(factors), weights, method,
+                              lower_better=[self.FACTORS[name.lower()][1] for name in factors])
+
+    def select(self, factors, weights=None, method='zscore', num_pf=30):
+        ''' Top num_pf tickers of the composite ranking (like single_factor functions) '''
+        table = self.screen(factors, weights, method)
+        return table.index[table['rank'] <= num_pf]
+
+
+def composite_rank(table, weights=None, method='zscore', lower_better=None):
+    ''' Combine factor values into one score
+    args:
+        table: DataFrame of [ticker x factor], tickers with any NaN are dropped
+        weights: list of weights of factors (default: equal weights)
+        method: 'zscore' (weighted sum of z-scores) or 'rank' (weighted sum of ranks)
+        lower_better: list of booleans, True if the lower value of the factor is the better
+    returns:
+        table with 'score' and 'rank' columns, sorted by rank (1: the best)
+    '''
+    if method not in ['zscore', 'rank']:
+        raise ValueError('method should be one of ["zscore", "rank"]')
+    num_factors = table.shape[1]
+    weights = np.ones(num_factors) if weights is None else np.asarray(weights, dtype='float64')
+    weights = weights / weights.sum()
+    lower_better = [False] * num_factors if lower_better is None else lower_better
+
+    table = table.replace([np.inf, -np.inf], nan).dropna(axis=0, how='any')
+
+    # Sign of each factor: the bigger, the better
+    signs = np.array([-1.0 if lower else 1.0 for lower in lower_better])
+    if method == 'zscore':
+        values = table.values * signs
+        std = values.std(axis=0, ddof=1) if len(values) > 1 else np.ones(num_factors)
+        std[(std == 0) | np.isnan(std)] = 1
+        standardized = (values - values.mean(axis=0)) / std
+    else:
+        standardized = table.mul(signs, axis=1).rank(axis=0, ascending=True).values
+
+    table = table.copy()
+    table['score'] = standardized @ weights
+    table['rank'] = table['score'].rank(ascending=False, method='first')
+
+    return table.sort_values('rank')
@@ -1,7 +1,25 @@
-from datetime import datetime
 from math import sqrt, nan
+import numpy as np
 import pandas as pd
 
+# Elements of financial statements used by f-score
+FSCORE_ITEMS = ['지배주주순이익', '자산', '영업활동으로인한현금흐름', '장기차입금', '유동자산', '유동부채',
+                '유상증자', '매출총이익', '매출액']
+
+# Number of intervals in a year: 'd' (daily), 'w' (weekly), 'm' (monthly), and 'y' (annual)
+N_UNITS = {'d': 252, 'w': 52, 'm': 12, 'y': 1}
+
+
+def get_start(market, last_nyears=1):
+    ''' Starting date of the last n years of prices (whole period if last_nyears is not int) '''
+    index = market.prices.index
+    if type(last_nyears) == int:
+        num_days = pd.Timedelta(days=last_nyears * 365) # 365 includes holidays
+        return index[index.searchsorted(index[-1] - num_days, side='right')]
+
+    return index[0]
+
+
 def lowVol(market, last_nyears=1, num_pf=30, interval='d'):
     ''' Portfolio selection based on low volatility (annualized)
     args:
@@ -9,25 +27,11 @@ def lowVol(market, last_nyears=1, num_pf=30, interval='d'):
         num_pf: number of stocks included in the portfolio
         interval: time unit the volatility is calculated, ['d', 'w', 'm', 'y']
     '''
-    if type(last_nyears) == int:
-        num_days = str(last_nyears * 365)+'D' # 365 includes holidays
-        start = market.prices.last(num_days).index[0]
-
-    else:
-        start = market.prices.index[0]
+    start = get_start(market, last_nyears)
     
     returns = market.calculate_returns(interval=interval, start=start)
     
-    if interval == 'd':
-        n_units = 252
-    elif interval == 'w':
-        n_units = 52
-    elif interval == 'm':
-        n_units = 12
-    else: # 'y'
-        n_units = 1
-        
-    std = returns.std(axis=0, skipna=True) * sqrt(n_units) # annualize
+    std = returns.std(axis=0, skipna=True) * sqrt(N_UNITS.get(interval, 1)) # annualize
     std[std == 0] = nan # Get rid of non-traded stocks
     
     # Ranking: the smaller, the better 
@@ -43,12 +47,7 @@ def momentum(market, last_nyears=1, num_pf=30):
         last_nyears: int
         num_pf: number of stocks included in the portfolio
     '''
-    if type(last_nyears) == int:
-        num_days = str(last_nyears * 365)+'D' # 365 includes holidays
-        start = market.prices.last(num_days).index[0]
-
-    else:
-        start = market.prices.index[0]
+    start = get_start(market, last_nyears)
     
     returns = market.calculate_returns(interval='d', start=start)
     accumulated_returns = (returns+1).prod(axis=0, skipna=True)
@@ -67,12 +66,7 @@ def riskAdj(market, last_nyears=1, num_pf=30, interval='d'):
         num_pf: number of stocks included in the portfolio
         interval: time unit the volatility is calculated, ['d', 'w', 'm', 'y']
     '''
-    if type(last_nyears) == int:
-        num_days = str(last_nyears * 365)+'D' # 365 includes holidays
-        start = market.prices.last(num_days).index[0]
-
-    else:
-        start = market.prices.index[0]
+    start = get_start(market, last_nyears)
     
     # Numerator: accumulated return
     daily_returns = market.calculate_returns(interval='d', start=start)
@@ -81,16 +75,7 @@ def riskAdj(market, last_nyears=1, num_pf=30, interval='d'):
     # Denominator: risk (annualized volatility)
     returns = market.calculate_returns(interval=interval, start=start)
     
-    if interval == 'd':
-        n_units = 252
-    elif interval == 'w':
-        n_units = 52
-    elif interval == 'm':
-        n_units = 12
-    else: # 'y'
-        n_units = 1
-        
-    std = returns.std(axis=0, skipna=True) * sqrt(n_units) # annualize
+    std = returns.std(axis=0, skipna=True) * sqrt(N_UNITS.get(interval, 1)) # annualize
     std[std == 0] = nan # Get rid of non-traded stocks
     
     # risk-adjusted return
@@ -123,51 +108,90 @@ def indicator(market, ind, low_or_high, num_pf=30):
     return tickers
 
 
-def fscore_kr(market, scores=[9]):
+def fscore_kr(market, scores=[9], as_of=None):
     ''' Portfolio selection based on f-score (Piotroski et al., 2000) (quality investing)
     args:
         scores: stocks with the given scores are returned
+        as_of: date, only financial statements known at that date are used (market.fundamentals),
+               e.g. selector=lambda date: fscore_kr(market, as_of=date) in backtest
+               (default: the current statements, market.fss)
     '''
-    print('Attention: you have to keep financial statements up-to-date!')
+    if as_of is None:
+        print('Attention: you have to keep financial statements up-to-date!')
 
+    f_score = fscore_table(market, as_of).sum(axis=1)
+    
+    tickers = pd.concat([f_score.iloc[:0]] + [f_score[f_score == score] for score in scores])
+    
+    tickers = tickers.index
+    return tickers
+
+
+def _last_reported(reported):
+    ''' Positions of the last and the previous reported period of each row (-1 if none)
+    Periods are the union of every ticker's periods, so the previous period of a ticker is
+    its second-to-last reported column, not the column before its last one. '''
+    counts = reported.cumsum(axis=1)
+    total = counts[:, -1]
+    last = np.where(total >= 1, np.argmax(reported & (counts == total[:, None]), axis=1), -1)
+    previous = np.where(total >= 2, np.argmax(reported & (counts == total[:, None] - 1), axis=1), -1)
+    return last, previous
+
+
+def _last_two(frame, last, previous):
+    ''' Values of the last and the previous period (positions last, previous of each row) '''
+    values = frame.values
+    rows = np.arange(len(values))
+    current = np.where(last >= 0, values[rows, np.maximum(last, 0)], nan)
+    prev = np.where(previous >= 0, values[rows, np.maximum(previous, 0)], nan)
+    return pd.Series(current, index=frame.index), pd.Series(prev, index=frame.index)
+
+
+def fscore_table(market, as_of=None):
+    ''' Table of the 9 binary signals of f-score (Piotroski et al., 2000)
+    Each ticker is scored on its last fiscal year reported (estimates excluded) and the year before.
+    args:
+        as_of: date, the statements known at that date are used (market.fundamentals, point-in-time)
+               (default: the current statements, market.fss)
+    returns:
+        DataFrame of [ticker x 9], f-score is the sum of each row
+        (no rows if no statement is known, e.g. before the first recorded period)
+    '''
     # Financial statement
-    fs  = market.fss
+    fs = market.fss if as_of is None else market.fundamentals.as_of(as_of, items=FSCORE_ITEMS)
     
+    # Annual periods only, the last reported one differs per ticker
+    periods = [period for period in fs['자산'].columns if '(E)' not in str(period)]
+    fs = {element: fs[element][periods] for element in FSCORE_ITEMS}
+    reported = fs['자산'].notna().values
+    if reported.size == 0:
+        return pd.DataFrame(0, index=fs['자산'].index, columns=range(9))
+    last, previous = _last_reported(reported)
+
     # Probability
-    roa = fs['지배주주순이익'] / fs['자산']
-    cfo = fs['영업활동으로인한현금흐름'] / fs['자산']
+    roa, roa_prev = _last_two(fs['지배주주순이익'] / fs['자산'], last, previous)
+    cfo, _ = _last_two(fs['영업활동으로인한현금흐름'] / fs['자산'], last, previous)
     accurual = cfo - roa
     
     # Financial performance
-    lev = fs['장기차입금'] / fs['자산']
-    liq = fs['유동자산'] / fs['유동부채']
-    offer = fs['유상증자'] # estimated
+    lev, lev_prev = _last_two(fs['장기차입금'] / fs['자산'], last, previous)
+    liq, liq_prev = _last_two(fs['유동자산'] / fs['유동부채'], last, previous)
+    offer, _ = _last_two(fs['유상증자'], last, previous) # estimated
 
     # Operating efficiency
-    margin = fs['매출총이익'] / fs['매출액']
-    turn = fs['매출액'] / fs['자산']
-
-    if datetime.now().month not in [1,2,3,4]:
-        col_idx = -1
-    else:
-        col_idx = -2
-
-    f_1 = (roa.iloc[:, col_idx] > 0).astype(int)
-    f_2 = (cfo.iloc[:, col_idx] > 0).astype(int)
-    f_3 = ((roa.iloc[:, col_idx] - roa.iloc[:, col_idx-1]) > 0).astype(int)
-    f_4 = (accurual.iloc[:, col_idx] > 0).astype(int)
-    f_5 = ((lev.iloc[:, col_idx] - lev.iloc[:, col_idx-1]) <= 0).astype(int)
-    f_6 = ((liq.iloc[:, col_idx] - liq.iloc[:, col_idx-1]) > 0).astype(int)
-    f_7 = (offer.iloc[:, col_idx].isna() | (offer.iloc[:, col_idx] <= 0)).astype(int)
-    f_8 = ((margin.iloc[:, col_idx] - margin.iloc[:, col_idx-1]) > 0).astype(int)
-    f_9 = ((turn.iloc[:, col_idx] - turn.iloc[:, col_idx-1]) > 0).astype(int)
+    margin, margin_prev = _last_two(fs['매출총이익'] / fs['매출액'], last, previous)
+    turn, turn_prev = _last_two(fs['매출액'] / fs['자산'], last, previous)
+
+    f_1 = (roa > 0).astype(int)
+    f_2 = (cfo > 0).astype(int)
+    f_3 = ((roa - roa_prev) > 0).astype(int)
+    f_4 = (accurual > 0).astype(int)
+    f_5 = ((lev - lev_prev) <= 0).astype(int)
+    f_6 = ((liq - liq_prev) > 0).astype(int)
+    f_7 = (offer.isna() | (offer <= 0)).astype(int)
+    f_8 = ((margin - margin_prev) > 0).astype(int)
+    f_9 = ((turn - turn_prev) > 0).astype(int)
 
     f_table = pd.concat([f_1, f_2, f_3, f_4, f_5, f_6, f_7, f_8, f_9], axis=1)
-    f_score = f_table.sum(axis=1) 
     
-    tickers = pd.Series()
-    for score in scores:
-        tickers = tickers.append(f_score[f_score == score])
-    
-    tickers = tickers.index
-    return tickers
+    return f_table
@@ -1 +1,4 @@
-from finml.utils.GoogleDriveDownloader import GoogleDriveDownloader
\ No newline at end of file
+from finml.utils.GoogleDriveDownloader import GoogleDriveDownloader
+from finml.utils.frame_utils import assemble_frame
+from finml.utils.path_utils import set_path, atomic_dump
+from finml.utils.cache import LRUCache
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+import threading
+import numpy as np
+import pandas as pd
+
+
+def nbytes(value):
+    ''' Approximate memory size of arrays/frames (and tuples/dicts of them) '''
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage())
+    if isinstance(value, np.ndarray) or hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    return 64
+
+
+class LRUCache:
+    ''' Least-recently-used cache bounded by the total size (bytes) of its values
+    args:
+        max_bytes: entries are evicted (oldest use first) while the total size exceeds this
+    '''
+    def __init__(self, max_bytes=2**30):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = nbytes(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                'bytes': self.size, 'max_bytes': self.max_bytes}
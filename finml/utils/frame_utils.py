@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+
+def assemble_frame(datas, index=None, dtype='float64'):
+    ''' Build one aligned frame from per-ticker data in a single pass
+    args:
+        datas: dict of {ticker: Series or single-column DataFrame}
+        index: shared index of the result (default: sorted union of all indexes)
+    returns:
+        DataFrame of [len(index), len(datas)], missing values are NaN
+    '''
+    columns = list(datas.keys())
+    values = [data.iloc[:, 0] if isinstance(data, pd.DataFrame) else data for data in datas.values()]
+
+    if index is None:
+        if len(values) == 0:
+            return pd.DataFrame(columns=columns, dtype=dtype)
+        index = pd.Index(np.unique(np.concatenate([value.index.values for value in values])))
+        index.name = values[0].index.name
+    else:
+        index = pd.Index(index)
+
+    matrix = np.full((len(index), len(columns)), np.nan, dtype=dtype)
+    for col, value in enumerate(values):
+        rows = index.get_indexer(value.index)
+        valid = rows >= 0
+        matrix[rows[valid], col] = np.asarray(value.values, dtype=dtype)[valid]
+
+    return pd.DataFrame(matrix, index=index, columns=columns)
@@ -1,4 +1,6 @@
 import os
+import pickle as pkl
+import tempfile
 
 def set_path(dir_path=None):
     if not os.path.exists(dir_path):
@@ -7,3 +9,19 @@ def set_path(dir_path=None):
     return dir_path
 
 
+def atomic_dump(obj, path):
+    ''' Pickle obj to path without leaving a partially written file behind
+    (written to a temporary file in the same directory, then renamed) '''
+    dir_path = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pkl.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+
@@ -0,0 +1,98 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+
+from finml.portfolio_selection.backtest import backtest
+
+
+class StubMarket:
+    ''' Market of constant daily returns per ticker '''
+    def __init__(self, daily_returns, num_days=600):
+        index = pd.bdate_range('2018-01-01', periods=num_days)
+        growth = np.cumprod(1 + np.tile(daily_returns, (num_days, 1)), axis=0)
+        self.prices = pd.DataFrame(100 * growth, index=index, columns=['A', 'B', 'C'])
+
+    def calculate_returns(self, interval='d', start=None, end=None, subset=None):
+        return self.prices.pct_change().dropna(how='all')
+
+
+def test_unknown_ticker_is_dropped_and_weights_renormalised():
+    # The last column grows fast: holding it by mistake would blow up the NAV
+    market = StubMarket(np.array([0.0, 0.0, 0.05]))
+    with pytest.warns(UserWarning, match='UNKNOWN'):
+        performance, turnover, holdings = backtest(market, selector=lambda date: ['A', 'UNKNOWN'])
+
+    assert all(tickers == ['A'] for tickers in holdings.values())
+    assert np.allclose(performance['nav'].values, 1.0)
+
+
+def test_selector_with_known_tickers_does_not_warn():
+    market = StubMarket(np.array([0.001, 0.0, 0.05]))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        performance, _, _ = backtest(market, selector=lambda date: ['A', 'B'])
+    # Equal weights in A and B, buy-and-hold between monthly rebalances
+    assert performance['nav'].iloc[-1] > 1.0
+    assert performance['nav'].iloc[-1] < 1.001 ** len(performance)
+
+
+class ReturnsMarket:
+    ''' Market of given daily returns [date x ticker] (NaN: not traded, e.g. after delisting) '''
+    def __init__(self, returns):
+        self.prices = 100 * (1 + returns.fillna(0)).cumprod().where(returns.notna())
+        self.prices.iloc[0] = 100.0
+
+    def calculate_returns(self, interval='d', start=None, end=None, subset=None):
+        return self.prices.pct_change(fill_method=None).dropna(how='all')
+
+
+def two_rebalances(delist_on=None):
+    ''' A leads a year of constant returns with B; C jumps in February and falls in March '''
+    index = pd.bdate_range('2019-01-01', '2020-03-31')
+    returns = pd.DataFrame({'A': 0.002, 'B': 0.001, 'C': 0.0, 'D': -0.001}, index=index)
+    returns.loc['2020-02-01':'2020-02-28', 'C'] = 0.05
+    returns.loc['2020-03-01':, 'C'] = -0.02
+    if delist_on is not None: # B is held in January and delisted in February
+        returns.loc[delist_on:, 'B'] = np.nan
+    return returns
+
+
+def test_factor_backtest_of_two_rebalances():
+    market = ReturnsMarket(two_rebalances())
+    performance, turnover, holdings = backtest(market, factors=['momentum'], num_pf=2, end='2020-03-13', cost=0.001)
+    january, february = pd.Timestamp('2020-01-31'), pd.Timestamp('2020-02-28')
+    assert list(holdings) == [january, february]
+    assert sorted(holdings[january]) == ['A', 'B'] and sorted(holdings[february]) == ['A', 'C']
+
+    # February: 20 days of A and B bought with equal weights, after the cost of buying 100%
+    days = np.arange(1, 21)
+    first = 0.999 * (0.5 * 1.002 ** days + 0.5 * 1.001 ** days)
+    # Rebalance: sell the drifted B, buy C, trim A back to 50%
+    weight_a = 1.002 ** 20 / (1.002 ** 20 + 1.001 ** 20)
+    traded = (weight_a - 0.5) + (1 - weight_a) + 0.5
+    days = np.arange(1, 11)
+    second = first[-1] * (1 - 0.001 * traded) * (0.5 * 1.002 ** days + 0.5 * 0.98 ** days)
+    nav = np.concatenate([first, second])
+    assert np.allclose(performance['nav'].values, nav)
+    assert np.allclose(turnover.values, [0.5, traded / 2])
+    assert np.allclose(performance['return'].values, nav / np.r_[1.0, nav[:-1]] - 1)
+    assert np.allclose(performance['drawdown'].values, nav / np.maximum.accumulate(np.maximum(nav, 1.0)) - 1)
+    assert np.isclose(performance['drawdown'].min(), nav[-1] / first[-1] - 1)
+
+
+def test_factor_backtest_with_a_delisted_ticker():
+    market = ReturnsMarket(two_rebalances(delist_on='2020-02-17'))
+    performance, turnover, holdings = backtest(market, factors=['momentum'], num_pf=2, end='2020-03-13', cost=0.01)
+    january, february = pd.Timestamp('2020-01-31'), pd.Timestamp('2020-02-28')
+    assert sorted(holdings[january]) == ['A', 'B']
+    # B has no price at the February rebalance: it is not selected again, its frozen value is sold
+    assert 'B' not in holdings[february] and sorted(holdings[february]) == ['A', 'C']
+    growth_a, growth_b = 1.002 ** np.arange(1, 21), 1.001 ** np.minimum(np.arange(1, 21), 10)
+    first = 0.99 * (0.5 * growth_a + 0.5 * growth_b)
+    assert np.allclose(performance['nav'].values[:20], first)
+    # The cost of the first purchase is a drawdown from the initial capital
+    assert np.isclose(performance['drawdown'].iloc[0], first[0] - 1)
+    weight_a = growth_a[-1] / (growth_a[-1] + growth_b[-1])
+    assert np.isclose(turnover[february], ((weight_a - 0.5) + (1 - weight_a) + 0.5) / 2)
+    assert performance['nav'].notna().all()
@@ -0,0 +1,61 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from finml.data_reader.getdata import GetInitData
+from finml.utils.cache import LRUCache, nbytes
+
+
+def test_lru_cache_evicts_least_recently_used():
+    frames = {key: pd.DataFrame(0.0, index=range(100), columns=['x']) for key in 'abcd'}
+    cache = LRUCache(max_bytes=3 * nbytes(frames['a']))
+    for key in 'abc':
+        cache.put(key, frames[key])
+    assert cache.get('a') is frames['a'] # 'b' becomes the least recently used
+    cache.put('d', frames['d'])
+    assert 'b' not in cache and 'a' in cache and 'd' in cache
+    assert cache.size <= cache.max_bytes
+    assert cache.get('b') is None
+    assert cache.info()['hits'] == 1 and cache.info()['misses'] == 1
+
+
+def test_lru_cache_skips_values_larger_than_the_bound():
+    cache = LRUCache(max_bytes=100)
+    cache.put('big', pd.DataFrame(0.0, index=range(100), columns=['x']))
+    assert len(cache) == 0 and cache.size == 0
+
+
+def market_with_prices(tmp_path, num_dates=50):
+    market = GetInitData(data_path=str(tmp_path))
+    index = pd.bdate_range('2020-01-01', periods=num_dates, name='Date')
+    market.prices = pd.DataFrame({'A': np.linspace(100, 150, num_dates), 'B': 100.0}, index=index)
+    return market
+
+
+def test_new_prices_invalidate_cached_returns(tmp_path):
+    market = market_with_prices(tmp_path)
+    returns = market.calculate_returns(start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))
+    market.return_statistics('mean', start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))
+    assert len(market.return_cache) == 2
+    market.calculate_returns(start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))
+    assert market.cache_info()['hits'] == 2 # the statistics reuse the returns, then the second call
+
+    market.prices = market.prices * np.array([1.0, 2.0]) ** np.arange(len(market.prices))[:, None]
+    assert len(market.return_cache) == 0
+    updated = market.calculate_returns(start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))
+    assert np.allclose(updated['B'], 1.0) and np.allclose(updated['A'], returns['A'])
+
+
+def test_cached_returns_are_not_modified_by_callers(tmp_path):
+    market = market_with_prices(tmp_path)
+    returns = market.calculate_returns(start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))
+    expected = returns.copy()
+    returns.iloc[:, :] = np.nan
+    again = market.calculate_returns(start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))
+    pd.testing.assert_frame_equal(again, expected)
+    again['A'] *= 2
+    pd.testing.assert_frame_equal(market.calculate_returns(start=datetime(2020, 1, 1), end=datetime(2020, 12, 31)), expected)
+    mean = market.return_statistics('mean', start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))
+    mean[:] = 0.0
+    assert np.allclose(market.return_statistics('mean', start=datetime(2020, 1, 1), end=datetime(2020, 12, 31)),
+                       expected.mean())
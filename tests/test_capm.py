@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+
+pytest.importorskip('sklearn') # finml.asset_pricing imports the Fama-French tools
+pytest.importorskip('linearmodels')
+from finml.asset_pricing.CAPM import capm_regression
+
+
+def test_capm_regression_matches_statsmodels_per_ticker():
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2021-01-01', periods=200, name='Date')
+    index_returns = pd.Series(rng.normal(0.0005, 0.01, 200), index=index, name='KPI200')
+    betas = np.array([0.5, 1.0, 1.5, -0.3])
+    stock_returns = pd.DataFrame(0.0002 + np.outer(index_returns, betas) + rng.normal(0, 0.01, (200, 4)),
+                                 index=index, columns=['A', 'B', 'C', 'D'])
+    stock_returns = stock_returns.mask(rng.random(stock_returns.shape) < 0.15)
+    stock_returns.iloc[:120, 2] = np.nan # C is listed late
+    stock_returns['E'] = np.nan
+    stock_returns.iloc[:2, 4] = 0.01 # two returns are not enough
+    index_returns.iloc[[10, 11, 50]] = np.nan
+
+    table = capm_regression(stock_returns, index_returns)
+    for ticker in ['A', 'B', 'C', 'D']:
+        data = pd.concat([stock_returns[ticker], index_returns], axis=1).dropna()
+        fit = sm.OLS(data[ticker], sm.add_constant(data['KPI200'])).fit()
+        row = table.loc[ticker]
+        assert row['nobs'] == fit.nobs
+        assert np.allclose([row['alpha'], row['beta']], fit.params.values)
+        assert np.allclose([row['alpha_se'], row['beta_se']], fit.bse.values)
+        assert np.isclose(row['r2'], fit.rsquared)
+        assert np.isclose(row['index_mean'], data['KPI200'].mean())
+    assert table.loc['E', ['alpha', 'beta', 'alpha_se', 'beta_se', 'r2']].isna().all()
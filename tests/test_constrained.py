@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from finml.portfolio_optimization.constrained import ActiveSetQP, ADMMQP, project_budget
+
+
+def problem(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n, n)) * 0.1
+    return factors @ factors.T / n + np.eye(n) * 1e-3, -rng.normal(0.05, 0.02, n)
+
+
+def test_active_set_converges_and_matches_admm():
+    P, q = problem()
+    active = ActiveSetQP(len(q), upper=0.2)
+    weights = active.solve(5 * P, q)
+    assert active.converged
+    admm = ADMMQP(len(q), upper=0.2, max_iter=20000, eps_abs=1e-9, eps_rel=1e-9)
+    assert np.allclose(weights, admm.solve(5 * P, q), atol=1e-5)
+
+
+def test_active_set_warns_when_max_iter_is_reached():
+    P, q = problem()
+    active = ActiveSetQP(len(q), max_iter=1)
+    with pytest.warns(UserWarning, match='did not converge'):
+        weights = active.solve(5 * P, q)
+    assert not active.converged
+    assert np.isclose(weights.sum(), 1) and (weights >= 0).all() # feasible iterate
+
+
+def test_admm_weights_meet_the_budget_after_clipping():
+    P, q = problem()
+    admm = ADMMQP(len(q), upper=0.1, max_iter=50)
+    with pytest.warns(UserWarning):
+        weights = admm.solve(5 * P, q)
+    assert abs(weights.sum() - 1) < 1e-12
+    assert (weights >= 0).all() and (weights <= 0.1).all()
+
+
+def test_project_budget():
+    v = np.array([0.9, 0.5, -0.3, 0.2])
+    x = project_budget(v, 0.0, 0.5)
+    assert np.isclose(x.sum(), 1) and (x >= 0).all() and (x <= 0.5).all()
+    assert np.allclose(project_budget(np.full(4, 0.25), 0.0, 1.0), 0.25)
+
+
+def test_warm_sweep_matches_fresh_solves():
+    P, q = problem(n=40, seed=1)
+    gammas = np.logspace(0, 3, 12)
+    sweep = ActiveSetQP(len(q), upper=0.15)
+    for gamma in gammas:
+        weights = sweep.solve(gamma * P, q)
+        fresh = ActiveSetQP(len(q), upper=0.15)
+        assert sweep.converged and np.allclose(weights, fresh.solve(gamma * P, q), atol=1e-9)
+    # A matrix that is not a multiple of the previous one is factorized again
+    shifted = P + np.eye(len(q)) * 1e-3
+    assert np.allclose(sweep.solve(shifted, q), ActiveSetQP(len(q), upper=0.15).solve(shifted, q), atol=1e-9)
+
+
+def test_active_set_with_singular_covariance():
+    rng = np.random.default_rng(2)
+    loadings = rng.normal(0, 0.1, (20, 3))
+    P, q = loadings @ loadings.T, -rng.normal(0.05, 0.02, 20) # rank 3
+    active = ActiveSetQP(20, upper=0.3)
+    weights = active.solve(10 * P, q)
+    assert active.converged
+    admm = ADMMQP(20, upper=0.3, max_iter=20000, eps_abs=1e-9, eps_rel=1e-9)
+    expected = admm.solve(10 * P, q)
+    objective = lambda w: 0.5 * w @ (10 * P) @ w + q @ w
+    assert objective(weights) <= objective(expected) + 1e-8
+
+
+def test_admm_meets_group_caps():
+    P, q = problem()
+    groups = np.arange(len(q)) % 3
+    caps = {0: 0.2, 1: 0.3}
+    admm = ADMMQP(len(q), upper=0.2, groups=groups, group_caps=caps)
+    weights = admm.solve(5 * P, q)
+    assert abs(weights.sum() - 1) < 1e-12 and (weights >= 0).all() and (weights <= 0.2).all()
+    assert weights[groups == 0].sum() <= 0.2 + 1e-12 and weights[groups == 1].sum() <= 0.3 + 1e-12
+    expected = ActiveSetQP(len(q), upper=0.2, groups=groups, group_caps=caps).solve(5 * P, q)
+    assert np.allclose(weights, expected, atol=1e-4)
+
+
+def test_admm_meets_the_turnover_bound():
+    P, q = problem()
+    prev_wts = np.full(len(q), 1 / len(q))
+    admm = ADMMQP(len(q), upper=0.2, prev_wts=prev_wts, max_turnover=0.3)
+    weights = admm.solve(5 * P, q)
+    assert abs(weights.sum() - 1) < 1e-12 and (weights >= 0).all() and (weights <= 0.2).all()
+    assert np.abs(weights - prev_wts).sum() <= 0.3 + 1e-12
+    # The bound binds: without it the weights move further
+    free = ActiveSetQP(len(q), upper=0.2).solve(5 * P, q)
+    assert np.abs(free - prev_wts).sum() > 0.3
+
+
+def test_warm_started_sweep_with_turnover():
+    from finml.portfolio_optimization import RiskAverseOptimization
+    P, q = problem(n=20)
+    groups = np.arange(20) % 2
+    prev_wts = np.full(20, 0.05)
+    optimizer = RiskAverseOptimization(-q.reshape(-1, 1), P)
+    gammas = [1.0, 3.0, 10.0]
+    sweep = optimizer.risk_aversion_curve(gammas, upper=0.3, groups=groups, group_caps={0: 0.6},
+                                          prev_wts=prev_wts, max_turnover=0.4)
+    for idx, gamma in enumerate(gammas):
+        weights = sweep[:, idx]
+        assert abs(weights.sum() - 1) < 1e-12 and (weights >= 0).all() and (weights <= 0.3).all()
+        assert weights[groups == 0].sum() <= 0.6 + 1e-12
+        assert np.abs(weights - prev_wts).sum() <= 0.4 + 1e-12
+        cold = ADMMQP(20, upper=0.3, groups=groups, group_caps={0: 0.6}, prev_wts=prev_wts, max_turnover=0.4,
+                      max_iter=20000, eps_abs=1e-9, eps_rel=1e-9)
+        assert np.allclose(weights, cold.solve(gamma * P, q), atol=1e-4)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from finml.portfolio_optimization.covariance import (FactorCovariance, OnlineCovariance, ledoit_wolf,
+                                                     ewma_covariance, estimate_covariance)
+
+
+def factor_returns(num_obs=250, num_assets=8, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (num_obs, 2))
+    loadings = rng.normal(1, 0.3, (num_assets, 2))
+    values = factors @ loadings.T + rng.normal(0, 0.005, (num_obs, num_assets))
+    index = pd.bdate_range('2020-01-01', periods=num_obs)
+    return (pd.DataFrame(values, index=index, columns=['T%d' %i for i in range(num_assets)]),
+            pd.DataFrame(factors, index=index, columns=['F1', 'F2']), loadings)
+
+
+def reference_ledoit_wolf(x):
+    ''' Ledoit & Wolf (2004), lemma 3.2-3.4, on complete data '''
+    num_obs, num_assets = x.shape
+    x = x - x.mean(axis=0)
+    sample = x.T @ x / num_obs
+    mu = np.trace(sample) / num_assets
+    d2 = ((sample - mu * np.eye(num_assets)) ** 2).sum()
+    b2 = sum(((np.outer(row, row) - sample) ** 2).sum() for row in x) / num_obs ** 2
+    shrinkage = min(b2, d2) / d2
+    return shrinkage * mu * np.eye(num_assets) + (1 - shrinkage) * sample, shrinkage
+
+
+def test_ledoit_wolf_matches_the_reference_formula():
+    returns, _, _ = factor_returns(num_obs=40, num_assets=30) # more tickers than half the dates
+    covariance, shrinkage = ledoit_wolf(returns)
+    expected, expected_shrinkage = reference_ledoit_wolf(returns.values)
+    assert 0 < shrinkage < 1 and np.isclose(shrinkage, expected_shrinkage)
+    assert np.allclose(covariance.values, expected * 40 / 39)
+
+
+def test_missing_returns_do_not_shrink_variances():
+    returns, _, _ = factor_returns()
+    returns.iloc[:150, 0] = np.nan # T0 is listed later
+    covariance, shrinkage = ledoit_wolf(returns)
+    counts = returns.count()
+    mu = (returns.var(ddof=0)).mean() # scale of the identity target
+    expected_var = shrinkage * mu * counts / (counts - 1) + (1 - shrinkage) * returns.var()
+    assert np.allclose(np.diag(covariance.values), expected_var)
+
+    ewma = ewma_covariance(returns, halflife=1e12)
+    assert np.allclose(np.diag(ewma.values), returns.var(ddof=0))
+
+    pca = FactorCovariance.from_pca(returns, num_factors=2)
+    assert np.allclose(pca.diagonal(), returns.var(), rtol=1e-6)
+
+
+def test_ewma_matches_the_weighted_formula():
+    returns, _, _ = factor_returns(num_obs=100, num_assets=4)
+    weights = 0.5 ** (np.arange(100)[::-1] / 20)
+    mean = weights @ returns.values / weights.sum()
+    x = returns.values - mean
+    expected = (x * weights[:, None]).T @ x / weights.sum()
+    assert np.allclose(ewma_covariance(returns, halflife=20).values, expected)
+
+
+def test_factor_covariance_solves_match_dense_inverse():
+    returns, factors, _ = factor_returns()
+    returns.iloc[:20, 1] = np.nan
+    model = FactorCovariance.from_factors(returns, factors)
+    for idx, ticker in enumerate(returns.columns):
+        valid = returns[ticker].notna().values
+        x = np.hstack([np.ones((valid.sum(), 1)), factors.values[valid]])
+        coefs = np.linalg.lstsq(x, returns[ticker].values[valid], rcond=None)[0]
+        assert np.allclose(model.loadings[idx], coefs[1:])
+    dense = model.dense()
+    b = np.random.default_rng(1).normal(size=(8, 3))
+    assert np.allclose(model @ b, dense @ b)
+    assert np.allclose(model.diagonal(), np.diag(dense))
+    assert np.allclose(model.solve(b), np.linalg.inv(dense) @ b)
+    assert np.allclose(model.solve(b[:, 0]), np.linalg.pinv(dense) @ b[:, 0])
+
+    pca = FactorCovariance.from_pca(returns, num_factors=2)
+    assert np.allclose(pca.solve(b), np.linalg.inv(pca.dense()) @ b)
+
+
+def test_estimate_covariance():
+    returns, factors, _ = factor_returns()
+    assert np.allclose(estimate_covariance(returns).values, returns.cov().values)
+    compact = estimate_covariance(returns, 'factor', compact=True, factors=factors)
+    assert isinstance(compact, FactorCovariance)
+    assert np.allclose(estimate_covariance(returns, 'factor', factors=factors).values, compact.dense())
+    with pytest.raises(ValueError):
+        estimate_covariance(returns, 'shrunk')
+
+
+def test_online_covariance_of_uneven_chunks_matches_pairwise_cov():
+    returns, _, _ = factor_returns(num_obs=300, num_assets=6, seed=3)
+    returns = returns + 0.05 # means far from zero
+    rng = np.random.default_rng(4)
+    returns = returns.mask(rng.random(returns.shape) < 0.1)
+    returns.iloc[:120, 1] = np.nan # listed late: whole chunks without it
+    returns.iloc[200:, 2] = np.nan # delisted
+    returns.iloc[100:140, 3] = np.nan # suspended across a chunk boundary
+    online = OnlineCovariance(returns.shape[1])
+    for lo, hi in [(0, 1), (1, 50), (50, 51), (51, 130), (130, 131), (131, 300)]:
+        online.update(returns.values[lo:hi])
+    assert np.allclose(online.covariance, returns.cov().values, rtol=1e-9, atol=1e-15)
+    assert np.allclose(online.mean, returns.mean().values)
+    assert np.allclose(online.count, returns.notna().astype(float).T @ returns.notna().astype(float))
+    # A pair with fewer than two common rows is NaN
+    online = OnlineCovariance(2)
+    online.update(np.array([[1.0, np.nan], [np.nan, 2.0], [3.0, 4.0]]))
+    assert np.isnan(online.covariance[0, 1]) and np.isclose(online.covariance[0, 0], 2.0)
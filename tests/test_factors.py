@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn') # finml.asset_pricing imports the Fama-French tools
+pytest.importorskip('linearmodels')
+from finml.asset_pricing.factors import construct_ff3
+from finml.data_reader.indicators import UNIT
+
+# Two stocks in each of the six portfolios: (size group, book-to-market, daily return from July 2020)
+PORTFOLIOS = {'SL': ('small', [0.10, 0.20], [0.001, 0.003]),
+              'SM': ('small', [0.50, 0.60], [0.002, 0.002]),
+              'SH': ('small', [1.00, 1.20], [0.004, 0.000]),
+              'BL': ('big', [0.15, 0.25], [-0.001, 0.001]),
+              'BM': ('big', [0.55, 0.65], [0.000, 0.000]),
+              'BH': ('big', [1.10, 1.30], [0.002, 0.002])}
+
+
+def synthetic_market():
+    dates = pd.bdate_range('2019-12-02', '2021-06-30', name='Date')
+    tickers, shares, book, daily = list(), dict(), dict(), dict()
+    for name, (size, bms, rets) in PORTFOLIOS.items():
+        for idx, (bm, ret) in enumerate(zip(bms, rets)):
+            ticker = '%s%d' %(name, idx)
+            tickers.append(ticker)
+            shares[ticker] = (1 + idx) * (1e6 if size == 'small' else 1e7) # prices start at 1,000
+            book[ticker] = bm * 1000 * shares[ticker] / UNIT
+            daily[ticker] = ret
+    held = dates >= pd.Timestamp(2020, 7, 1)
+    returns = pd.DataFrame({ticker: np.where(held, daily[ticker], 0.0) for ticker in tickers}, index=dates)
+    prices = 1000 * (1 + returns).cumprod()
+    fss = {'자본': pd.DataFrame({'2018/12': 1.0, '2019/12': pd.Series(book), '2020/12': 1e9})}
+    return prices, fss, pd.Series(shares), returns[held]
+
+
+def buy_and_hold(returns, sizes):
+    ''' Value-weighted return of each date with weights drifting from the formation sizes '''
+    growth = (1 + returns).cumprod().shift(1).fillna(1.0) * sizes
+    return (returns * growth).sum(axis=1) / growth.sum(axis=1)
+
+
+def test_ff3_of_a_synthetic_2x3_sort():
+    prices, fss, shares, returns = synthetic_market()
+    factors = construct_ff3(prices, fss, shares, risk_free=0.0252)
+    assert factors.index[0] == pd.Timestamp(2020, 7, 1) and factors.index[-1] == pd.Timestamp(2021, 6, 30)
+
+    sizes = shares * 1000
+    portfolio = {name: buy_and_hold(returns[[name + '0', name + '1']], sizes[[name + '0', name + '1']])
+                 for name in PORTFOLIOS}
+    smb = (portfolio['SL'] + portfolio['SM'] + portfolio['SH']) / 3 - (portfolio['BL'] + portfolio['BM'] + portfolio['BH']) / 3
+    hml = (portfolio['SH'] + portfolio['BH']) / 2 - (portfolio['SL'] + portfolio['BL']) / 2
+    assert np.allclose(factors['SMB'], smb) and np.allclose(factors['HML'], hml)
+    assert np.allclose(factors['Mkt'], buy_and_hold(returns, sizes) - 0.0001)
+    assert np.allclose(factors['Rf'], 0.0001)
+    # First day: the second stock of each portfolio is twice the size of the first
+    first = {name: (rets[0] + 2 * rets[1]) / 3 for name, (_, _, rets) in PORTFOLIOS.items()}
+    assert np.isclose(factors['SMB'].iloc[0], (0.007 / 3 + 0.002 + 0.004 / 3) / 3 - (0.001 / 3 + 0 + 0.002) / 3)
+    assert np.isclose(factors['HML'].iloc[0], (first['SH'] + first['BH']) / 2 - (first['SL'] + first['BL']) / 2)
+
+
+def test_ff3_with_a_history_of_shares():
+    prices, fss, shares, returns = synthetic_market()
+    # SL0 issues 100x its shares in 2021: sorted with today's shares it would be a big stock in 2020
+    history = pd.DataFrame([shares, shares], index=pd.to_datetime(['2019-01-02', '2021-01-04']))
+    history.loc['2021-01-04', 'SL0'] *= 100
+    expected = construct_ff3(prices, fss, shares)
+    pd.testing.assert_frame_equal(construct_ff3(prices, fss, history), expected)
+    current = construct_ff3(prices, fss, history.iloc[-1])
+    assert not np.allclose(current['SMB'], expected['SMB'])
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn')
+pytest.importorskip('linearmodels')
+from finml.asset_pricing.FamaFrench3 import (ff3_regression, FamaFrench3_table, FamaMacbeth_numpy,
+                                              FamaMacbeth_statsmodels, FamaMacbeth_summary)
+
+
+def factors_and_returns(num_dates=300, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2020-01-01', periods=num_dates, name='Date')
+    factors = pd.DataFrame(rng.normal(0, 0.01, (num_dates, 3)), index=index, columns=['Mkt', 'SMB', 'HML'])
+    betas = np.array([[1.0, 0.5, -0.2], [0.8, -0.1, 0.3]])
+    returns = pd.DataFrame(factors.values @ betas.T + rng.normal(0, 0.002, (num_dates, 2)),
+                           index=index, columns=['A', 'B'])
+    return factors, returns
+
+
+def test_singular_ticker_is_nan_and_others_are_fitted():
+    factors, returns = factors_and_returns()
+    # C has returns only where SMB and HML are zero: its design is singular
+    factors.iloc[:100, 1:] = 0.0
+    returns['C'] = np.where(np.arange(len(returns)) < 100, 0.01, np.nan)
+    table = ff3_regression(returns, factors)
+    assert table.loc['C'].drop('nobs').isna().all()
+    assert np.allclose(table.loc[['A', 'B'], 'beta_mkt'], [1.0, 0.8], atol=0.05)
+
+
+def test_table_is_always_a_frame():
+    factors, returns = factors_and_returns()
+    factors['Rf'] = 0.0
+
+    class Market:
+        def calculate_returns(self, subset=None):
+            return returns if subset is None else returns[subset]
+
+    table = FamaFrench3_table(Market(), factors=factors)
+    assert isinstance(table, pd.DataFrame) and list(table.index) == ['A', 'B']
+
+
+def test_famamacbeth_numpy_matches_statsmodels():
+    factors, _ = factors_and_returns(num_dates=60)
+    rng = np.random.default_rng(1)
+    loadings = rng.normal(1, 0.5, (3, 6))
+    returns = pd.DataFrame(factors.values @ loadings + rng.normal(0, 0.002, (60, 6)),
+                           index=factors.index, columns=list('ABCDEF'))
+    returns.iloc[5:10, 0] = np.nan
+    betas, lambdas = FamaMacbeth_numpy(factors, returns)
+    expected_betas, expected_lambdas = FamaMacbeth_statsmodels(factors, returns)
+    assert np.allclose(betas.values, expected_betas.values)
+    assert len(lambdas) == len(expected_lambdas)
+    assert np.allclose(pd.DataFrame(lambdas).values, pd.DataFrame(expected_lambdas).values)
+
+    summary = FamaMacbeth_summary(lambdas, lags=2)
+    assert list(summary.index) == ['Mkt', 'SMB', 'HML']
+    assert np.allclose(summary['premium'], pd.DataFrame(lambdas).mean())
+
+
+def test_famamacbeth_numpy_with_singular_designs():
+    factors, _ = factors_and_returns(num_dates=60)
+    rng = np.random.default_rng(2)
+    returns = pd.DataFrame(factors.values @ rng.normal(1, 0.5, (3, 5)) + rng.normal(0, 0.002, (60, 5)),
+                           index=factors.index, columns=list('ABCDE'))
+    # F has returns only where SMB and HML are zero: its first-pass design is singular
+    factors.iloc[:20, 1:] = 0.0
+    returns['F'] = np.where(np.arange(60) < 20, 0.01, np.nan)
+    # G copies A: in period 30 only A, G and B have returns, two identical betas for three factors
+    returns['G'] = returns['A']
+    returns.iloc[30, 2:5] = np.nan
+    betas, lambdas = FamaMacbeth_numpy(factors, returns)
+    assert betas.loc['F'].isna().all() and betas.drop('F').notna().all().all()
+    assert lambdas[30].isna().all()
+    expected = FamaMacbeth_numpy(factors, returns.drop(columns='F'))[1]
+    others = [idx for idx in range(60) if idx != 30]
+    assert np.allclose(pd.DataFrame(lambdas).iloc[others].values, pd.DataFrame(expected).iloc[others].values)
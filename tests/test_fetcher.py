@@ -0,0 +1,81 @@
+import threading
+import time
+from datetime import datetime
+import pandas as pd
+import pytest
+
+from finml.data_reader.fetcher import PriceFetcher, RateLimiter, get_rate_limiter
+
+
+def stub_reader(failures=None):
+    ''' Local source: a price history per ticker, failing failures[ticker] times first '''
+    failures = dict(failures or {})
+    lock = threading.Lock()
+
+    def reader(ticker, start, end, session):
+        with lock:
+            if failures.get(ticker, 0) > 0:
+                failures[ticker] -= 1
+                raise ConnectionError('stub failure: %s' %ticker)
+        index = pd.bdate_range(start, end, name='Date')
+        return pd.DataFrame({'Close': float(len(ticker)), 'Volume': 1.0}, index=index)
+    return reader
+
+
+def test_fetch_many_returns_every_ticker():
+    fetcher = PriceFetcher(source='stub-all', num_workers=4, rate=1000, reader=stub_reader())
+    tickers = ['%06d' %i for i in range(20)]
+    results = {ticker: (data, error) for ticker, data, error in
+               fetcher.fetch_many(tickers, datetime(2020, 1, 1), datetime(2020, 1, 31))}
+    assert sorted(results) == tickers
+    assert all(error is None and len(data) == 23 for data, error in results.values())
+
+
+def test_fetch_retries_then_reports_failures():
+    reader = stub_reader({'A': 1, 'B': 10})
+    fetcher = PriceFetcher(source='stub-retry', rate=1000, max_retries=2, backoff=0.001, reader=reader)
+    results = {ticker: (data, error) for ticker, data, error in
+               fetcher.fetch_many(['A', 'B'], datetime(2020, 1, 1), datetime(2020, 1, 10))}
+    assert results['A'][1] is None and results['A'][0] is not None
+    assert results['B'][0] is None and isinstance(results['B'][1], ConnectionError)
+
+
+def test_per_ticker_start():
+    fetcher = PriceFetcher(source='stub-start', rate=1000, reader=stub_reader())
+    starts = {'A': datetime(2020, 1, 1), 'B': datetime(2020, 1, 27)}
+    results = {ticker: data for ticker, data, _ in fetcher.fetch_many(['A', 'B'], starts, datetime(2020, 1, 31))}
+    assert results['A'].index[0] == pd.Timestamp(2020, 1, 1)
+    assert results['B'].index[0] == pd.Timestamp(2020, 1, 27)
+
+
+def test_rate_limiter_bounds_request_rate():
+    limiter = RateLimiter(rate=50, burst=1)
+    begin = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+    # 10 requests after the first one at 50 per second
+    assert time.monotonic() - begin >= 0.18
+
+
+def test_rate_limiter_is_shared_between_threads():
+    limiter = RateLimiter(rate=100, burst=1)
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)]) for _ in range(4)]
+    begin = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - begin >= 0.18
+
+
+def test_same_source_takes_the_latest_rate():
+    first = PriceFetcher(source='stub-rate', rate=1000, reader=stub_reader())
+    second = PriceFetcher(source='stub-rate', rate=10, reader=stub_reader())
+    assert first.rate_limiter is second.rate_limiter # one limit per source
+    assert second.rate_limiter.rate == 10 and second.rate_limiter.capacity == 10
+
+    limiter = get_rate_limiter('stub-rate', 10)
+    begin = time.monotonic()
+    for _ in range(15): # burst of 10, then 5 more at 10 per second
+        limiter.acquire()
+    assert time.monotonic() - begin >= 0.45
@@ -0,0 +1,66 @@
+import pickle
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+import pytest
+
+from finml.data_reader.fspanel import FinancialPanel
+
+PERIODS = ['2020/12', '2021/12', '2022/12']
+
+
+def statements():
+    return {'000001': pd.DataFrame({'2021/12': [10, 1], '2022/12': [12, 2], '2023/12': [15, 3]},
+                                   index=['자본', '당기순이익']),
+            '000002': pd.DataFrame({'2020/12': [5, '-', 7], '2021/12': [6, 0.5, 8], '2021/12 ': [9, 9, 9]},
+                                   index=['자본', '당기순이익', '자본']).rename(columns=str.strip)}
+
+
+def test_panel_behaves_like_a_dict_of_frames():
+    panel = FinancialPanel.from_frames(statements(), ['자본', '당기순이익', '매출액'], PERIODS)
+    assert isinstance(panel, Mapping)
+    assert len(panel) == 3 and list(panel) == ['자본', '당기순이익', '매출액']
+    assert '자본' in panel and '부채' not in panel
+    assert panel.get('부채') is None
+    with pytest.raises(KeyError):
+        panel['부채']
+    frames = panel.to_dict()
+    assert frames.keys() == dict(panel.items()).keys()
+    assert list(frames['자본'].index) == ['000001', '000002'] and list(frames['자본'].columns) == PERIODS
+    assert panel['매출액'].isna().all().all()
+
+
+def test_statements_are_reindexed_to_the_standard_periods():
+    panel = FinancialPanel.from_frames(statements(), ['자본', '당기순이익'], PERIODS)
+    equity = panel['자본']
+    # 000001 did not report 2020/12 and its 2023/12 is dropped; duplicate labels keep the first
+    assert np.isnan(equity.loc['000001', '2020/12'])
+    assert equity.loc['000001'].tolist()[1:] == [10.0, 12.0]
+    assert equity.loc['000002', '2020/12'] == 5.0 and equity.loc['000002', '2021/12'] == 6.0
+    assert np.isnan(equity.loc['000002', '2022/12'])
+    assert np.isnan(panel['당기순이익'].loc['000002', '2020/12']) # '-' is not a number
+    assert panel.values.shape == (2, 2, 3) and panel.values.dtype == np.float64
+
+
+def test_frames_cannot_change_the_panel():
+    panel = FinancialPanel.from_frames(statements(), ['자본', '당기순이익'], PERIODS)
+    before = panel.values.copy()
+    equity = panel['자본']
+    with pytest.raises(ValueError):
+        equity.iloc[0, 1] = -1.0
+    equity['2021/12'] = 0.0
+    assert np.array_equal(panel.values, before, equal_nan=True)
+    assert panel['자본']['2021/12'].tolist() == [10.0, 6.0]
+    copied = panel['자본'].copy()
+    copied.iloc[0, 1] = -1.0 # a copy is writable
+    assert panel['자본'].iloc[0, 1] == 10.0
+
+
+def test_panel_pickles():
+    panel = FinancialPanel.from_frames(statements(), ['자본', '당기순이익'], PERIODS)
+    restored = pickle.loads(pickle.dumps(panel))
+    assert isinstance(restored, FinancialPanel)
+    assert np.array_equal(restored.values, panel.values, equal_nan=True)
+    assert restored.tickers.equals(panel.tickers) and restored.periods.equals(panel.periods)
+    pd.testing.assert_frame_equal(restored['자본'], panel['자본'])
+    assert restored['자본'].loc['000002', '2021/12'] == 6.0
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from finml.data_reader.fundamentals import FundamentalsStore
+from finml.portfolio_selection.single_factor import fscore_table, fscore_kr, FSCORE_ITEMS
+
+
+def statements(value):
+    return pd.DataFrame({'2019/12': [value, 1.0], '2020/12': [value * 2, 2.0]}, index=['자산', '부채'])
+
+
+def test_as_of_reads_the_version_known_at_the_date(tmp_path):
+    store = FundamentalsStore(str(tmp_path / 'fundamentals.sqlite'))
+    assert store.record({'A': statements(10.0)}, observed='2021-01-15') == 4
+    assert store.record({'A': statements(10.0)}, observed='2021-02-01') == 0
+    assert store.record({'A': statements(15.0)}, observed='2021-06-01') == 2 # revised 자산
+
+    facts = store.query('2021-03-31').set_index(['item', 'period'])['value']
+    assert facts[('자산', '2019/12')] == 10.0 and facts[('자산', '2020/12')] == 20.0
+    facts = store.query().set_index(['item', 'period'])
+    assert facts.loc[('자산', '2019/12'), 'value'] == 15.0
+    assert facts.loc[('자산', '2019/12'), 'available_from'] == '2021-06-01'
+
+    # 2019/12 is backdated to the period end + 90 days, 2020/12 is known from its observation
+    panel = store.as_of('2020-06-01', items=['자산', '부채'])
+    assert list(panel['자산'].columns) == ['2019/12']
+    assert len(store.query('2020-01-01')) == 0
+    assert len(store.query(tickers=['B'])) == 0
+
+
+def test_fscore_without_statements_is_empty(tmp_path):
+    class Market:
+        fundamentals = FundamentalsStore(str(tmp_path / 'fundamentals.sqlite'))
+
+    table = fscore_table(Market, as_of='2020-01-01')
+    assert table.empty and list(table.columns) == list(range(9))
+    assert len(fscore_kr(Market, as_of='2020-01-01')) == 0
+
+
+def improving(first, second):
+    ''' Statements of two fiscal years where every f-score signal is positive '''
+    return pd.DataFrame({first: [5.0, 100.0, 6.0, 20.0, 50.0, 40.0, 0.0, 20.0, 80.0],
+                         second: [10.0, 100.0, 15.0, 10.0, 60.0, 40.0, 0.0, 30.0, 90.0]},
+                        index=FSCORE_ITEMS)
+
+
+def test_fscore_compares_each_ticker_with_its_own_previous_year(tmp_path):
+    class Market:
+        fundamentals = FundamentalsStore(str(tmp_path / 'fundamentals.sqlite'))
+
+    Market.fundamentals.record({'A': improving('2019/12', '2020/12')}, observed='2021-06-01')
+    assert fscore_table(Market, as_of='2021-06-30').sum(axis=1)['A'] == 9
+
+    # A March fiscal year next to it interleaves the periods of the universe
+    Market.fundamentals.record({'B': improving('2019/03', '2020/03')}, observed='2021-06-01')
+    f_score = fscore_table(Market, as_of='2021-06-30').sum(axis=1)
+    assert f_score['A'] == 9 and f_score['B'] == 9
@@ -0,0 +1,119 @@
+import functools
+from datetime import datetime
+import pandas as pd
+
+import finml.data_reader.getdata as getdata
+from finml.data_reader.getdata import GetInitData
+from finml.data_reader.fetcher import PriceFetcher
+
+
+INDEXES = ['KOSPI', 'KPI200', 'KOSDAQ']
+
+
+class StubSource:
+    ''' Local prices: every business day of [start, end], failing the tickers in failing '''
+    def __init__(self):
+        self.failing = set()
+        self.requested = list()
+
+    def __call__(self, ticker, start, end, session):
+        self.requested.append(ticker)
+        if ticker in self.failing:
+            raise ConnectionError('stub failure: %s' %ticker)
+        index = pd.bdate_range(start, end, name='Date')
+        return pd.DataFrame({'Close': 100.0, 'Volume': 1.0}, index=index)
+
+
+def market(tmp_path, monkeypatch):
+    monkeypatch.setattr(getdata, 'PriceFetcher', functools.partial(PriceFetcher, backoff=0))
+    market = GetInitData(data_path=str(tmp_path))
+    market.tickers = pd.DataFrame({'종목코드': ['A', 'B', 'C']})
+    return market
+
+
+def test_retry_failed_resumes_the_failed_update(tmp_path, monkeypatch):
+    source = StubSource()
+    data = market(tmp_path, monkeypatch)
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 1, 31), reader=source, rate_limit=1000)
+    assert data.prices.index[-1] == pd.Timestamp('2020-01-31')
+
+    # The update of C fails: A, B and the indexes are brought up to date
+    source.failing = {'C'}
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 2, 14), reader=source,
+                                rate_limit=1000, update=True)
+    assert data.prices['C'].last_valid_index() == pd.Timestamp('2020-01-31')
+    assert data.prices['A'].last_valid_index() == pd.Timestamp('2020-02-14')
+
+    # The retry runs the update again for C only (not a full download)
+    source.failing, source.requested = set(), list()
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 2, 14), reader=source,
+                                rate_limit=1000, update=True, retry_failed=True)
+    assert source.requested == ['C']
+    assert data.prices['C'].last_valid_index() == pd.Timestamp('2020-02-14')
+    assert data.prices['C'].notna().sum() == len(pd.bdate_range('2020-01-01', '2020-02-14'))
+
+
+def test_retry_failed_without_update_resumes_the_full_download(tmp_path, monkeypatch):
+    source = StubSource()
+    source.failing = {'B'}
+    data = market(tmp_path, monkeypatch)
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 1, 31), reader=source, rate_limit=1000)
+    assert 'B' not in data.prices.columns
+
+    source.failing, source.requested = set(), list()
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 1, 31), reader=source,
+                                rate_limit=1000, retry_failed=True)
+    assert source.requested == ['B']
+    assert list(data.prices.columns) == ['A', 'B', 'C'] + INDEXES
+
+
+def test_retry_of_the_full_download_after_an_update(tmp_path, monkeypatch):
+    source = StubSource()
+    source.failing = {'B'}
+    data = market(tmp_path, monkeypatch)
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 1, 31), reader=source, rate_limit=1000)
+    # The update appends to the shards of the full download
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 2, 14), reader=source,
+                                rate_limit=1000, update=True)
+
+    # Only the ticker that failed is downloaded again, the appended shards are intact
+    source.failing, source.requested = set(), list()
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 1, 31), reader=source,
+                                rate_limit=1000, retry_failed=True)
+    assert source.requested == ['B']
+    assert list(data.prices.columns) == ['A', 'B', 'C'] + INDEXES
+    assert data.prices['A'].last_valid_index() == pd.Timestamp('2020-02-14')
+
+
+def test_update_interrupted_between_prices_and_volumes(tmp_path, monkeypatch):
+    source = StubSource()
+    data = market(tmp_path, monkeypatch)
+    data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 1, 31), reader=source, rate_limit=1000)
+
+    # The update stops after saving prices: the stored volumes still end in January
+    save = data.store.save
+    def crash_on_volumes(name, frame):
+        if name == 'volumes':
+            raise KeyboardInterrupt
+        save(name, frame)
+    monkeypatch.setattr(data.store, 'save', crash_on_volumes)
+    try:
+        data.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 2, 14), reader=source,
+                                    rate_limit=1000, update=True)
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.setattr(data.store, 'save', save)
+
+    loaded = market(tmp_path, monkeypatch)
+    loaded.get_prices_and_volumes()
+    assert loaded.prices.index.equals(loaded.volumes.index)
+    assert loaded.prices.index[-1] == pd.Timestamp('2020-01-31')
+
+    # Running the update again completes both from the appended shards, without downloading again
+    source.requested = list()
+    loaded.get_prices_and_volumes(start=datetime(2020, 1, 1), end=datetime(2020, 2, 14), reader=source,
+                                  rate_limit=1000, update=True)
+    assert source.requested == []
+    assert loaded.prices.index.equals(loaded.volumes.index)
+    assert loaded.volumes.index[-1] == pd.Timestamp('2020-02-14')
+    assert loaded.volumes.notna().all().all() and (loaded.prices == 100.0).all().all()
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from finml.data_reader.indicators import compute_indicators
+
+
+def statements(elements, tickers):
+    return {element: pd.DataFrame({'2020/12': values}, index=tickers) for element, values in elements.items()}
+
+
+def test_ev_ebitda_uses_interest_bearing_debt_only():
+    tickers = ['A', 'B']
+    fss = statements({'부채': [1000.0, 1000.0], # payables and provisions included: not in EV
+                      '단기차입금': [1.0, np.nan], '장기차입금': [10.0, np.nan], '사채': [5.0, np.nan],
+                      '현금및현금성자산': [6.0, 1.0], '영업이익': [10.0, 10.0], '감가상각비': [0.0, 0.0]}, tickers)
+    price, shares = pd.Series(1.0, index=tickers), pd.Series(1e8, index=tickers)
+    ev_ebitda = compute_indicators(fss, price, shares, ['EV/EBITDA']).loc['EV/EBITDA']
+    # (market cap 1 + debt 16 - cash 6) / 10, and B without borrowings: (1 - 1) / 10
+    assert np.allclose(ev_ebitda.values, [1.1, 0.0])
+
+
+def test_ev_ebitda_is_nan_without_debt_elements():
+    tickers = ['A']
+    fss = statements({'현금및현금성자산': [1.0], '영업이익': [10.0], '감가상각비': [0.0]}, tickers)
+    ev_ebitda = compute_indicators(fss, pd.Series(1.0, index=tickers), pd.Series(1e8, index=tickers), ['EV/EBITDA'])
+    assert ev_ebitda.isna().all().all()
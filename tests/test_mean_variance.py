@@ -0,0 +1,59 @@
+import numpy as np
+
+from finml.portfolio_optimization import SimpleMeanVariance, RiskAverseOptimization
+
+
+def moments(n=8, seed=0):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.001, 0.02, (250, n)) + rng.normal(0, 0.01, (250, 1))
+    return returns.mean(axis=0).reshape(-1, 1), np.cov(returns, rowvar=False)
+
+
+def test_frontier_matches_get_weight():
+    mean_return, covariance = moments()
+    optimizer = SimpleMeanVariance(mean_return, covariance)
+    targets = np.linspace(mean_return.min(), mean_return.max(), 7)
+    means, variances, weights = optimizer.frontier(targets)
+    for idx, target in enumerate(targets):
+        optimizer.get_weight(target)
+        assert np.allclose(weights[:, [idx]], optimizer.weight)
+        mean_p, var_p = optimizer.portfolio_statistics()
+        assert np.isclose(mean_p, means[idx]) and np.isclose(var_p, variances[idx])
+    assert np.allclose(weights.sum(axis=0), 1) and np.allclose(mean_return.T @ weights, targets)
+    # The minimum-variance portfolio is the vertex of the frontier
+    inverse = np.linalg.inv(covariance)
+    minimum = inverse.sum(axis=1) / inverse.sum()
+    vertex = optimizer.frontier([mean_return.ravel() @ minimum])[1][0]
+    assert np.isclose(vertex, minimum @ covariance @ minimum) and vertex <= variances.min() + 1e-15
+
+
+def test_risk_averse_weights_are_the_closed_form_solution():
+    mean_return, covariance = moments(seed=1)
+    optimizer = RiskAverseOptimization(mean_return, covariance)
+    inverse = np.linalg.inv(covariance)
+    ones = np.ones((len(mean_return), 1))
+    for gamma in [0.5, 2.0, 10.0]:
+        # Lagrangian of max mean @ w - gamma/2 * w @ cov @ w subject to sum(w) = 1
+        multiplier = ((ones.T @ inverse @ mean_return)[0, 0] - gamma) / (ones.T @ inverse @ ones)[0, 0]
+        expected = inverse @ (mean_return - multiplier * ones) / gamma
+        assert np.allclose(optimizer.get_weight(gamma), expected)
+    assert np.allclose(optimizer.covariance_inverse, inverse)
+
+
+def test_frontier_of_a_singular_covariance():
+    mean_return, covariance = moments(n=6, seed=2)
+    # A seventh asset duplicating the first: the covariance is singular
+    mean_return = np.vstack([mean_return, mean_return[:1]])
+    covariance = np.pad(covariance, ((0, 1), (0, 1)))
+    covariance[-1, :-1] = covariance[:-1, -1] = covariance[0, :-1]
+    covariance[-1, -1] = covariance[0, 0]
+    optimizer = SimpleMeanVariance(mean_return, covariance)
+    assert optimizer.solver.method == 'eigen'
+    targets = np.linspace(mean_return.min(), mean_return.max(), 5)
+    means, variances, weights = optimizer.frontier(targets)
+    assert np.allclose(weights.sum(axis=0), 1) and np.allclose(mean_return.T @ weights, targets)
+    assert np.allclose(weights[0], weights[-1]) # the duplicate is split evenly
+    assert np.allclose(np.einsum('ik,ij,jk->k', weights, covariance, weights), variances)
+    # Same frontier as without the duplicate
+    reduced = SimpleMeanVariance(mean_return[:-1], covariance[:-1, :-1]).frontier(targets)
+    assert np.allclose(variances, reduced[1])
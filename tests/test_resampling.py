@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from finml.portfolio_optimization import ResampledFrontier, SimpleMeanVariance
+from finml.portfolio_optimization.resampling import frontier_weights
+
+
+def moments(n=5, seed=0):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0005, 0.01, (500, n)) + rng.normal(0, 0.008, (500, 1))
+    return returns.mean(axis=0).reshape(-1, 1), np.cov(returns, rowvar=False), returns
+
+
+def test_run_depends_on_the_seed_only():
+    mean_return, covariance, _ = moments()
+    frontier = ResampledFrontier(mean_return, covariance, num_obs=120, seed=7)
+    serial = frontier.run(num_draws=60, num_points=5, chunk_size=16, num_processes=0)
+    pooled = frontier.run(num_draws=60, num_points=5, chunk_size=16, num_processes=2)
+    for key in serial:
+        assert np.array_equal(serial[key], pooled[key])
+    assert serial['var'].shape == (60, 5) and serial['weights'].shape == (5, 5)
+    assert np.allclose(serial['weights'].sum(axis=0), 1)
+    other = ResampledFrontier(mean_return, covariance, num_obs=120, seed=8).run(num_draws=60, num_points=5,
+                                                                                chunk_size=16, num_processes=0)
+    assert not np.allclose(other['weights'], serial['weights'])
+
+
+def test_long_only_bootstrap_run_is_deterministic():
+    mean_return, covariance, returns = moments(n=4, seed=1)
+    frontier = ResampledFrontier(mean_return, covariance, returns=returns, num_obs=100, seed=3)
+    gammas = [1.0, 10.0, 100.0]
+    serial = frontier.run(num_draws=12, method='bootstrap', long_only=True, gammas=gammas, chunk_size=5,
+                          num_processes=0)
+    pooled = frontier.run(num_draws=12, method='bootstrap', long_only=True, gammas=gammas, chunk_size=5,
+                          num_processes=2)
+    for key in serial:
+        assert np.array_equal(serial[key], pooled[key])
+    assert (serial['weights'] >= -1e-12).all() and np.allclose(serial['weights'].sum(axis=0), 1)
+    with pytest.raises(ValueError):
+        ResampledFrontier(mean_return, covariance).run(num_draws=2, method='bootstrap')
+
+
+def test_frontier_weights_of_a_draw_match_simple_mean_variance():
+    mean_return, covariance, _ = moments(seed=2)
+    weights = frontier_weights(mean_return.T, covariance[None], num_points=4)[0]
+    optimizer = SimpleMeanVariance(mean_return, covariance)
+    minimum_mean = optimizer.B / optimizer.A
+    targets = np.linspace(minimum_mean, mean_return.max(), 4)
+    assert np.allclose(weights, optimizer.frontier(targets)[2])
+
+
+def test_simulate_risk_is_reproducible():
+    mean_return, covariance, _ = moments()
+    frontier = ResampledFrontier(mean_return, covariance, num_obs=50, seed=0)
+    weights = np.full((5, 1), 0.2)
+    var, cvar = frontier.simulate_risk(weights, num_draws=200, alpha=0.05)
+    assert np.array_equal(var, frontier.simulate_risk(weights, num_draws=200, alpha=0.05)[0])
+    # 10,000 normal returns of the portfolio: close to the Gaussian VaR
+    std_p = np.sqrt(weights.T @ covariance @ weights)[0, 0]
+    mean_p = (mean_return.T @ weights)[0, 0]
+    assert np.isclose(var[0], -(mean_p - 1.6449 * std_p), rtol=0.05) and cvar[0] > var[0]
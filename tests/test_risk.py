@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import norm
+
+from finml.portfolio_optimization.risk import (value_at_risk, parametric_var, max_drawdown, risk_contributions,
+                                               tracking_error, portfolio_returns)
+from finml.portfolio_optimization.covariance import FactorCovariance
+
+
+def covariance_and_weights(n=6, portfolios=4, seed=0):
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(0, 0.1, (n, 2))
+    covariance = loadings @ loadings.T + np.diag(rng.uniform(0.001, 0.004, n))
+    weights = rng.dirichlet(np.ones(n), size=portfolios).T
+    weights[:, -1] = np.eye(n)[0] - np.eye(n)[1] # a long-short portfolio
+    return covariance, weights
+
+
+def test_value_at_risk_matches_np_quantile():
+    returns = np.random.default_rng(1).standard_t(4, size=(1000, 3)) * 0.01
+    var, cvar = value_at_risk(returns, alpha=0.05)
+    # 50 returns in the tail: the 50th smallest return is the empirical 5% quantile
+    assert np.allclose(var, -np.quantile(returns, 0.05, axis=0, method='inverted_cdf'))
+    tail = np.sort(returns, axis=0)[:50]
+    assert np.allclose(cvar, -tail.mean(axis=0)) and (cvar >= var).all()
+    # Along another axis, and a tail of one return
+    assert np.allclose(value_at_risk(returns.T, alpha=0.05, axis=1)[0], var)
+    assert np.allclose(value_at_risk(returns[:10], alpha=0.05)[0], -returns[:10].min(axis=0))
+
+
+def test_component_contributions_sum_to_volatility():
+    covariance, weights = covariance_and_weights()
+    marginal, component = risk_contributions(weights, covariance)
+    volatility = np.sqrt(np.einsum('ik,ij,jk->k', weights, covariance, weights))
+    assert np.allclose(component.sum(axis=0), volatility)
+    # Marginal contributions are the gradient of the volatility
+    step = 1e-6
+    bumped = weights.copy()
+    bumped[2] += step
+    bumped_volatility = np.sqrt(np.einsum('ik,ij,jk->k', bumped, covariance, bumped))
+    assert np.allclose((bumped_volatility - volatility) / step, marginal[2], atol=1e-5)
+    # A FactorCovariance gives the same contributions as its dense matrix
+    factor = FactorCovariance(np.eye(6)[:, :2], np.diag([0.01, 0.02]), np.full(6, 0.003))
+    dense = np.diag(np.r_[0.01, 0.02, np.zeros(4)]) + 0.003 * np.eye(6)
+    assert np.allclose(risk_contributions(weights, factor)[1], risk_contributions(weights, dense)[1])
+    assert np.allclose(risk_contributions(np.zeros(6), covariance)[0], 0.0)
+
+
+def test_parametric_var_of_a_normal_portfolio():
+    covariance, weights = covariance_and_weights()
+    mean_return = np.linspace(0.001, 0.002, 6).reshape(-1, 1)
+    var, cvar = parametric_var(weights, mean_return, covariance, alpha=0.01)
+    mean_p = mean_return.ravel() @ weights
+    std_p = np.sqrt(np.einsum('ik,ij,jk->k', weights, covariance, weights))
+    assert np.allclose(var, -norm.ppf(0.01, mean_p, std_p))
+    assert np.allclose(cvar, -(mean_p - std_p * norm.pdf(norm.ppf(0.01)) / 0.01))
+
+
+def test_max_drawdown_of_a_known_path():
+    # Wealth 1.1, 1.21, 0.968, 1.0648, 0.5324, 0.7986: the peak 1.21 falls to 0.5324
+    returns = np.array([0.1, 0.1, -0.2, 0.1, -0.5, 0.5])
+    assert np.isclose(max_drawdown(returns), 1 - 0.5324 / 1.21)
+    # A loss from the start counts from the initial wealth; a rising path has no drawdown
+    paths = np.column_stack([returns, [-0.1, -0.1, 0.0, 0.0, 0.0, 0.0], np.full(6, 0.01)])
+    assert np.allclose(max_drawdown(paths), [1 - 0.5324 / 1.21, 1 - 0.81, 0.0])
+    assert np.isclose(max_drawdown(pd.DataFrame(paths).assign(gap=np.nan))[3], 0.0)
+
+
+def test_tracking_error_and_portfolio_returns():
+    rng = np.random.default_rng(2)
+    returns = pd.DataFrame(rng.normal(0, 0.01, (100, 3)))
+    returns.iloc[5, 1] = np.nan
+    benchmark = returns.fillna(0).mean(axis=1)
+    weights = np.array([[1 / 3, 1.0], [1 / 3, 0.0], [1 / 3, 0.0]])
+    assert np.allclose(portfolio_returns(weights, returns)[:, 0], benchmark)
+    error = tracking_error(weights, returns, benchmark)
+    assert np.isclose(error[0], 0.0) and np.isclose(error[1], (returns[0] - benchmark).std())
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn') # finml.asset_pricing imports the Fama-French tools
+pytest.importorskip('linearmodels')
+from finml.asset_pricing.rolling import rolling_regression
+
+
+def panel(num_dates=120, num_tickers=4, num_factors=1, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2020-01-01', periods=num_dates, name='Date')
+    factors = pd.DataFrame(rng.normal(0.001, 0.01, (num_dates, num_factors)), index=index,
+                           columns=['f%d' %idx for idx in range(num_factors)])
+    loadings = rng.normal(1, 0.5, (num_factors, num_tickers))
+    returns = pd.DataFrame(0.0005 + factors.values @ loadings + rng.normal(0, 0.005, (num_dates, num_tickers)),
+                           index=index, columns=list('ABCDEFGH'[:num_tickers]))
+    returns = returns.mask(rng.random(returns.shape) < 0.1)
+    returns.iloc[:num_dates // 3, 1] = np.nan # B starts late
+    factors.iloc[[num_dates // 4, num_dates // 4 + 1], 0] = np.nan
+    return returns, factors
+
+
+def window_lstsq(returns, factors, window, min_periods, halflife=None):
+    ''' Weighted least squares of every ticker on each trailing window, one np.linalg.lstsq at a time '''
+    expected = np.full((len(returns), returns.shape[1], factors.shape[1] + 1), np.nan)
+    for t in range(len(returns)):
+        begin = 0 if window is None else max(0, t - window + 1)
+        for idx in range(returns.shape[1]):
+            y = returns.iloc[begin:t + 1, idx].values
+            x = factors.iloc[begin:t + 1].values
+            age = t - np.arange(begin, t + 1)
+            valid = ~np.isnan(y) & ~np.isnan(x).any(axis=1)
+            if valid.sum() < min_periods:
+                continue
+            weights = np.sqrt(0.5 ** (age[valid] / halflife)) if halflife is not None else np.ones(valid.sum())
+            design = np.hstack([np.ones((valid.sum(), 1)), x[valid]])
+            expected[t, idx] = np.linalg.lstsq(design * weights[:, None], y[valid] * weights, rcond=None)[0]
+    return expected
+
+
+@pytest.mark.parametrize('window, halflife, num_factors', [(40, None, 1), (None, None, 1), (40, 10, 1), (60, None, 3)])
+def test_rolling_regression_matches_lstsq_of_each_window(window, halflife, num_factors):
+    returns, factors = panel(num_factors=num_factors)
+    min_periods = 20
+    result = rolling_regression(returns, factors, window=window, min_periods=min_periods, halflife=halflife)
+    expected = window_lstsq(returns, factors, window, min_periods, halflife)
+    assert np.array_equal(result['alpha'].isna().values, np.isnan(expected[..., 0]))
+    assert np.allclose(result['alpha'].values, expected[..., 0], equal_nan=True, atol=1e-10)
+    for idx, name in enumerate(factors.columns):
+        assert np.allclose(result[name].values, expected[..., idx + 1], equal_nan=True, atol=1e-8)
+    assert result['alpha']['B'].iloc[:40 + min_periods - 1].isna().all()
+
+
+def test_rolling_regression_of_a_series_spanning_blocks_of_tickers():
+    # Enough tickers for several blocks of the vectorized sums
+    returns, factors = panel(num_dates=30, num_tickers=8, seed=1)
+    returns = pd.concat([returns.add_suffix(str(copy)) for copy in range(600)], axis=1)
+    result = rolling_regression(returns, factors['f0'].rename('beta'), window=20, min_periods=10)
+    expected = window_lstsq(returns.iloc[:, :8], factors, 20, 10)
+    for copy in [0, 599]:
+        betas = result['beta'].iloc[:, 8 * copy:8 * (copy + 1)].values
+        assert np.allclose(betas, expected[..., 1], equal_nan=True, atol=1e-8)
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+
+from finml.data_reader.getdata import GetInitData
+from finml.data_reader.scraper import HTMLCache, Scraper
+from finml.data_reader.fnguide import FINANCE_PATH, parse_finance, parse_main
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'fnguide') # trimmed copies of the page layout
+PAGE = '<html><body>statement of %s</body></html>'
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    ''' Pages of tickers with an ETag, 304 if the client already has it '''
+    requests = list()
+
+    def do_GET(self):
+        ticker = self.path.split('gicode=A')[-1]
+        etag = '"%s-v1"' %ticker
+        conditional = self.headers.get('If-None-Match')
+        FixtureHandler.requests.append((self.path, conditional))
+        if conditional == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = (PAGE %ticker).encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FixtureHandler.requests = list()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' %httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_scraper(tmp_path, base_url, ttl):
+    return Scraper(str(tmp_path / 'html'), ttl=ttl, rate=1000, num_processes=0, source='fixture', base_url=base_url)
+
+
+def test_fresh_page_is_served_from_cache(tmp_path, server):
+    scraper = make_scraper(tmp_path, server, ttl=None)
+    url = scraper.url(FINANCE_PATH %'005930')
+    assert scraper.fetch(url) == PAGE %'005930'
+    assert scraper.fetch(url) == PAGE %'005930'
+    assert len(FixtureHandler.requests) == 1
+
+
+def test_stale_page_is_revalidated_with_conditional_get(tmp_path, server):
+    scraper = make_scraper(tmp_path, server, ttl=0)
+    url = scraper.url(FINANCE_PATH %'005930')
+    scraper.fetch(url)
+    assert scraper.fetch(url) == PAGE %'005930'
+    assert FixtureHandler.requests[0][1] is None
+    assert FixtureHandler.requests[1][1] == '"005930-v1"' # answered 304, body from the cache
+    _, record = scraper.cache.get(url)
+    assert record['etag'] == '"005930-v1"'
+
+
+def test_get_init_data_scrapes_the_injected_host(tmp_path, server):
+    market = GetInitData(data_path=str(tmp_path / 'data'), scraper=make_scraper(tmp_path, server, ttl=None))
+    market.tickers = pd.DataFrame({'종목코드': ['000001', '000002']})
+    pages = market._scrape(FINANCE_PATH, str.upper)
+    assert pages == {'000001': (PAGE %'000001').upper(), '000002': (PAGE %'000002').upper()}
+    assert sorted(path for path, _ in FixtureHandler.requests) == [FINANCE_PATH %'000001', FINANCE_PATH %'000002']
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_threads_putting_the_same_page(tmp_path, monkeypatch):
+    replace = os.replace
+    def slow_replace(src, dst):
+        time.sleep(0.01) # let the other writers reach the temp file
+        replace(src, dst)
+    monkeypatch.setattr(os, 'replace', slow_replace)
+    cache = HTMLCache(str(tmp_path / 'html'))
+    text = PAGE %'005930' * 1000
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda idx: cache.put('http://fixture/%d' %idx, text), range(64)))
+    for idx in range(64):
+        assert cache.get('http://fixture/%d' %idx)[0] == text
+    leftover = [name for _, _, names in os.walk(tmp_path) for name in names if name.startswith('.tmp_')]
+    assert leftover == []
+
+
+def test_parse_fnguide_fixtures():
+    statement = parse_finance(read_fixture('finance_005930.html'))
+    assert list(statement.columns) == ['2020/12', '2021/12', '2022/12'] # the quarter column is dropped
+    assert statement.loc['매출액', '2022/12'] == 3022314
+    assert statement.loc['판매비와관리비', '2021/12'] == 615596 # toggle text stripped from the label
+    assert statement.loc['자본', '2020/12'] == 2759480
+    assert statement.loc['당기순이익', '2022/12'] == 556541 # the IS row is kept over the CF duplicate
+    assert statement.index.is_unique and statement.loc['유상증자'].isna().all()
+    assert parse_main(read_fixture('main_005930.html')) == (68800, 5969782550)
+    assert parse_finance(read_fixture('nodata.html')) is None
+    assert parse_main(read_fixture('nodata.html')) is None
+
+
+def test_parse_many_in_a_process_pool(tmp_path):
+    pages = {'finance': read_fixture('finance_005930.html'), 'nodata': read_fixture('nodata.html')}
+    pages.update({'copy%d' %idx: pages['finance'] for idx in range(3)})
+    serial = Scraper(str(tmp_path / 'html'), num_processes=0).parse_many(pages, parse_finance)
+    pooled = Scraper(str(tmp_path / 'html'), num_processes=2).parse_many(pages, parse_finance)
+    assert pooled.keys() == serial.keys() and pooled['nodata'] is None
+    for key in pages:
+        if key != 'nodata':
+            pd.testing.assert_frame_equal(pooled[key], serial[key])
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from finml.portfolio_selection.screening import Screener
+
+
+class Market:
+    ''' Indicators of PER and PBR only (the default names of refresh_indicators) '''
+    prices = pd.DataFrame(1.0, index=pd.bdate_range('2020-01-01', periods=300), columns=['A', 'B', 'C'])
+    indicators = pd.DataFrame([[10.0, 5.0, 20.0], [1.0, 0.5, 2.0]], index=['PER', 'PBR'], columns=['A', 'B', 'C'])
+
+
+def test_missing_indicators_are_named_when_built():
+    with pytest.raises(ValueError, match=r"\['ROE', 'EV/EBITDA'\]"):
+        Screener(Market(), factors=['per', 'roe', 'ev/ebitda'])
+    with pytest.raises(ValueError, match='factor should be one of'):
+        Screener(Market(), factors=['per', 'size'])
+
+
+def test_missing_indicator_is_named_on_screen():
+    screener = Screener(Market(), factors=['per', 'pbr'])
+    assert list(screener.select(['per', 'pbr'], num_pf=1)) == ['B']
+    with pytest.raises(ValueError, match=r"\['ROE'\]"):
+        screener.screen(['per', 'roe'])
+    assert np.isclose(screener.factor('pbr')['C'], 2.0)
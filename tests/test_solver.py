@@ -0,0 +1,75 @@
+import numpy as np
+from scipy.linalg import cholesky
+
+from finml.portfolio_optimization.solver import CovarianceSolver
+from finml.portfolio_optimization.covariance import FactorCovariance
+
+
+def covariance(n=10, seed=0):
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(0, 0.1, (n, 3))
+    return loadings @ loadings.T + np.diag(rng.uniform(0.01, 0.02, n))
+
+
+def test_cholesky_solve_and_inverse():
+    cov = covariance()
+    solver = CovarianceSolver(cov)
+    b = np.random.default_rng(1).normal(size=(10, 2))
+    assert solver.method == 'cholesky'
+    assert np.allclose(solver.solve(b), np.linalg.solve(cov, b))
+    assert np.allclose(solver.solve(b[:, 0]), np.linalg.solve(cov, b[:, 0]))
+    assert np.allclose(solver.inverse, np.linalg.inv(cov))
+
+
+def test_add_and_remove_match_a_full_refactorization():
+    full = covariance(n=12, seed=2)
+    order = list(range(6))
+    solver = CovarianceSolver(full[np.ix_(order, order)])
+    b = np.random.default_rng(3).normal(size=12)
+    for step in [('add', 6), ('add', 7), ('remove', 0), ('add', 8), ('remove', 3), ('remove', 4), ('add', 11)]:
+        if step[0] == 'add':
+            order.append(step[1])
+            solver.add_asset(full[step[1], order])
+        else:
+            solver.remove_asset(order.index(step[1]))
+            order.remove(step[1])
+        cov = full[np.ix_(order, order)]
+        assert solver.method == 'cholesky'
+        assert np.allclose(solver.covariance, cov)
+        assert np.allclose(solver.lower, cholesky(cov, lower=True))
+        assert np.allclose(solver.solve(b[order]), np.linalg.solve(cov, b[order]))
+
+
+def test_singular_covariance_falls_back_to_the_pseudo_inverse():
+    rng = np.random.default_rng(4)
+    loadings = rng.normal(0, 0.1, (8, 3))
+    cov = loadings @ loadings.T # rank 3
+    solver = CovarianceSolver(cov)
+    assert solver.method == 'eigen' and len(solver.eigenvalues) == 3
+    b = rng.normal(size=(8, 2))
+    assert np.allclose(solver.solve(b), np.linalg.pinv(cov) @ b)
+    assert np.allclose(solver.inverse, np.linalg.pinv(cov))
+
+    # An asset that duplicates another makes a positive definite factorization singular
+    cov = covariance(n=5, seed=5)
+    solver = CovarianceSolver(cov)
+    solver.add_asset(np.append(cov[2], cov[2, 2]))
+    expanded = np.pad(cov, ((0, 1), (0, 1)))
+    expanded[5, :5] = expanded[:5, 5] = cov[2]
+    expanded[5, 5] = cov[2, 2]
+    assert solver.method == 'eigen'
+    assert np.allclose(solver.solve(b[:6]), np.linalg.pinv(expanded) @ b[:6])
+    # Removing the duplicate refactorizes a positive definite covariance
+    solver.remove_asset(5)
+    assert solver.method == 'cholesky' and np.allclose(solver.solve(b[:5]), np.linalg.solve(cov, b[:5]))
+
+
+def test_factor_covariance_is_solved_without_a_dense_matrix():
+    rng = np.random.default_rng(6)
+    factor = FactorCovariance(rng.normal(0, 0.1, (20, 2)), np.diag([0.04, 0.01]), rng.uniform(0.01, 0.02, 20))
+    solver = CovarianceSolver(factor)
+    dense = factor.loadings @ factor.factor_cov @ factor.loadings.T + np.diag(factor.specific_var)
+    b = rng.normal(size=(20, 3))
+    assert solver.method == 'factor'
+    assert np.allclose(solver.solve(b), np.linalg.solve(dense, b))
+    assert np.allclose(solver.inverse, np.linalg.inv(dense))
@@ -0,0 +1,35 @@
+from datetime import datetime
+import os
+import numpy as np
+import pandas as pd
+
+from finml.data_reader.stockmarket import StockMarket
+
+
+def random_walks(seed=0):
+    ''' Reader of price histories with gaps: a symbol listed late, one with missing days '''
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2020-01-01', '2020-12-31', name='Date')
+    common = rng.normal(0, 0.01, len(dates))
+    histories = dict()
+    for idx, symbol in enumerate(['AAA', 'BBB', 'CCC', 'DDD']):
+        prices = pd.Series(100 * np.exp(np.cumsum(common + rng.normal(0.0005 * idx, 0.01, len(dates)))), index=dates)
+        histories[symbol] = prices
+    histories['BBB'] = histories['BBB'][dates >= pd.Timestamp(2020, 6, 1)]
+    histories['CCC'] = histories['CCC'].drop(histories['CCC'].index[rng.random(len(dates)) < 0.1])
+
+    def reader(symbol, start, end):
+        prices = histories[symbol]
+        return prices[(prices.index >= start) & (prices.index <= end)].to_frame('Adj Close')
+    return reader
+
+
+def test_stream_statistics_match_the_pairwise_statistics_of_the_returns(tmp_path):
+    market = StockMarket(datetime(2020, 1, 1), datetime(2020, 12, 31), data_dir=str(tmp_path), reader=random_walks())
+    symbols = ['AAA', 'BBB', 'CCC', 'DDD']
+    mean_return, covariance, index = market.stream_statistics(symbols, chunk_size=37) # uneven last chunk
+    returns = pd.concat([returns for _, returns in market.iter_returns(symbols)], axis=1, sort=True)
+    assert list(index) == symbols and mean_return.shape == (4, 1)
+    assert np.allclose(mean_return[:, 0], returns.mean().values)
+    assert np.allclose(covariance, returns.cov().values, rtol=1e-9, atol=1e-15)
+    assert not any(name.startswith('.tmp_') for name in os.listdir(str(tmp_path)))
@@ -0,0 +1,50 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from finml.data_reader.store import NpyStore
+
+
+def frame(num_dates, tickers, value=1.0):
+    index = pd.bdate_range('2020-01-01', periods=num_dates, name='Date')
+    return pd.DataFrame(value, index=index, columns=tickers)
+
+
+def test_overwrite_replaces_values_and_labels_together(tmp_path):
+    store = NpyStore(str(tmp_path))
+    store.save('prices', frame(5, ['A', 'B']))
+    values, dates, tickers = store.open('prices')
+
+    store.save('prices', frame(7, ['A', 'B', 'C'], 2.0))
+    loaded = store.load('prices')
+    assert loaded.shape == (7, 3)
+    assert (loaded.values == 2.0).all()
+    # A memory map opened before the overwrite still reads the old version
+    assert values.shape == (5, 2) and (np.asarray(values) == 1.0).all()
+    # Only the files of the current version remain
+    assert len([f for f in os.listdir(tmp_path) if f.endswith('.npy')]) == 2
+
+
+def test_open_rejects_inconsistent_sidecar(tmp_path):
+    store = NpyStore(str(tmp_path))
+    store.save('prices', frame(5, ['A', 'B']))
+    path = os.path.join(str(tmp_path), 'prices.json')
+    with open(path) as f:
+        meta = json.load(f)
+    meta['tickers'] = ['A', 'B', 'C']
+    with open(path, 'w') as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError):
+        store.open('prices')
+
+
+def test_sidecar_without_version_is_read(tmp_path):
+    store = NpyStore(str(tmp_path))
+    data = frame(4, ['A'])
+    np.save(os.path.join(str(tmp_path), 'prices.npy'), data.values)
+    np.save(os.path.join(str(tmp_path), 'prices.dates.npy'), data.index.values.astype('datetime64[ns]'))
+    with open(os.path.join(str(tmp_path), 'prices.json'), 'w') as f:
+        json.dump({'tickers': ['A'], 'index_name': 'Date', 'shape': [4, 1]}, f)
+    assert store.load('prices').equals(data)
@@ -0,0 +1,35 @@
+import os
+from datetime import datetime
+import pandas as pd
+
+from finml.data_reader.symbolcache import SymbolCache
+
+
+def stub_reader(symbol, start, end):
+    index = pd.bdate_range(max(pd.Timestamp(start), pd.Timestamp(2020, 1, 1)), end, name='Date')
+    return pd.DataFrame({'Adj Close': 1.0}, index=index)
+
+
+def test_evict_removes_only_stale_files_of_indexed_symbols(tmp_path):
+    data_dir = str(tmp_path)
+    for file_name in ['20200101AAPL.pkl', 'AAPL.20190101.pkl', # stale files of a cached symbol
+                      '20200101notes.pkl', 'results.20200101.pkl', 'portfolio.pkl']: # user files
+        pd.to_pickle(pd.DataFrame(), os.path.join(data_dir, file_name))
+
+    cache = SymbolCache(data_dir, reader=stub_reader)
+    cache.get('AAPL', end=datetime(2020, 3, 31))
+    cache.evict()
+
+    remaining = set(os.listdir(data_dir))
+    assert cache.index['AAPL']['file'] in remaining
+    assert '20200101AAPL.pkl' not in remaining and 'AAPL.20190101.pkl' not in remaining
+    assert {'20200101notes.pkl', 'results.20200101.pkl', 'portfolio.pkl'} <= remaining
+
+
+def test_evict_over_budget_removes_least_recently_used(tmp_path):
+    cache = SymbolCache(str(tmp_path), max_bytes=1, reader=stub_reader)
+    cache.get('AAPL', end=datetime(2020, 3, 31))
+    cache.get('MSFT', end=datetime(2020, 3, 31))
+    cache.evict()
+    assert len(cache.index) == 0
+    assert [f for f in os.listdir(str(tmp_path)) if f.endswith('.pkl')] == []